@@ -1,166 +1,392 @@
 import sqlite3
-from utils.config import sqlite_db_path
+from utils.config import sqlite_db_path, redis_client_sync
+from utils import pubsub
 from utils import logger
+from utils.metrics import get_histogram, snapshot_all
 import json
 import logging
+import threading
+import time
+import functools
 from .ToolManager import YunhuTools
+from . import TaskManager
 yhtools = YunhuTools()
-conn = sqlite3.connect(sqlite_db_path)
-c = conn.cursor()
 import asyncio
+from collections import namedtuple
 from concurrent.futures import ThreadPoolExecutor
 
-executor = ThreadPoolExecutor()
+# 单线程数据库执行器，保证所有写操作串行执行且不阻塞事件循环
+db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="binding-db")
+
+# WAL 模式下读写互不阻塞，synchronous=NORMAL 时每次提交不再 fsync 整个数据库
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+# 每个线程一个连接，sqlite3 会按 SQL 文本缓存预编译语句（cached_statements）
+local = threading.local()
 
 """
 数据表格式及数据示例
 
-1. `QQ_table`
-- 描述: 存储 QQ 群与云湖（YH）群的绑定关系。
+1. `binding_table`
+- 描述: 存储各平台群组/服务器之间的绑定关系，每一条有向绑定（源 -> 目标）占一行。
 - 字段:
-  - `QQ_group_id` (TEXT, 主键): QQ 群的唯一标识符。
-  - `YH_group_ids` (TEXT): 与该 QQ 群绑定的云湖群列表，存储为 JSON 格式的字符串。
-  - `MC_server_ids` (TEXT): 与该 QQ 群绑定的 MC 服务器列表，存储为 JSON 格式的字符串。
+  - `src_platform` (TEXT): 源平台（QQ / YH / MC）。
+  - `src_id` (TEXT): 源群组或服务器的唯一标识符。
+  - `dst_platform` (TEXT): 目标平台（QQ / YH / MC）。
+  - `dst_id` (TEXT): 目标群组或服务器的唯一标识符。
+  - `sync` (INTEGER): 是否把源的消息同步到目标，1 为同步，0 为不同步，默认为 1。
+  - `coalesce_ms` (INTEGER): 合并窗口（毫秒），大于 0 时源群在窗口内的消息合并为一条发送到目标，默认为 0（不合并）。
+- 主键: (`src_platform`, `src_id`, `dst_platform`, `dst_id`)
+- 索引: `idx_binding_dst` (`dst_platform`, `dst_id`, `src_platform`, `src_id`)，用于反向查询。
 
 - 数据示例:
-{
-  "QQ_group_id": "123456789",
-  "YH_group_ids": [
-    {
-      "id": "987654321",
-      "sync": true
-    },
-    {
-      "id": "123123123",
-      "sync": false
-    }
-  ],
-  "MC_server_ids": [
-    {
-      "id": "10000001",
-      "sync": true
-    }
-  ]
-}
+| src_platform | src_id    | dst_platform | dst_id    | sync | coalesce_ms |
+|--------------|-----------|--------------|-----------|------|-------------|
+| QQ           | 123456789 | YH           | 987654321 | 1    | 500         |
+| YH           | 987654321 | QQ           | 123456789 | 0    | 0           |
+| QQ           | 123456789 | MC           | 10000001  | 1    | 0           |
+| MC           | 10000001  | QQ           | 123456789 | 1    | 0           |
 
-2. `YH_table`
-- 描述: 存储云湖（YH）群与 QQ 群的绑定关系。
-- 字段:
-  - `YH_group_id` (TEXT, 主键): 云湖群的唯一标识符。
-  - `QQ_group_ids` (TEXT): 与该云湖群绑定的 QQ 群列表，存储为 JSON 格式的字符串。
-  - `MC_server_ids` (TEXT): 与该云湖群绑定的 MC 服务器列表，存储为 JSON 格式的字符串。
+---
+数据结构说明
 
-- 数据示例:
-{
-  "YH_group_id": "987654321",
-  "QQ_group_ids": [
-    {
-      "id": "123456789",
-      "sync": true
-    },
-    {
-      "id": "987654321",
-      "sync": false
-    }
-  ],
-  "MC_server_ids": [
-    {
-      "id": "10000001",
-      "sync": true
-    }
-  ]
-}
+1. 绑定的对称性:
+   - 一次绑定会同时写入两条方向相反的记录，两条记录的 `sync` 相互独立。
+   - 例如上表中 QQ 群 `"123456789"` 的消息会同步到云湖群 `"987654321"`，但云湖群的消息不会同步到 QQ 群（单向-QQ到云湖）。
 
-3. `MC_table`
-- 描述: 存储 Minecraft（MC）服务器与 QQ 群、云湖（YH）群的绑定关系。
-- 字段:
-  - `MC_server_id` (TEXT, 主键): MC 服务器的唯一标识符。
-  - `QQ_group_ids` (TEXT): 与该 MC 服务器绑定的 QQ 群列表，存储为 JSON 格式的字符串。
-  - `YH_group_ids` (TEXT): 与该 MC 服务器绑定的云湖群列表，存储为 JSON 格式的字符串。
+2. 查询方式:
+   - 以某个群为源查询其所有绑定时走主键索引，以某个群为目标查询时走 `idx_binding_dst` 索引。
+   - 绑定、解绑、设置同步状态都是针对单行的索引操作，不再需要读取并重写整个 JSON 列表。
 
-- 数据示例:
+3. `get_info` 的返回格式与旧版保持一致:
 {
-  "MC_server_id": "10000001",
   "QQ_group_ids": [
     {
       "id": "123456789",
-      "sync": true
+      "sync": false,          # 云湖群 -> QQ 群 是否同步
+      "binding_sync": true,   # QQ 群 -> 云湖群 是否同步
+      "coalesce_ms": 500      # QQ 群 -> 云湖群 的合并窗口（毫秒），0 为不合并
     }
   ],
-  "YH_group_ids": [
-    {
-      "id": "987654321",
-      "sync": true
-    }
-  ]
+  "MC_server_ids": []
 }
 
----
-数据结构说明
-
-1. 表格设计对称性:
-   - 每个表都通过主键 (`QQ_group_id`, `YH_group_id`, 或 `MC_server_id`) 唯一标识一个群组或服务器。
-   - 绑定关系存储在其他字段中，使用 JSON 格式的字符串表示多个绑定对象。
-
-2. JSON 数据结构:
-   - 每个绑定对象包含以下字段：
-     - `id`: 被绑定群组或服务器的唯一标识符。
-     - `sync`: 表示是否同步消息的布尔值，默认为 `true`。
-
-3. 示例解释:
-   - 在 `QQ_table` 中，`QQ_group_id` 为 `"123456789"` 的群绑定了两个云湖群：`"987654321"` 和 `"123123123"`。其中，`"987654321"` 同步消息，而 `"123123123"` 不同步。此外，它还绑定了一个 MC 服务器 `"10000001"`，并同步消息。
-   - 在 `YH_table` 中，`YH_group_id` 为 `"987654321"` 的群绑定了两个 QQ 群：`"123456789"` 和 `"987654321"`。其中，`"123456789"` 同步消息，而 `"987654321"` 不同步。此外，它还绑定了一个 MC 服务器 `"10000001"`，并同步消息。
-   - 在 `MC_table` 中，`MC_server_id` 为 `"10000001"` 的服务器绑定了一个 QQ 群 `"123456789"` 和一个云湖群 `"987654321"`，并且两者都同步消息。
-
 ---
 注意事项
 
-1. JSON 字段的默认值:
-   - 如果某个群或服务器没有绑定任何其他群或服务器，则对应的 JSON 字段应为空数组 (`[]`)。
+1. 旧版数据迁移:
+   - 旧版的 `QQ_table`、`YH_table`、`MC_table` 以 JSON 列表存储绑定关系，模块加载时会自动迁移到 `binding_table`，
+     迁移完成后旧表会被重命名为 `*_legacy`，不会重复迁移。
 
 2. 同步状态的管理:
    - `sync` 字段用于控制消息同步行为，可以通过相关接口动态更新。
 
-3. 数据完整性:
-   - 在绑定或解绑操作时，代码会同时更新 `QQ_table`、`YH_table` 和 `MC_table`，以确保数据一致性。
+3. 消息合并:
+   - `coalesce_ms` 只影响单个方向，例如上表中 QQ 群 `"123456789"` 在 500 毫秒内的消息会合并为一条发送到云湖群。
+   - 旧数据库启动时会自动添加该列。
+"""
+PLATFORMS = ("QQ", "YH", "MC")
+
+# 各平台在 get_info / list_platform_table 中对应的字段名
+DATA_KEYS = {
+    "QQ": "QQ_group_ids",
+    "YH": "YH_group_ids",
+    "MC": "MC_server_ids"
+}
+
+# 旧版表结构: 表名 -> (源平台, 第二列对应平台, 第三列对应平台)
+LEGACY_TABLES = {
+    "QQ_table": ("QQ", "YH", "MC"),
+    "YH_table": ("YH", "QQ", "MC"),
+    "MC_table": ("MC", "QQ", "YH")
+}
+
+SQL_SELECT_BINDINGS = """
+    SELECT e.dst_platform, e.dst_id, e.sync, r.sync, r.coalesce_ms
+    FROM binding_table AS e
+    LEFT JOIN binding_table AS r
+        ON r.src_platform = e.dst_platform AND r.src_id = e.dst_id
+        AND r.dst_platform = e.src_platform AND r.dst_id = e.src_id
+    WHERE e.src_platform = ? AND e.src_id = ?
+    ORDER BY e.rowid
+"""
+SQL_SELECT_ROUTES = """
+    SELECT e.src_platform, e.src_id, e.dst_platform, e.dst_id, r.sync, e.coalesce_ms
+    FROM binding_table AS e
+    LEFT JOIN binding_table AS r
+        ON r.src_platform = e.dst_platform AND r.src_id = e.dst_id
+        AND r.dst_platform = e.src_platform AND r.dst_id = e.src_id
+    WHERE e.sync = 1
+    ORDER BY e.rowid
 """
-def execute_async(async_func, *args, **kwargs):
+SQL_SELECT_ROUTES_FROM = """
+    SELECT e.src_platform, e.src_id, e.dst_platform, e.dst_id, r.sync, e.coalesce_ms
+    FROM binding_table AS e
+    LEFT JOIN binding_table AS r
+        ON r.src_platform = e.dst_platform AND r.src_id = e.dst_id
+        AND r.dst_platform = e.src_platform AND r.dst_id = e.src_id
+    WHERE e.src_platform = ? AND e.src_id = ? AND e.sync = 1
+    ORDER BY e.rowid
+"""
+SQL_SELECT_NEIGHBORS = "SELECT dst_platform, dst_id FROM binding_table WHERE src_platform=? AND src_id=?"
+SQL_SELECT_SYNC = "SELECT sync FROM binding_table WHERE src_platform=? AND src_id=? AND dst_platform=? AND dst_id=?"
+SQL_INSERT_EDGE = "INSERT OR IGNORE INTO binding_table (src_platform, src_id, dst_platform, dst_id, sync) VALUES (?, ?, ?, ?, ?)"
+SQL_DELETE_EDGE = "DELETE FROM binding_table WHERE src_platform=? AND src_id=? AND dst_platform=? AND dst_id=?"
+SQL_DELETE_ALL = "DELETE FROM binding_table WHERE (src_platform=? AND src_id=?) OR (dst_platform=? AND dst_id=?)"
+SQL_UPDATE_SYNC = "UPDATE binding_table SET sync=COALESCE(?, sync) WHERE src_platform=? AND src_id=? AND dst_platform=? AND dst_id=?"
+SQL_UPDATE_SYNC_FROM = "UPDATE binding_table SET sync=COALESCE(?, sync) WHERE src_platform=? AND src_id=? AND dst_platform=?"
+SQL_UPDATE_SYNC_TO = "UPDATE binding_table SET sync=COALESCE(?, sync) WHERE dst_platform=? AND dst_id=?"
+SQL_UPDATE_COALESCE = "UPDATE binding_table SET coalesce_ms=? WHERE src_platform=? AND src_id=? AND dst_platform=? AND dst_id=?"
+SQL_UPDATE_COALESCE_TO = "UPDATE binding_table SET coalesce_ms=? WHERE src_platform=? AND dst_platform=? AND dst_id=?"
+SQL_SELECT_SOURCES = "SELECT src_platform, src_id FROM binding_table WHERE src_platform=? AND dst_platform=? AND dst_id=?"
+
+def get_connection():
+    """获取当前线程的数据库连接，首次调用时创建并设置 PRAGMA"""
+    conn = getattr(local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(sqlite_db_path, cached_statements=64)
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        local.conn = conn
+    return conn
+
+def normalize_platform(platform):
+    """将平台名统一为大写，未知平台返回 None"""
+    if platform is None:
+        return None
+    platform = str(platform).upper()
+    return platform if platform in PLATFORMS else None
+
+def _sync_value(sync_data, platform):
+    """从 sync_data 中取出某个平台的同步状态，未指定时返回 None（保持原值）"""
+    if not sync_data or platform not in sync_data or sync_data[platform] is None:
+        return None
+    return 1 if sync_data[platform] else 0
+
+def initialize_schema():
+    conn = get_connection()
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS binding_table (
+        src_platform TEXT NOT NULL,
+        src_id TEXT NOT NULL,
+        dst_platform TEXT NOT NULL,
+        dst_id TEXT NOT NULL,
+        sync INTEGER NOT NULL DEFAULT 1,
+        coalesce_ms INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (src_platform, src_id, dst_platform, dst_id)
+    )
+    ''')
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_binding_dst
+    ON binding_table (dst_platform, dst_id, src_platform, src_id)
+    ''')
+    # 旧数据库没有合并窗口列
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(binding_table)")]
+    if "coalesce_ms" not in columns:
+        conn.execute("ALTER TABLE binding_table ADD COLUMN coalesce_ms INTEGER NOT NULL DEFAULT 0")
+        logger.info("已为 binding_table 添加 coalesce_ms 列")
+    conn.commit()
+
+def migrate_legacy_tables():
     """
-    在 ThreadPoolExecutor 中执行异步函数。
-    
-    :param async_func: 要执行的异步函数。
-    :param args: 异步函数的位置参数。
-    :param kwargs: 异步函数的关键字参数。
+    将旧版 QQ_table / YH_table / MC_table 中的 JSON 绑定列表迁移到 binding_table。
+    迁移完成后旧表重命名为 *_legacy，因此只会执行一次。
+
+    :return: 迁移的绑定记录数
     """
-    loop = asyncio.get_event_loop()
-    loop.run_in_executor(
-        executor,
-        lambda: asyncio.run(async_func(*args, **kwargs))
-    )
+    conn = get_connection()
+    migrated = 0
+    try:
+        for table, (src_platform, col2_platform, col3_platform) in LEGACY_TABLES.items():
+            cur = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
+            if not cur.fetchone():
+                continue
+
+            cur = conn.execute(f"SELECT * FROM {table}")
+            rows = cur.fetchall()
+            edges = []
+            for row in rows:
+                src_id = str(row[0])
+                for dst_platform, raw in ((col2_platform, row[1]), (col3_platform, row[2])):
+                    try:
+                        items = json.loads(raw) if raw else []
+                    except json.JSONDecodeError:
+                        logger.warning(f"迁移 {table} 时发现无法解析的绑定列表: {src_id} -> {raw}")
+                        continue
+                    for item in items:
+                        edges.append((src_platform, src_id, dst_platform, str(item['id']), 1 if item.get('sync', True) else 0))
+
+            conn.executemany(SQL_INSERT_EDGE, edges)
+            conn.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+            migrated += len(edges)
+            logger.info(f"已将 {table} 迁移到 binding_table, 共 {len(edges)} 条绑定")
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.error(f"迁移旧版绑定数据时发生错误: {e}")
+    return migrated
+
+# 路由方向: 互通 / 单向（仅本群 -> 目标）
+DIRECTION_BOTH = "both"
+DIRECTION_OUT = "out"
+
+# coalesce_ms: 合并窗口（毫秒），0 表示逐条发送
+Route = namedtuple("Route", ["platform", "id", "direction", "coalesce_ms"], defaults=(0,))
+
+# 路由缓存: (平台, ID) -> (Route, ...)，只包含开启同步的目标
+# 空元组表示该群未绑定任何平台（负缓存），消息转发时无需再查询数据库
+routes = {}
+routes_warmed = False
+# 路由缓存由 binding-db 线程写入（绑定变更、订阅事件、全量加载），事件循环只写入负缓存；
+# 全量加载时整体替换字典，写入前都要持有该锁，避免单个刷新写入即将被替换的旧字典
+routes_lock = threading.Lock()
+
+# 多进程部署时通过 Redis 发布绑定变更事件，每次变更版本号 +1
+BINDING_CHANNEL = "binding:changes"
+BINDING_VERSION_KEY = "binding:version"
+# 本进程路由缓存已同步到的版本号
+routes_version = 0
+
+def _build_route(dst_platform, dst_id, binding_sync, coalesce_ms=0):
+    direction = DIRECTION_BOTH if binding_sync else DIRECTION_OUT
+    return Route(dst_platform, dst_id, direction, coalesce_ms or 0)
+
+def warm_routes():
+    """
+    一次性从数据库加载全部路由，启动时调用。
+
+    :return: 已缓存的源群数量
+    """
+    global routes, routes_warmed, routes_version
+    conn = get_connection()
+    try:
+        # 先读取版本号再加载，加载期间发生的变更会在之后的事件中再次应用
+        routes_version = _current_version()
+        cur = conn.execute(SQL_SELECT_ROUTES)
+        table = {}
+        for src_platform, src_id, dst_platform, dst_id, binding_sync, coalesce_ms in cur.fetchall():
+            table.setdefault((src_platform, src_id), []).append(_build_route(dst_platform, dst_id, binding_sync, coalesce_ms))
+        with routes_lock:
+            routes = {key: tuple(value) for key, value in table.items()}
+            routes_warmed = True
+        logger.info(f"路由缓存预热完成, 共 {len(routes)} 个群")
+        return len(routes)
+    except sqlite3.Error as e:
+        logger.error(f"预热路由缓存时发生错误: {e}")
+        return 0
+
+def refresh_routes(keys):
+    """
+    从数据库重新加载指定源的路由，绑定关系变更后调用。
+
+    :param keys: [(平台, ID), ...]
+    """
+    conn = get_connection()
+    for platform, id in keys:
+        key = (platform, str(id))
+        cur = conn.execute(SQL_SELECT_ROUTES_FROM, key)
+        value = tuple(_build_route(row[2], row[3], row[4], row[5]) for row in cur.fetchall())
+        with routes_lock:
+            routes[key] = value
+
+def get_routes(platform, id):
+    """
+    获取某个群需要转发到的所有目标，命中缓存时不访问数据库。
+
+    :param platform: 源平台
+    :param id: 源群 ID
+    :return: (Route, ...)，未绑定或未开启同步时为空元组
+    """
+    platform = normalize_platform(platform)
+    if platform is None:
+        return ()
+    key = (platform, str(id))
+    cached = routes.get(key)
+    if cached is not None:
+        return cached
+    if routes_warmed:
+        # 预热后未命中说明没有任何开启同步的绑定，不覆盖刚刚刷新的路由
+        with routes_lock:
+            return routes.setdefault(key, ())
+    try:
+        refresh_routes([key])
+    except sqlite3.Error as e:
+        logger.error(f"加载 {platform}:{id} 的路由时发生错误: {e}")
+        return ()
+    return routes[key]
+
+def _neighbors(platform, id):
+    conn = get_connection()
+    cur = conn.execute(SQL_SELECT_NEIGHBORS, (platform, id))
+    return [(row[0], row[1]) for row in cur.fetchall()]
+
+def _current_version():
+    try:
+        return int(redis_client_sync.get(BINDING_VERSION_KEY) or 0)
+    except Exception as e:
+        logger.error(f"获取绑定版本号失败: {e}")
+        return routes_version
+
+def routes_changed(keys):
+    """
+    绑定关系变更（已提交）后调用: 刷新本地路由并通知其它进程。
+
+    :param keys: 受影响的 [(平台, ID), ...]
+    """
+    keys = sorted(set((platform, str(id)) for platform, id in keys))
+    if not keys:
+        return
+    refresh_routes(keys)
+    try:
+        version = redis_client_sync.incr(BINDING_VERSION_KEY)
+    except Exception as e:
+        logger.error(f"更新绑定版本号失败: {e}")
+        return
+    pubsub.publish(redis_client_sync, BINDING_CHANNEL, {"version": version, "keys": keys})
+
+def handle_binding_event(event):
+    """处理其它进程发布的绑定变更事件（在订阅线程中调用），交给 binding-db 线程与本地变更串行执行"""
+    db_executor.submit(_apply_binding_event, event)
+
+def _apply_binding_event(event):
+    """
+    应用绑定变更事件。
+    版本号连续时只刷新受影响的路由；发现版本缺口（错过了事件）时全量重新加载。
+    """
+    global routes_version
+    version = int(event.get("version", 0))
+    if version > routes_version + 1:
+        logger.warning(f"绑定版本号不连续: 本地 {routes_version}, 收到 {version}, 重新加载路由")
+        warm_routes()
+    elif event.get("origin") != pubsub.WORKER_ID:
+        try:
+            refresh_routes([tuple(key) for key in event.get("keys", [])])
+        except sqlite3.Error as e:
+            logger.error(f"应用绑定变更 v{version} 时发生错误: {e}")
+            return
+        logger.debug(f"已应用绑定变更 v{version}: {event.get('keys')}")
+    routes_version = max(routes_version, version)
+
+def handle_binding_reconnect():
+    """订阅断线期间可能错过了事件，全量重新加载"""
+    db_executor.submit(warm_routes)
+
+pubsub.subscribe(BINDING_CHANNEL, handle_binding_event, on_reconnect=handle_binding_reconnect)
 
 def get_base_sync(platform_A, platform_B, id_A, id_B):
+    conn = get_connection()
     try:
         logger.debug(f"尝试获取 {platform_A} 和 {platform_B} 的基础同步信息")
-        
-        if platform_A == "QQ":
-            if platform_B == "YH":
-                c.execute("SELECT YH_group_ids FROM QQ_table WHERE QQ_group_id=?", (id_A,))
-                row = c.fetchone()
-                if row:
-                    yh_group_ids = json.loads(row[0]) if row[0] else []
-                    for group in yh_group_ids:
-                        if group['id'] == id_B:
-                            return group.get('sync', True)
-
-        elif platform_A == "YH":
-            if platform_B == "QQ":
-                c.execute("SELECT QQ_group_ids FROM YH_table WHERE YH_group_id=?", (id_A,))
-                row = c.fetchone()
-                if row:
-                    qq_group_ids = json.loads(row[0]) if row[0] else []
-                    for group in qq_group_ids:
-                        if group['id'] == id_B:
-                            return group.get('sync', True)
+        cur = conn.execute(SQL_SELECT_SYNC, (normalize_platform(platform_A), str(id_A), normalize_platform(platform_B), str(id_B)))
+        row = cur.fetchone()
+        if row:
+            return bool(row[0])
 
         logger.debug(f"未找到 {platform_A} 和 {platform_B} 的基础同步信息")
         return None
@@ -170,638 +396,397 @@ def get_base_sync(platform_A, platform_B, id_A, id_B):
         return None
 
 def get_info(platform, id):
+    conn = get_connection()
     try:
         logger.debug(f"尝试获取 {platform} 的绑定信息")
-        sync_other = {}
-        if platform == "QQ" or platform == "qq":
-            c.execute("SELECT YH_group_ids, MC_server_ids FROM QQ_table WHERE QQ_group_id=?", (id,))
-            row = c.fetchone()
-            if row:
-                YH_group_ids = json.loads(row[0]) if row[0] else []
-                MC_server_ids = json.loads(row[1]) if row[1] else []
-
-                # 获取并设置 YH 和 MC 的 binding_sync 状态
-                for group in YH_group_ids:
-                    base_sync = get_base_sync("YH", "QQ", group['id'], id)
-                    group['binding_sync'] = base_sync if base_sync is not None else group.get('sync', True)
-                for server in MC_server_ids:
-                    base_sync = get_base_sync("MC", "QQ", server['id'], id)
-                    server['binding_sync'] = base_sync if base_sync is not None else server.get('sync', True)
-
-                logger.debug(f"获取到 {platform} 的绑定信息: {YH_group_ids}, {MC_server_ids}")
-                return {"status": 0, "msg": "查询成功", "data": {"YH_group_ids": YH_group_ids, "MC_server_ids": MC_server_ids}}
-            else:
-                return {"status": 5, "msg": "未绑定任何平台"}
-
-        elif platform == "YH" or platform == "yh":
-            c.execute("SELECT QQ_group_ids, MC_server_ids FROM YH_table WHERE YH_group_id=?", (id,))
-            row = c.fetchone()
-            if row:
-                QQ_group_ids = json.loads(row[0]) if row[0] else []
-                MC_server_ids = json.loads(row[1]) if row[1] else []
-
-                # 获取 QQ 和 MC 的 sync 状态
-                sync_other['QQ'] = {group['id']: group['sync'] for group in QQ_group_ids}
-                sync_other['MC'] = {server['id']: server['sync'] for server in MC_server_ids}
-
-                # 添加 binding_sync 到 QQ_group_ids 和 MC_server_ids
-                for group in QQ_group_ids:
-                    base_sync = get_base_sync("QQ", "YH", group['id'], id)
-                    group['binding_sync'] = base_sync if base_sync is not None else sync_other['QQ'].get(group['id'], True)
-                for server in MC_server_ids:
-                    base_sync = get_base_sync("MC", "YH", server['id'], id)
-                    server['binding_sync'] = base_sync if base_sync is not None else sync_other['MC'].get(server['id'], True)
-
-                logger.debug(f"获取到 {platform} 的绑定信息: {QQ_group_ids}, {MC_server_ids}")
-                return {"status": 0, "msg": "查询成功", "data": {"QQ_group_ids": QQ_group_ids, "MC_server_ids": MC_server_ids}}
-            else:
-                return {"status": 5, "msg": "未绑定任何平台"}
-
-        elif platform == "MC" or platform == "mc":
-            c.execute("SELECT QQ_group_ids, YH_group_ids FROM MC_table WHERE MC_server_id=?", (id,))
-            row = c.fetchone()
-            if row:
-                QQ_group_ids = json.loads(row[0]) if row[0] else []
-                YH_group_ids = json.loads(row[1]) if row[1] else []
-
-                # 获取 QQ 和 YH 的 sync 状态
-                sync_other['QQ'] = {group['id']: group['sync'] for group in QQ_group_ids}
-                sync_other['YH'] = {group['id']: group['sync'] for group in YH_group_ids}
-
-                # 添加 binding_sync 到 QQ_group_ids 和 YH_group_ids
-                for group in QQ_group_ids:
-                    base_sync = get_base_sync("QQ", "MC", group['id'], id)
-                    group['binding_sync'] = base_sync if base_sync is not None else sync_other['QQ'].get(group['id'], True)
-                for group in YH_group_ids:
-                    base_sync = get_base_sync("YH", "MC", group['id'], id)
-                    group['binding_sync'] = base_sync if base_sync is not None else sync_other['YH'].get(group['id'], True)
-
-                logger.debug(f"获取到 {platform} 的绑定信息: {QQ_group_ids}, {YH_group_ids}")
-                return {"status": 0, "msg": "查询成功", "data": {"QQ_group_ids": QQ_group_ids, "YH_group_ids": YH_group_ids}}
-            else:
-                return {"status": 5, "msg": "未绑定任何平台"}
-
-        else:
+        if normalize_platform(platform) is None:
             logger.warning(f"未知平台: {platform}")
             return {"status": 3, "msg": "未知平台"}
+        platform = normalize_platform(platform)
+
+        cur = conn.execute(SQL_SELECT_BINDINGS, (platform, str(id)))
+        rows = cur.fetchall()
+        if not rows:
+            return {"status": 5, "msg": "未绑定任何平台"}
+
+        data = {DATA_KEYS[other]: [] for other in PLATFORMS if other != platform}
+        for dst_platform, dst_id, sync, binding_sync, coalesce_ms in rows:
+            if dst_platform == platform:
+                continue
+            data[DATA_KEYS[dst_platform]].append({
+                "id": dst_id,
+                "sync": bool(sync),
+                "binding_sync": bool(binding_sync) if binding_sync is not None else bool(sync),
+                "coalesce_ms": coalesce_ms or 0
+            })
+
+        logger.debug(f"获取到 {platform} 的绑定信息: {data}")
+        return {"status": 0, "msg": "查询成功", "data": data}
     except sqlite3.Error as e:
         logger.error(f"获取 {platform} 的绑定信息时发生错误: {e}")
         return {"status": -1, "msg": "绑定失败"}
 
-def bind(platform_A, platform_B, id_A, id_B):
+def _bind_pair(conn, platform_A, platform_B, id_A, id_B):
+    """在当前事务中添加一对绑定，返回 (结果, 受影响的路由)，不提交"""
+    if normalize_platform(platform_A) is None or normalize_platform(platform_B) in (None, normalize_platform(platform_A)):
+        logger.warning(f"未知平台: {platform_A} -> {platform_B}")
+        return {"status": 3, "msg": "未知平台"}, []
+    platform_A, platform_B = normalize_platform(platform_A), normalize_platform(platform_B)
+
+    id_A, id_B = str(id_A), str(id_B)
+    cur = conn.execute(SQL_INSERT_EDGE, (platform_A, id_A, platform_B, id_B, 1))
+    if cur.rowcount == 0:
+        return {"status": 4, "msg": "绑定已存在"}, []
+    conn.execute(SQL_INSERT_EDGE, (platform_B, id_B, platform_A, id_A, 1))
+    logger.debug(f"成功添加绑定: {platform_A}({id_A}) <-> {platform_B}({id_B})")
+    return {"status": 0, "msg": "操作成功"}, [(platform_A, id_A), (platform_B, id_B)]
+
+def _unbind_pair(conn, platform_A, platform_B, id_A, id_B):
+    """在当前事务中删除一对绑定，返回 (结果, 受影响的路由)，不提交"""
+    if normalize_platform(platform_A) is None or normalize_platform(platform_B) is None:
+        logger.warning(f"未知平台: {platform_A} -> {platform_B}")
+        return {"status": 3, "msg": "未知平台"}, []
+    platform_A, platform_B = normalize_platform(platform_A), normalize_platform(platform_B)
+
+    id_A, id_B = str(id_A), str(id_B)
+    cur = conn.execute(SQL_DELETE_EDGE, (platform_A, id_A, platform_B, id_B))
+    if cur.rowcount == 0:
+        return {"status": 5, "msg": "绑定不存在"}, []
+    conn.execute(SQL_DELETE_EDGE, (platform_B, id_B, platform_A, id_A))
+    logger.debug(f"成功删除绑定: {platform_A}({id_A}) <-> {platform_B}({id_B})")
+    return {"status": 0, "msg": "操作成功"}, [(platform_A, id_A), (platform_B, id_B)]
+
+def _set_sync_pair(conn, platform_A, platform_B, id_A, id_B, sync_data):
+    """在当前事务中设置一对绑定的同步状态，返回 (结果, 受影响的路由)，不提交"""
+    if normalize_platform(platform_A) is None or normalize_platform(platform_B) is None:
+        logger.warning(f"未知平台: {platform_A} -> {platform_B}")
+        return {"status": 3, "msg": "未知平台"}, []
+    platform_A, platform_B = normalize_platform(platform_A), normalize_platform(platform_B)
+
+    id_A, id_B = str(id_A), str(id_B)
+    cur = conn.execute(SQL_UPDATE_SYNC, (_sync_value(sync_data, platform_B), platform_A, id_A, platform_B, id_B))
+    if cur.rowcount == 0:
+        return {"status": 5, "msg": "绑定不存在"}, []
+    conn.execute(SQL_UPDATE_SYNC, (_sync_value(sync_data, platform_A), platform_B, id_B, platform_A, id_A))
+    logger.debug(f"成功设置同步状态: {platform_A}({id_A}) <-> {platform_B}({id_B}), sync_data={sync_data}")
+    return {"status": 0, "msg": "操作成功"}, [(platform_A, id_A), (platform_B, id_B)]
+
+def _set_coalesce_pair(conn, platform_A, platform_B, id_A, id_B, window_ms):
+    """在当前事务中设置 A -> B 方向的合并窗口（毫秒，0 为不合并），返回 (结果, 受影响的路由)，不提交"""
+    if normalize_platform(platform_A) is None or normalize_platform(platform_B) is None:
+        logger.warning(f"未知平台: {platform_A} -> {platform_B}")
+        return {"status": 3, "msg": "未知平台"}, []
+    platform_A, platform_B = normalize_platform(platform_A), normalize_platform(platform_B)
+
+    id_A, id_B = str(id_A), str(id_B)
+    cur = conn.execute(SQL_UPDATE_COALESCE, (max(0, int(window_ms)), platform_A, id_A, platform_B, id_B))
+    if cur.rowcount == 0:
+        return {"status": 5, "msg": "绑定不存在"}, []
+    logger.debug(f"成功设置合并窗口: {platform_A}({id_A}) -> {platform_B}({id_B}), {window_ms}ms")
+    return {"status": 0, "msg": "操作成功"}, [(platform_A, id_A)]
+
+def _apply_pair(pair_func, error_msg, *args):
+    """执行单个绑定操作: 成功时提交并刷新路由，否则回滚"""
+    conn = get_connection()
     try:
-        logger.debug(f"尝试绑定 {platform_A} 和 {platform_B}")
-        result = None
-        if platform_A == "QQ":
-            if platform_B == "YH":
-                result = update_QQ_table("add", "YH", id_A, id_B)
-            elif platform_B == "MC":
-                result = update_QQ_table("add", "MC", id_A, id_B)
-        
-        elif platform_A == "YH":
-            if platform_B == "QQ":
-                result = update_YH_table("add", "QQ", id_A, id_B)
-            elif platform_B == "MC":
-                result = update_YH_table("add", "MC", id_A, id_B)
-
-        elif platform_A == "MC":
-            if platform_B == "QQ":
-                result = update_MC_table("add", "QQ", id_A, id_B)
-            elif platform_B == "YH":
-                result = update_MC_table("add", "YH", id_A, id_B)
-
+        result, keys = pair_func(conn, *args)
+        if result["status"] == 0:
+            conn.commit()
+            routes_changed(keys)
         else:
-            logger.warning(f"未知平台: {platform_A}")
-            return {"status": 3, "msg": "未知平台"}
-        logger.debug(result)
+            conn.rollback()
         return result
     except Exception as e:
-        logger.error(f"绑定失败: {e}")
-        return {"status": -1, "msg": "绑定失败"}
+        conn.rollback()
+        logger.error(f"{error_msg}: {e}")
+        return {"status": -1, "msg": error_msg}
 
-def unbind(platform_A, platform_B, id_A, id_B):
+def _apply_pairs(pair_func, error_msg, items):
+    """
+    在同一个事务中执行一批绑定操作，只提交一次。
+    单项失败（未知平台、已存在、不存在）不影响其它项；数据库错误时整批回滚。
+
+    :param items: [(参数, ...), ...]
+    :return: {"status": 0, "msg": ..., "results": [{"item": 参数, "status": ..., "msg": ...}, ...]}
+    """
+    conn = get_connection()
     try:
-        logger.debug(f"尝试解绑 {platform_A} 和 {platform_B}")
-        if platform_A == "QQ":
-            if platform_B == "YH":
-                result = update_QQ_table("del", "YH", id_A, id_B)
-            elif platform_B == "MC":
-                result = update_QQ_table("del", "MC", id_A, id_B)
-
-        elif platform_A == "YH":
-            if platform_B == "QQ":
-                result = update_YH_table("del", "QQ", id_A, id_B)
-            elif platform_B == "MC":
-                result = update_YH_table("del", "MC", id_A, id_B)
-
-        elif platform_A == "MC":
-            if platform_B == "QQ":
-                result = update_MC_table("del", "QQ", id_A, id_B)
-            elif platform_B == "YH":
-                result = update_MC_table("del", "YH", id_A, id_B)
+        results = []
+        keys = set()
+        for item in items:
+            result, changed = pair_func(conn, *item)
+            keys.update(changed)
+            results.append({"item": list(item), **result})
+        conn.commit()
+        routes_changed(keys)
+        succeeded = sum(1 for result in results if result["status"] == 0)
+        logger.debug(f"批量操作完成: 成功 {succeeded}/{len(results)}")
+        return {"status": 0, "msg": f"成功 {succeeded}/{len(results)}", "results": results}
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"{error_msg}: {e}")
+        return {"status": -1, "msg": error_msg, "results": []}
 
-        else:
-            logger.warning(f"未知平台: {platform_A}")
+def bind(platform_A, platform_B, id_A, id_B):
+    logger.debug(f"尝试绑定 {platform_A} 和 {platform_B}")
+    return _apply_pair(_bind_pair, "绑定失败", platform_A, platform_B, id_A, id_B)
+
+def unbind(platform_A, platform_B, id_A, id_B):
+    logger.debug(f"尝试解绑 {platform_A} 和 {platform_B}")
+    return _apply_pair(_unbind_pair, "解绑失败", platform_A, platform_B, id_A, id_B)
+
+def bind_pairs(pairs):
+    """
+    批量绑定。
+
+    :param pairs: [(platform_A, platform_B, id_A, id_B), ...]
+    """
+    return _apply_pairs(_bind_pair, "批量绑定失败", [tuple(pair) for pair in pairs])
+
+def unbind_pairs(pairs):
+    """
+    批量解绑。
+
+    :param pairs: [(platform_A, platform_B, id_A, id_B), ...]
+    """
+    return _apply_pairs(_unbind_pair, "批量解绑失败", [tuple(pair) for pair in pairs])
+
+def set_sync_pairs(pairs):
+    """
+    批量设置同步状态。
+
+    :param pairs: [(platform_A, platform_B, id_A, id_B, sync_data), ...]
+    """
+    return _apply_pairs(_set_sync_pair, "批量设置同步状态失败", [tuple(pair) for pair in pairs])
+
+def set_coalesce_pairs(pairs):
+    """
+    批量设置合并窗口。
+
+    :param pairs: [(platform_A, platform_B, id_A, id_B, window_ms), ...]，设置 A -> B 方向
+    """
+    return _apply_pairs(_set_coalesce_pair, "批量设置合并窗口失败", [tuple(pair) for pair in pairs])
+
+def bind_many(platform_A, id_A, platform_B, ids):
+    """将 platform_A 的 id_A 与 platform_B 的多个群绑定"""
+    return bind_pairs([(platform_A, platform_B, id_A, id_B) for id_B in ids])
+
+def unbind_many(platform_A, id_A, platform_B, ids):
+    """解除 platform_A 的 id_A 与 platform_B 的多个群的绑定"""
+    return unbind_pairs([(platform_A, platform_B, id_A, id_B) for id_B in ids])
+
+def set_sync_many(platform_A, id_A, platform_B, ids, sync_data):
+    """为 platform_A 的 id_A 与 platform_B 的多个群设置相同的同步状态"""
+    return set_sync_pairs([(platform_A, platform_B, id_A, id_B, sync_data) for id_B in ids])
+
+def set_coalesce_to(platform, id_PF, src_platform, window_ms):
+    """为 src_platform 所有绑定群到本群的方向设置合并窗口"""
+    conn = get_connection()
+    try:
+        logger.debug(f"尝试设置 {src_platform} -> {platform}({id_PF}) 的合并窗口: {window_ms}ms")
+        if normalize_platform(platform) is None or normalize_platform(src_platform) is None:
+            logger.warning(f"未知平台: {src_platform} -> {platform}")
             return {"status": 3, "msg": "未知平台"}
-        logger.debug(result)
-        return result
+        platform, src_platform = normalize_platform(platform), normalize_platform(src_platform)
+
+        id_PF = str(id_PF)
+        sources = [(row[0], row[1]) for row in conn.execute(SQL_SELECT_SOURCES, (src_platform, platform, id_PF))]
+        conn.execute(SQL_UPDATE_COALESCE_TO, (max(0, int(window_ms)), src_platform, platform, id_PF))
+        conn.commit()
+        routes_changed(sources)
+        return {"status": 0, "msg": "操作成功"}
     except Exception as e:
-        logger.error(f"解绑失败: {e}")
-        return {"status": -1, "msg": "解绑失败"}
+        conn.rollback()
+        logger.error(f"设置合并窗口失败: {e}")
+        return {"status": -1, "msg": "设置合并窗口失败"}
+
+def _delete_all(platform, id):
+    """删除某个群的所有绑定，返回被解绑的 [(平台, ID), ...]"""
+    conn = get_connection()
+    cur = conn.execute(SQL_SELECT_BINDINGS, (platform, id))
+    targets = [(row[0], row[1]) for row in cur.fetchall()]
+    try:
+        conn.execute(SQL_DELETE_ALL, (platform, id, platform, id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    routes_changed([(platform, id)] + targets)
+    return targets
+
+def _unbind_notices(platform, id, targets):
+    """生成需要发送给被解绑群聊的通知: [(发送函数, 参数, 关键字参数), ...]"""
+    notices = []
+    for dst_platform, dst_id in targets:
+        if platform == "QQ" and dst_platform == "YH":
+            notices.append((yhtools.send, (), {"recvId": dst_id, "recvType": "group", "contentType": "text", "content": f"与QQ群{id}绑定已删除"}))
+        elif platform == "YH" and dst_platform == "QQ":
+            from .ToolManager import QQTools
+            qqtools = QQTools()
+            notices.append((qqtools.send, ("group", dst_id, f"该群的云湖{id}已被解绑"), {}))
+            logger.debug(f"向 QQ_group_id:{dst_id} 发送消息")
+    return notices
 
 def unbind_all(platform, id):
     try:
         logger.debug(f"尝试解绑所有 {platform} 和 {id}")
-        if platform == "QQ" or platform == "qq":
-            result = update_QQ_table("del_all", None, id, None)
-        elif platform == "YH" or platform == "yh":
-            result = update_YH_table("del_all", None, id, None)
-        elif platform == "MC" or platform == "mc":
-            result = update_MC_table("del_all", None, id, None)
-        else:
+        if normalize_platform(platform) is None:
             logger.warning(f"未知平台: {platform}")
             return {"status": 3, "msg": "未知平台"}
+        platform = normalize_platform(platform)
+
+        id = str(id)
+        targets = _delete_all(platform, id)
+
+        # 通知被解绑的群聊
+        for send, args, kwargs in _unbind_notices(platform, id, targets):
+            TaskManager.submit(send, *args, name="解绑通知", **kwargs)
+
+        logger.debug(f"成功删除所有绑定: {platform}({id})")
+        return {"status": 0, "msg": "群聊已全部解绑"}
     except Exception as e:
         logger.error(f"解绑失败: {e}")
         return {"status": -1, "msg": "解绑失败"}
-    finally:
-        return {"status": 0, "msg": "群聊已全部解绑"}
 
 def list_platform_table(platform, id_PF):
+    """
+    以旧版表的行格式返回某个群的绑定信息: (id, 第二列 JSON, 第三列 JSON)
+    """
+    conn = get_connection()
     try:
-        if platform == "QQ" or platform == "qq":
-            c.execute("SELECT * FROM QQ_table WHERE QQ_group_id=?", (id_PF,))
-        elif platform == "YH" or platform == "yh":
-            c.execute("SELECT * FROM YH_table WHERE YH_group_id=?", (id_PF,))
-        elif platform == "MC" or platform == "mc":
-            c.execute("SELECT * FROM MC_table WHERE MC_server_id=?", (id_PF,))
-        else:
+        if normalize_platform(platform) is None:
             logger.warning(f"未知平台: {platform}")
             return {"status": 3, "msg": "未知平台"}
-        row = c.fetchone()
+        platform = normalize_platform(platform)
+
+        cur = conn.execute(SQL_SELECT_BINDINGS, (platform, str(id_PF)))
+        rows = cur.fetchall()
+        row = None
+        if rows:
+            _, col2_platform, col3_platform = LEGACY_TABLES[f"{platform}_table"]
+            columns = {col2_platform: [], col3_platform: []}
+            for dst_platform, dst_id, sync, _, _ in rows:
+                if dst_platform in columns:
+                    columns[dst_platform].append({"id": dst_id, "sync": bool(sync)})
+            row = (str(id_PF), json.dumps(columns[col2_platform]), json.dumps(columns[col3_platform]))
         return {"status": 0,"platform": platform, "data": row, "msg": "查询成功"}
     except sqlite3.Error as e:
         logger.error(f"SQLite 错误: {e}")
         return {"status": -1, "platform": platform, "data": e, "msg": "查询失败"}
 
 def set_all_sync(platform, id_PF, sync_data):
+    conn = get_connection()
     try:
         logger.debug(f"尝试设置 {platform} 的同步状态, ID: {id_PF}, 同步数据: {sync_data}")
-
-        if platform == "QQ" or platform == "qq":
-            result = update_QQ_table("set_all_sync", None, id_PF, None, sync_data)
-        elif platform == "YH" or platform == "yh":
-            result = update_YH_table("set_all_sync", None, id_PF, None, sync_data)
-        elif platform == "MC" or platform == "mc":
-            result = update_MC_table("set_all_sync", None, id_PF, None, sync_data)
-        else:
+        if normalize_platform(platform) is None:
             logger.warning(f"未知平台: {platform}")
             return {"status": 3, "msg": "未知平台"}
-        
-        logger.debug(result)
-        return result
+        platform = normalize_platform(platform)
+
+        id_PF = str(id_PF)
+        # 本群 -> 其它平台
+        for dst_platform in PLATFORMS:
+            if dst_platform != platform:
+                conn.execute(SQL_UPDATE_SYNC_FROM, (_sync_value(sync_data, dst_platform), platform, id_PF, dst_platform))
+        # 其它平台 -> 本群
+        conn.execute(SQL_UPDATE_SYNC_TO, (_sync_value(sync_data, platform), platform, id_PF))
+        conn.commit()
+        routes_changed([(platform, id_PF)] + _neighbors(platform, id_PF))
+
+        logger.debug(f"成功设置所有同步状态: {platform}({id_PF}), sync_data={sync_data}")
+        return {"status": 0, "msg": "操作成功"}
     except Exception as e:
+        conn.rollback()
         logger.error(f"设置同步状态失败: {e}")
         return {"status": -1, "msg": "设置同步状态失败"}
+
 def set_sync(platform_A, platform_B, id_A, id_B, sync_data):
+    logger.debug(f"尝试设置 {platform_A} 和 {platform_B} 的同步状态, ID: {id_A}, {id_B}, 同步数据: {sync_data}")
+    return _apply_pair(_set_sync_pair, "设置同步状态失败", platform_A, platform_B, id_A, id_B, sync_data)
+
+async def run_in_db(func, *args):
+    """
+    在数据库线程中执行函数，并记录耗时（包含排队时间）到延迟直方图。
+
+    :param func: 要执行的同步函数
+    :param args: 函数参数
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
     try:
-        logger.debug(f"尝试设置 {platform_A} 和 {platform_B} 的同步状态, ID: {id_A}, {id_B}, 同步数据: {sync_data}")
-
-        if platform_A == "QQ":
-            result = update_QQ_table("set_sync", platform_B, id_A, id_B, sync_data)
-        elif platform_A == "YH":
-            result = update_YH_table("set_sync", platform_B, id_A, id_B, sync_data)
-        elif platform_A == "MC":
-            result = update_MC_table("set_sync", platform_B, id_A, id_B, sync_data)
-        else:
-            logger.warning(f"未知平台: {platform_A}")
+        return await loop.run_in_executor(db_executor, functools.partial(func, *args))
+    finally:
+        get_histogram(f"binding.{func.__name__}").observe(time.perf_counter() - start)
+
+async def warm_routes_async():
+    return await run_in_db(warm_routes)
+
+async def get_info_async(platform, id):
+    return await run_in_db(get_info, platform, id)
+
+async def bind_async(platform_A, platform_B, id_A, id_B):
+    return await run_in_db(bind, platform_A, platform_B, id_A, id_B)
+
+async def unbind_async(platform_A, platform_B, id_A, id_B):
+    return await run_in_db(unbind, platform_A, platform_B, id_A, id_B)
+
+async def unbind_all_async(platform, id):
+    try:
+        logger.debug(f"尝试解绑所有 {platform} 和 {id}")
+        if normalize_platform(platform) is None:
+            logger.warning(f"未知平台: {platform}")
             return {"status": 3, "msg": "未知平台"}
-        logger.debug(result)
-        return result
+        platform = normalize_platform(platform)
+
+        id = str(id)
+        targets = await run_in_db(_delete_all, platform, id)
     except Exception as e:
-        logger.error(f"设置同步状态失败: {e}")
-        return {"status": -1, "msg": "设置同步状态失败"}
+        logger.error(f"解绑失败: {e}")
+        return {"status": -1, "msg": "解绑失败"}
 
-def update_QQ_table(type, platform, id_QQ, id_PF=None, sync_data=None, called_from=None):
-    try:
-        logger.debug(f"尝试更新 QQ_table 类型: {type}, 平台: {platform}, ID: {id_PF}")
+    # 通知被解绑的群聊
+    for send, args, kwargs in _unbind_notices(platform, id, targets):
+        TaskManager.submit(send, *args, name="解绑通知", **kwargs)
 
-        # 查询现有记录
-        c.execute("SELECT * FROM QQ_table WHERE QQ_group_id=?", (id_QQ,))
-        existing_record = c.fetchone()
-        logger.debug(f"查询结果: {existing_record}")
+    logger.debug(f"成功删除所有绑定: {platform}({id})")
+    return {"status": 0, "msg": "群聊已全部解绑"}
 
-        if existing_record:
-            yh_group_ids = json.loads(existing_record[1]) if existing_record[1] else []
-            mc_server_ids = json.loads(existing_record[2]) if existing_record[2] else []
-        else:
-            yh_group_ids = []
-            mc_server_ids = []
-
-        # 根据操作类型执行相应逻辑
-        if type == "add":
-            if platform == "YH" or platform == "yh":
-                if existing_record and any(item['id'] == id_PF for item in yh_group_ids):
-                    return {"status": 4, "msg": "绑定已存在"}
-                yh_group_ids.append({"id": id_PF, "sync": True})
-                if existing_record:
-                    c.execute("UPDATE QQ_table SET YH_group_ids=? WHERE QQ_group_id=?", (json.dumps(yh_group_ids), id_QQ))
-                else:
-                    c.execute("INSERT INTO QQ_table (QQ_group_id, YH_group_ids) VALUES (?, ?)", (id_QQ, json.dumps(yh_group_ids)))
-
-                # 更新 YH_table
-                update_YH_table("add", "QQ", id_PF, id_QQ)
-                logger.debug(f"成功添加绑定: QQ({id_QQ}) -> YH({id_PF})")
-
-            elif platform == "MC" or platform == "mc":
-                if existing_record and any(item['id'] == id_PF for item in mc_server_ids):
-                    return {"status": 4, "msg": "绑定已存在"}
-                mc_server_ids.append({"id": id_PF, "sync": True})
-                if existing_record:
-                    c.execute("UPDATE QQ_table SET MC_server_ids=? WHERE QQ_group_id=?", (json.dumps(mc_server_ids), id_QQ))
-                else:
-                    c.execute("INSERT INTO QQ_table (QQ_group_id, MC_server_ids) VALUES (?, ?)", (id_QQ, json.dumps(mc_server_ids)))
-
-                # 更新 MC_table
-                update_MC_table("add", "QQ", id_PF, id_QQ)
-                logger.debug(f"成功添加绑定: QQ({id_QQ}) -> MC({id_PF})")
-
-        elif type == "del":
-            if platform == "YH" or platform == "yh":
-                if not existing_record or not any(item['id'] == id_PF for item in yh_group_ids):
-                    return {"status": 5, "msg": "绑定不存在"}
-                yh_group_ids = [item for item in yh_group_ids if item['id'] != id_PF]
-                c.execute("UPDATE QQ_table SET YH_group_ids=? WHERE QQ_group_id=?", (json.dumps(yh_group_ids), id_QQ))
-
-                # 删除 YH_table 中的记录
-                update_YH_table("del", "QQ", id_PF, id_QQ)
-                logger.debug(f"成功删除绑定: QQ({id_QQ}) -> YH({id_PF})")
-
-            elif platform == "MC" or platform == "mc":
-                if not existing_record or not any(item['id'] == id_PF for item in mc_server_ids):
-                    return {"status": 5, "msg": "绑定不存在"}
-                mc_server_ids = [item for item in mc_server_ids if item['id'] != id_PF]
-                c.execute("UPDATE QQ_table SET MC_server_ids=? WHERE QQ_group_id=?", (json.dumps(mc_server_ids), id_QQ))
-
-                # 删除 MC_table 中的记录
-                update_MC_table("del", "QQ", id_PF, id_QQ)
-                logger.debug(f"成功删除绑定: QQ({id_QQ}) -> MC({id_PF})")
-
-        elif type == "del_all":
-            # 删除与 YH_table 的所有绑定
-            if yh_group_ids:
-                for item in yh_group_ids:
-                    from .ToolManager import YunhuTools
-                    yhtools = YunhuTools()
-                    execute_async(yhtools.send, recvId=item['id'], recvType="group", contentType="text", content=f"与QQ群{id_QQ}绑定已删除")
-                    logger.debug(update_YH_table("del", "QQ", item['id'], id_QQ))
-
-            # 删除与 MC_table 的所有绑定
-            if mc_server_ids:
-                for item in mc_server_ids:
-                    # from .ToolManager import MinecraftTools
-                    # mctools = MinecraftTools()
-                    # execute_async(mctools.send, recvId=item['id'], recvType="group", contentType="text", content=f"与QQ群{id_QQ}绑定已删除")
-                    logger.debug(update_MC_table("del", "QQ", item['id'], id_QQ))
-
-            # 删除 QQ_table 中的记录
-            c.execute("DELETE FROM QQ_table WHERE QQ_group_id=?", (id_QQ,))
-            logger.debug(f"成功删除所有绑定: QQ({id_QQ})")
-
-        elif type == "set_sync":
-            if platform == "YH" or platform == "yh":
-                for item in yh_group_ids:
-                    if item['id'] == id_PF:
-                        item['sync'] = sync_data.get('YH', item['sync'])
-                        break
-                c.execute("UPDATE QQ_table SET YH_group_ids=? WHERE QQ_group_id=?", (json.dumps(yh_group_ids), id_QQ))
-
-                # 更新 YH_table 中的同步状态
-                if called_from != "YH":
-                    update_YH_table("set_sync", "QQ", id_PF, id_QQ, sync_data, called_from="QQ")
-                logger.debug(f"成功设置同步状态: QQ({id_QQ}) -> YH({id_PF}), sync={sync_data.get('YH')}")
-
-            elif platform == "MC" or platform == "mc":
-                for item in mc_server_ids:
-                    if item['id'] == id_PF:
-                        item['sync'] = sync_data.get('MC', item['sync'])
-                        break
-                c.execute("UPDATE QQ_table SET MC_server_ids=? WHERE QQ_group_id=?", (json.dumps(mc_server_ids), id_QQ))
-
-                # 更新 MC_table 中的同步状态
-                if called_from != "MC":
-                    update_MC_table("set_sync", "QQ", id_PF, id_QQ, sync_data, called_from="QQ")
-                logger.debug(f"成功设置同步状态: QQ({id_QQ}) -> MC({id_PF}), sync={sync_data.get('MC')}")
-
-        elif type == "set_all_sync":
-            for item in yh_group_ids:
-                item['sync'] = sync_data.get('YH', item['sync'])
-            for item in mc_server_ids:
-                item['sync'] = sync_data.get('MC', item['sync'])
-
-            # 更新 QQ_table
-            c.execute("UPDATE QQ_table SET YH_group_ids=? WHERE QQ_group_id=?", (json.dumps(yh_group_ids), id_QQ))
-            c.execute("UPDATE QQ_table SET MC_server_ids=? WHERE QQ_group_id=?", (json.dumps(mc_server_ids), id_QQ))
-
-            # 更新相关表中的同步状态
-            for item in yh_group_ids:
-                update_YH_table("set_sync", "QQ", item['id'], id_QQ, sync_data, called_from="QQ")
-            for item in mc_server_ids:
-                update_MC_table("set_sync", "QQ", item['id'], id_QQ, sync_data, called_from="QQ")
-            logger.debug(f"成功设置所有同步状态: QQ({id_QQ}), sync_data={sync_data}")
+async def list_platform_table_async(platform, id_PF):
+    return await run_in_db(list_platform_table, platform, id_PF)
 
-        conn.commit()
-        return {"status": 0, "msg": "操作成功"}
+async def set_all_sync_async(platform, id_PF, sync_data):
+    return await run_in_db(set_all_sync, platform, id_PF, sync_data)
 
-    except Exception as e:
-        logger.error(f"更新 QQ_table 时发生错误: {e}")
-        return {"status": -1, "msg": str(e)}
+async def set_sync_async(platform_A, platform_B, id_A, id_B, sync_data):
+    return await run_in_db(set_sync, platform_A, platform_B, id_A, id_B, sync_data)
 
-def update_YH_table(type, platform, id_YH, id_PF, sync_data=None, called_from=None):
-    try:
-        logger.debug(f"尝试更新 YH_table 类型: {type}, 平台: {platform}, ID: {id_PF}")
-
-        # 查询现有记录
-        c.execute("SELECT * FROM YH_table WHERE YH_group_id=?", (id_YH,))
-        existing_record = c.fetchone()
-
-        if existing_record:
-            if platform == "QQ" or platform == "qq":
-                qq_group_ids = json.loads(existing_record[1]) if existing_record[1] else []
-                logger.debug(f"查询到的 QQ_group_ids: {qq_group_ids}")
-            elif platform == "MC" or platform == "mc":
-                mc_server_ids = json.loads(existing_record[2]) if existing_record[2] else []
-                logger.debug(f"查询到的 MC_server_ids: {mc_server_ids}")
-        else:
-            if platform == "QQ" or platform == "qq":
-                qq_group_ids = []
-            elif platform == "MC" or platform == "mc":
-                mc_server_ids = []
-
-        # 根据操作类型执行相应逻辑
-        if type == "add":
-            if platform == "QQ" or platform == "qq":
-                if existing_record and any(item['id'] == id_PF for item in qq_group_ids):
-                    return {"status": 4, "msg": "绑定已存在"}
-                qq_group_ids.append({"id": id_PF, "sync": True})
-                if existing_record:
-                    c.execute("UPDATE YH_table SET QQ_group_ids=? WHERE YH_group_id=?", (json.dumps(qq_group_ids), id_YH))
-                else:
-                    c.execute("INSERT INTO YH_table (YH_group_id, QQ_group_ids) VALUES (?, ?)", (id_YH, json.dumps(qq_group_ids)))
-
-                # 更新 QQ_table
-                update_QQ_table("add", "YH", id_PF, id_YH)
-                logger.debug(f"成功添加绑定: YH({id_YH}) -> QQ({id_PF})")
-
-            elif platform == "MC" or platform == "mc":
-                if existing_record and any(item['id'] == id_PF for item in mc_server_ids):
-                    return {"status": 4, "msg": "绑定已存在"}
-                mc_server_ids.append({"id": id_PF, "sync": True})
-                if existing_record:
-                    c.execute("UPDATE YH_table SET MC_server_ids=? WHERE YH_group_id=?", (json.dumps(mc_server_ids), id_YH))
-                else:
-                    c.execute("INSERT INTO YH_table (YH_group_id, MC_server_ids) VALUES (?, ?)", (id_YH, json.dumps(mc_server_ids)))
-
-                # 更新 MC_table
-                update_MC_table("add", "YH", id_PF, id_YH)
-                logger.debug(f"成功添加绑定: YH({id_YH}) -> MC({id_PF})")
-
-        elif type == "del":
-            if platform == "QQ" or platform == "qq":
-                if not existing_record or not any(item['id'] == id_PF for item in qq_group_ids):
-                    return {"status": 5, "msg": "绑定不存在"}
-                qq_group_ids = [item for item in qq_group_ids if item['id'] != id_PF]
-                c.execute("UPDATE YH_table SET QQ_group_ids=? WHERE YH_group_id=?", (json.dumps(qq_group_ids), id_YH))
-
-                # 删除 QQ_table 中的记录
-                update_QQ_table("del", "YH", id_PF, id_YH)
-                logger.debug(f"成功删除绑定: YH({id_YH}) -> QQ({id_PF})")
-
-            elif platform == "MC" or platform == "mc":
-                if not existing_record or not any(item['id'] == id_PF for item in mc_server_ids):
-                    return {"status": 5, "msg": "绑定不存在"}
-                mc_server_ids = [item for item in mc_server_ids if item['id'] != id_PF]
-                c.execute("UPDATE YH_table SET MC_server_ids=? WHERE YH_group_id=?", (json.dumps(mc_server_ids), id_YH))
-
-                # 删除 MC_table 中的记录
-                update_MC_table("del", "YH", id_PF, id_YH)
-                logger.debug(f"成功删除绑定: YH({id_YH}) -> MC({id_PF})")
-
-        elif type == "del_all":
-            # 删除与 QQ_table 的所有绑定
-            c.execute("SELECT QQ_group_ids FROM YH_table WHERE YH_group_id=?", (id_YH,))
-            record_to_delete = c.fetchone()
-            if record_to_delete:
-                qq_group_ids = json.loads(record_to_delete[0]) if record_to_delete[0] else []
-                for item in qq_group_ids:
-                    from .ToolManager import QQTools
-                    qqtools = QQTools()
-                    execute_async(qqtools.send, "group", item['id'], f"该群的云湖{id_YH}已被解绑")
-                    logger.debug(f"向 QQ_group_id:{item['id']} 发送消息")
-                    update_QQ_table("del", "YH", item['id'], id_YH)
-
-            # 删除与 MC_table 的所有绑定
-            c.execute("SELECT MC_server_ids FROM YH_table WHERE YH_group_id=?", (id_YH,))
-            record_to_delete = c.fetchone()
-            if record_to_delete:
-                mc_server_ids = json.loads(record_to_delete[0]) if record_to_delete[0] else []
-                for item in mc_server_ids:
-                    update_MC_table("del", "YH", item['id'], id_YH)
-
-            # 删除 YH_table 中的记录
-            c.execute("DELETE FROM YH_table WHERE YH_group_id=?", (id_YH,))
-            logger.debug(f"成功删除所有绑定: YH({id_YH})")
-
-        elif type == "set_sync":
-            if platform == "QQ" or platform == "qq":
-                qq_group_ids = json.loads(existing_record[1]) if existing_record[1] else []
-                for item in qq_group_ids:
-                    if item['id'] == id_PF:
-                        item['sync'] = sync_data.get('QQ', item['sync'])
-                        break
-                c.execute("UPDATE YH_table SET QQ_group_ids=? WHERE YH_group_id=?", (json.dumps(qq_group_ids), id_YH))
-
-                # 更新 QQ_table 中的同步状态
-                if called_from != "QQ":
-                    update_QQ_table("set_sync", "YH", id_PF, id_YH, sync_data, called_from="YH")
-                logger.debug(f"成功设置同步状态: YH({id_YH}) -> QQ({id_PF}), sync={sync_data.get('QQ')}")
-
-            elif platform == "MC" or platform == "mc":
-                mc_server_ids = json.loads(existing_record[2]) if existing_record[2] else []
-                for item in mc_server_ids:
-                    if item['id'] == id_PF:
-                        item['sync'] = sync_data.get('MC', item['sync'])
-                        break
-                c.execute("UPDATE YH_table SET MC_server_ids=? WHERE YH_group_id=?", (json.dumps(mc_server_ids), id_YH))
-
-                # 更新 MC_table 中的同步状态
-                if called_from != "MC":
-                    update_MC_table("set_sync", "YH", id_PF, id_YH, sync_data, called_from="YH")
-                logger.debug(f"成功设置同步状态: YH({id_YH}) -> MC({id_PF}), sync={sync_data.get('MC')}")
-
-        elif type == "set_all_sync":
-            if existing_record:
-                qq_group_ids = json.loads(existing_record[1]) if existing_record[1] else []
-                mc_server_ids = json.loads(existing_record[2]) if existing_record[2] else []
-
-                # 更新所有绑定对象的同步状态
-                for item in qq_group_ids:
-                    item['sync'] = sync_data.get('QQ', item['sync'])
-                for item in mc_server_ids:
-                    item['sync'] = sync_data.get('MC', item['sync'])
-
-                # 更新 YH_table
-                c.execute("UPDATE YH_table SET QQ_group_ids=? WHERE YH_group_id=?", (json.dumps(qq_group_ids), id_YH))
-                c.execute("UPDATE YH_table SET MC_server_ids=? WHERE YH_group_id=?", (json.dumps(mc_server_ids), id_YH))
-
-                # 更新相关表中的同步状态
-                for item in qq_group_ids:
-                    update_QQ_table("set_sync", "YH", item['id'], id_YH, sync_data, called_from="YH")
-                for item in mc_server_ids:
-                    update_MC_table("set_sync", "YH", item['id'], id_YH, sync_data, called_from="YH")
-                logger.debug(f"成功设置所有同步状态: YH({id_YH}), sync_data={sync_data}")
+async def bind_many_async(platform_A, id_A, platform_B, ids):
+    return await run_in_db(bind_many, platform_A, id_A, platform_B, ids)
 
-        conn.commit()
-        return {"status": 0, "msg": "操作成功"}
+async def unbind_many_async(platform_A, id_A, platform_B, ids):
+    return await run_in_db(unbind_many, platform_A, id_A, platform_B, ids)
 
-    except Exception as e:
-        logger.error(f"更新 YH_table 时发生错误: {e}")
-        return {"status": -1, "msg": str(e)}
+async def set_sync_many_async(platform_A, id_A, platform_B, ids, sync_data):
+    return await run_in_db(set_sync_many, platform_A, id_A, platform_B, ids, sync_data)
 
-def update_MC_table(type, platform, id_MC, id_PF, sync_data=None, called_from=None):
-    try:
-        logger.debug(f"尝试更新 MC_table 类型: {type}, 平台: {platform}, ID: {id_PF}")
+async def bind_pairs_async(pairs):
+    return await run_in_db(bind_pairs, pairs)
 
-        # 查询现有记录
-        c.execute("SELECT * FROM MC_table WHERE MC_server_id=?", (id_MC,))
-        existing_record = c.fetchone()
+async def unbind_pairs_async(pairs):
+    return await run_in_db(unbind_pairs, pairs)
 
-        if existing_record:
-            if platform == "QQ" or platform == "qq":
-                qq_group_ids = json.loads(existing_record[1]) if existing_record[1] else []
-            elif platform == "YH" or platform == "yh":
-                yh_group_ids = json.loads(existing_record[2]) if existing_record[2] else []
-        else:
-            if platform == "QQ" or platform == "qq":
-                qq_group_ids = []
-            elif platform == "YH" or platform == "yh":
-                yh_group_ids = []
-
-        # 根据操作类型执行相应逻辑
-        if type == "add":
-            if platform == "QQ" or platform == "qq":
-                if existing_record and any(item['id'] == id_PF for item in qq_group_ids):
-                    return {"status": 4, "msg": "绑定已存在"}
-                qq_group_ids.append({"id": id_PF, "sync": True})
-                if existing_record:
-                    c.execute("UPDATE MC_table SET QQ_group_ids=? WHERE MC_server_id=?", (json.dumps(qq_group_ids), id_MC))
-                else:
-                    c.execute("INSERT INTO MC_table (MC_server_id, QQ_group_ids) VALUES (?, ?)", (id_MC, json.dumps(qq_group_ids)))
-
-                # 更新 QQ_table
-                update_QQ_table("add", "MC", id_PF, id_MC)
-
-            elif platform == "YH" or platform == "yh":
-                if existing_record and any(item['id'] == id_PF for item in yh_group_ids):
-                    return {"status": 4, "msg": "绑定已存在"}
-                yh_group_ids.append({"id": id_PF, "sync": True})
-                if existing_record:
-                    c.execute("UPDATE MC_table SET YH_group_ids=? WHERE MC_server_id=?", (json.dumps(yh_group_ids), id_MC))
-                else:
-                    c.execute("INSERT INTO MC_table (MC_server_id, YH_group_ids) VALUES (?, ?)", (id_MC, json.dumps(yh_group_ids)))
-
-                # 更新 YH_table
-                update_YH_table("add", "MC", id_PF, id_MC)
-
-        elif type == "del":
-            if platform == "QQ" or platform == "qq":
-                if not existing_record or not any(item['id'] == id_PF for item in qq_group_ids):
-                    return {"status": 5, "msg": "绑定不存在"}
-                qq_group_ids = [item for item in qq_group_ids if item['id'] != id_PF]
-                c.execute("UPDATE MC_table SET QQ_group_ids=? WHERE MC_server_id=?", (json.dumps(qq_group_ids), id_MC))
-
-                # 删除 QQ_table 中的记录
-                update_QQ_table("del", "MC", id_PF, id_MC)
-
-            elif platform == "YH" or platform == "yh":
-                if not existing_record or not any(item['id'] == id_PF for item in yh_group_ids):
-                    return {"status": 5, "msg": "绑定不存在"}
-                yh_group_ids = [item for item in yh_group_ids if item['id'] != id_PF]
-                c.execute("UPDATE MC_table SET YH_group_ids=? WHERE MC_server_id=?", (json.dumps(yh_group_ids), id_MC))
-
-                # 删除 YH_table 中的记录
-                update_YH_table("del", "MC", id_PF, id_MC)
-
-        elif type == "del_all":
-            # 删除与 QQ_table 的所有绑定
-            c.execute("SELECT QQ_group_ids FROM MC_table WHERE MC_server_id=?", (id_MC,))
-            record_to_delete = c.fetchone()
-            if record_to_delete:
-                qq_group_ids = json.loads(record_to_delete[0]) if record_to_delete[0] else []
-                for item in qq_group_ids:
-                    update_QQ_table("del", "MC", item['id'], id_MC)
-
-            # 删除与 YH_table 的所有绑定
-            c.execute("SELECT YH_group_ids FROM MC_table WHERE MC_server_id=?", (id_MC,))
-            record_to_delete = c.fetchone()
-            if record_to_delete:
-                yh_group_ids = json.loads(record_to_delete[0]) if record_to_delete[0] else []
-                for item in yh_group_ids:
-                    update_YH_table("del", "MC", item['id'], id_MC)
-
-            # 删除 MC_table 中的记录
-            c.execute("DELETE FROM MC_table WHERE MC_server_id=?", (id_MC,))
-            logger.debug(f"成功删除所有绑定: MC({id_MC})")
-
-        elif type == "set_sync":
-            if platform == "QQ" or platform == "qq":
-                qq_group_ids = json.loads(existing_record[1]) if existing_record[1] else []
-                for item in qq_group_ids:
-                    if item['id'] == id_PF:
-                        item['sync'] = sync_data.get('QQ', item['sync'])
-                        break
-                c.execute("UPDATE MC_table SET QQ_group_ids=? WHERE MC_server_id=?", (json.dumps(qq_group_ids), id_MC))
-
-                # 更新 QQ_table 中的同步状态
-                if called_from != "QQ":
-                    update_QQ_table("set_sync", "MC", id_PF, id_MC, sync_data, called_from="MC")
-
-            elif platform == "YH" or platform == "yh":
-                yh_group_ids = json.loads(existing_record[2]) if existing_record[2] else []
-                for item in yh_group_ids:
-                    if item['id'] == id_PF:
-                        item['sync'] = sync_data.get('YH', item['sync'])
-                        break
-                c.execute("UPDATE MC_table SET YH_group_ids=? WHERE MC_server_id=?", (json.dumps(yh_group_ids), id_MC))
-
-                # 更新 YH_table 中的同步状态
-                if called_from != "YH":
-                    update_YH_table("set_sync", "MC", id_PF, id_MC, sync_data, called_from="MC")
-
-        elif type == "set_all_sync":
-            if existing_record:
-                qq_group_ids = json.loads(existing_record[1]) if existing_record[1] else []
-                yh_group_ids = json.loads(existing_record[2]) if existing_record[2] else []
-
-                # 更新所有绑定对象的同步状态
-                for item in qq_group_ids:
-                    item['sync'] = sync_data.get('QQ', item['sync'])
-                for item in yh_group_ids:
-                    item['sync'] = sync_data.get('YH', item['sync'])
-
-                # 更新 MC_table
-                c.execute("UPDATE MC_table SET QQ_group_ids=? WHERE MC_server_id=?", (json.dumps(qq_group_ids), id_MC))
-                c.execute("UPDATE MC_table SET YH_group_ids=? WHERE MC_server_id=?", (json.dumps(yh_group_ids), id_MC))
-
-                # 更新相关表中的同步状态
-                for item in qq_group_ids:
-                    update_QQ_table("set_sync", "MC", item['id'], id_MC, sync_data, called_from="MC")
-                for item in yh_group_ids:
-                    update_YH_table("set_sync", "MC", item['id'], id_MC, sync_data, called_from="MC")
+async def set_sync_pairs_async(pairs):
+    return await run_in_db(set_sync_pairs, pairs)
 
-        conn.commit()
-        return {"status": 0, "msg": "操作成功"}
+async def set_coalesce_pairs_async(pairs):
+    return await run_in_db(set_coalesce_pairs, pairs)
 
-    except Exception as e:
-        logger.error(f"更新 MC_table 时发生错误: {e}")
-        return {"status": -1, "msg": str(e)}
\ No newline at end of file
+async def set_coalesce_to_async(platform, id_PF, src_platform, window_ms):
+    return await run_in_db(set_coalesce_to, platform, id_PF, src_platform, window_ms)
+
+def get_latency_stats():
+    """获取数据库操作的延迟统计"""
+    return snapshot_all("binding.")
+
+initialize_schema()
+migrate_legacy_tables()
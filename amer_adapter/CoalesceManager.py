@@ -0,0 +1,156 @@
+import asyncio
+import html
+import weakref
+from utils import logger
+from utils.config import coalesce_max_messages, coalesce_enqueue_retries, coalesce_retry_delay
+from . import OutboxManager, TaskManager
+
+"""
+消息合并（高频群聊）
+
+绑定开启合并后（binding_table.coalesce_ms > 0），源群在窗口内发送的消息先缓存在内存中，
+窗口结束或达到最大条数时合并为一条消息写入发送队列:
+- 每个 (源群, 目标群) 一个缓冲区，按到达顺序合并，同一发送者连续的消息共用一个发送者标题
+- 云湖目标合并为一张 html 卡片，QQ 目标合并为多行文本
+- 窗口内只有一条消息时按原样发送，不改变显示效果
+- 缓冲区最多保留一个窗口的时间，服务停止时立即发送所有缓冲的消息
+- 写入发送队列失败时按指数退避重试（coalesce_enqueue_retries 次），重试期间持有该缓冲区的锁，不会打乱顺序
+
+合并卡片只使用每条消息的纯文本内容（message_content_alltext）: 单条消息卡片中的头像、图片、
+表情等富文本不会出现在合并卡片中（卡片底部会注明），需要完整显示时请关闭该绑定的消息合并。
+"""
+
+REPORT_URL = "https://amer.bot.anran.xyz/report?msgId="
+SENDER_SEPARATOR = '<hr style="border:none;border-top:1px solid #ddd;margin:4px 0;">'
+
+# (源平台, 源ID, 目标平台, 目标ID) -> [消息, ...]
+buffers = {}
+# (源平台, 源ID, 目标平台, 目标ID) -> 窗口结束时的定时器
+timers = {}
+# 同一缓冲区的发送按顺序进行（不再使用的锁会被自动回收）
+_locks = weakref.WeakValueDictionary()
+stats = {"buffered": 0, "flushed": 0, "merged": 0, "retried": 0, "failed": 0}
+
+def _get_lock(key):
+    lock = _locks.get(key)
+    if lock is None:
+        lock = asyncio.Lock()
+        _locks[key] = lock
+    return lock
+
+def _sender_runs(entries):
+    """把连续的同一发送者的消息分为一组，返回 [(发送者, [消息, ...]), ...]"""
+    runs = []
+    for entry in entries:
+        if runs and runs[-1][0] == entry["sender"]:
+            runs[-1][1].append(entry)
+        else:
+            runs.append((entry["sender"], [entry]))
+    return runs
+
+def render_html(source, entries):
+    """
+    把多条消息渲染为一张云湖 html 卡片。
+
+    :param source: (源平台, 源ID)
+    :param entries: [{"sender", "content", "full", "msg_id"}, ...]
+    """
+    blocks = []
+    for sender, run in _sender_runs(entries):
+        lines = []
+        for entry in run:
+            line = html.escape(entry["content"]).replace("\n", "<br>")
+            if entry.get("msg_id"):
+                line += f' <a href="{REPORT_URL}{html.escape(str(entry["msg_id"]))}" style="color:#999;font-size:12px;">举报</a>'
+            lines.append(f"<div>{line}</div>")
+        blocks.append(
+            f'<div style="margin:4px 0;"><b>{html.escape(str(sender))}</b>: {"".join(lines)}</div>'
+        )
+    platform_name = "QQ群" if source[0] == "QQ" else source[0]
+    return (
+        f'<div style="padding:8px;border-radius:8px;background:#f5f5f5;">'
+        f'{SENDER_SEPARATOR.join(blocks)}'
+        f'<details><summary style="color:#999;font-size:12px;">合并了 {len(entries)} 条消息</summary>'
+        f'<div style="color:#999;font-size:12px;">来自{platform_name} {html.escape(str(source[1]))}，合并消息只显示文字内容</div></details>'
+        f'</div>'
+    )
+
+def render_text(entries):
+    """把多条消息合并为 QQ 文本，每条消息使用原有的“[群名] 昵称(ID): 内容”格式"""
+    return "\n".join(entry["full"] for entry in entries)
+
+def render(source, target_platform, entries):
+    if len(entries) == 1:
+        return entries[0]["full"]
+    if target_platform == "YH":
+        return render_html(source, entries)
+    return render_text(entries)
+
+def add(source, route, entry):
+    """
+    把一条消息加入 (源群, 目标群) 的缓冲区，需要在事件循环线程中调用。
+
+    :param source: (源平台, 源ID)
+    :param route: BindingManager.Route，route.coalesce_ms 为合并窗口（毫秒）
+    :param entry: {"sender": 发送者昵称, "content": 纯文本内容, "full": 单独发送时的内容, "msg_id": 消息ID}
+    """
+    key = (source[0], str(source[1]), route.platform, str(route.id))
+    buffer = buffers.setdefault(key, [])
+    buffer.append(entry)
+    stats["buffered"] += 1
+    if len(buffer) >= coalesce_max_messages:
+        _schedule_flush(key)
+    elif key not in timers:
+        loop = asyncio.get_running_loop()
+        timers[key] = loop.call_later(route.coalesce_ms / 1000, _schedule_flush, key)
+
+def _schedule_flush(key):
+    timer = timers.pop(key, None)
+    if timer is not None:
+        timer.cancel()
+    entries = buffers.pop(key, None)
+    if entries:
+        # _flush 内部负责重试入队，任务本身不再整体重试（重新渲染并重复入队）
+        TaskManager.submit(_flush, key, entries, name="合并消息", retries=0)
+
+async def _flush(key, entries):
+    src_platform, src_id, dst_platform, dst_id = key
+    async with _get_lock(key):
+        content = render((src_platform, src_id), dst_platform, entries)
+        # XADD 成功前重试是安全的；重试期间持有锁，之后的合并消息不会先于本批发送
+        attempt = 0
+        while True:
+            try:
+                await OutboxManager.enqueue("group_message", [(dst_platform, dst_id)], {"content": content})
+                break
+            except Exception as e:
+                if attempt >= coalesce_enqueue_retries:
+                    stats["failed"] += len(entries)
+                    logger.error(f"合并消息写入发送队列失败, 丢弃 {src_platform}:{src_id} -> {dst_platform}:{dst_id} 的 {len(entries)} 条消息: {e}")
+                    raise
+                delay = coalesce_retry_delay * (2 ** attempt)
+                attempt += 1
+                stats["retried"] += 1
+                logger.warning(f"合并消息写入发送队列失败, {delay} 秒后重试({attempt}/{coalesce_enqueue_retries}): {e}")
+                await asyncio.sleep(delay)
+    stats["flushed"] += 1
+    stats["merged"] += len(entries)
+    logger.debug(f"合并发送 {src_platform}:{src_id} -> {dst_platform}:{dst_id}, 共 {len(entries)} 条消息")
+
+async def flush_all():
+    """立即发送所有缓冲的消息（服务停止时调用）"""
+    pending = []
+    for key in list(buffers):
+        timer = timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        entries = buffers.pop(key, None)
+        if entries:
+            pending.append(_flush(key, entries))
+    results = await asyncio.gather(*pending, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"发送合并消息失败: {result}")
+
+def get_stats():
+    return {**stats, "pending": sum(len(entries) for entries in buffers.values())}
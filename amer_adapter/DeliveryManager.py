@@ -0,0 +1,100 @@
+import asyncio
+import time
+from utils import logger, scheduler
+from utils.metrics import get_histogram, snapshot_all
+from utils.config import delivery_max_concurrent, delivery_platform_concurrent, delivery_timeout
+
+"""
+消息投递（扇出）
+
+把同一条消息并发发送到多个群聊:
+- 全局并发上限: 所有投递共享，避免瞬间发出过多请求
+- 平台并发上限: 每个平台单独限制（QQ / 云湖）
+- 单目标超时: 某个群聊接口卡住不会拖慢其它群聊；在发送调度（令牌桶）中排队的时间不计入超时
+- 每个目标单独返回结果，并记录各平台的投递耗时和成功/失败次数
+"""
+
+_global_semaphore = None
+_platform_semaphores = {}
+stats = {}
+
+def _get_semaphores(platform):
+    global _global_semaphore
+    if _global_semaphore is None:
+        _global_semaphore = asyncio.Semaphore(delivery_max_concurrent)
+    semaphore = _platform_semaphores.get(platform)
+    if semaphore is None:
+        limit = delivery_platform_concurrent.get(platform, delivery_max_concurrent)
+        semaphore = _platform_semaphores[platform] = asyncio.Semaphore(limit)
+    return _global_semaphore, semaphore
+
+def _record(platform, status):
+    platform_stats = stats.setdefault(platform, {"ok": 0, "timeout": 0, "error": 0})
+    platform_stats[status] += 1
+
+async def _send(target, send_func, timeout):
+    """发送到单个目标，除去在 scheduler.acquire 中排队的时间后超过 timeout 秒时取消并抛出 asyncio.TimeoutError"""
+    clock = scheduler.track_queue_time()
+    task = asyncio.ensure_future(send_func(target))
+    try:
+        while True:
+            remaining = timeout - clock.active_time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            # 排队期间 active_time 不增加，醒来后按剩余时间继续等待
+            done, _ = await asyncio.wait({task}, timeout=remaining)
+            if done:
+                return task.result()
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+
+async def _deliver_one(target, send_func, timeout):
+    platform, target_id = target[0], target[1]
+    global_semaphore, platform_semaphore = _get_semaphores(platform)
+    result = {"platform": platform, "id": target_id, "status": "ok", "error": None}
+    async with global_semaphore, platform_semaphore:
+        start = time.perf_counter()
+        try:
+            await _send(target, send_func, timeout)
+        except asyncio.TimeoutError:
+            result["status"] = "timeout"
+            result["error"] = f"超过 {timeout} 秒未完成"
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = str(e)
+        elapsed = time.perf_counter() - start
+    get_histogram(f"delivery.{platform}").observe(elapsed)
+    _record(platform, result["status"])
+    result["elapsed"] = elapsed
+    if result["status"] != "ok":
+        logger.error(f"投递到 {platform} 群 {target_id} 失败({result['status']}): {result['error']}")
+    return result
+
+async def deliver(targets, send_func, timeout=None) -> list:
+    """
+    并发投递到多个目标。
+
+    :param targets: [(平台, ID, ...), ...]，例如 BindingManager.Route
+    :param send_func: async send_func(target)，负责发送到单个目标
+    :param timeout: 单个目标的超时秒数，默认使用配置值
+    :return: [{"platform", "id", "status": "ok"/"timeout"/"error", "error", "elapsed"}, ...]，与 targets 顺序一致
+    """
+    if not targets:
+        return []
+    timeout = delivery_timeout if timeout is None else timeout
+    results = await asyncio.gather(*(_deliver_one(target, send_func, timeout) for target in targets))
+    failed = sum(1 for result in results if result["status"] != "ok")
+    if failed:
+        logger.warning(f"投递完成: 成功 {len(results) - failed}/{len(results)}")
+    return list(results)
+
+def get_stats():
+    return {
+        "results": {platform: dict(platform_stats) for platform, platform_stats in stats.items()},
+        "latency": snapshot_all("delivery.")
+    }
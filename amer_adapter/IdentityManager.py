@@ -0,0 +1,148 @@
+from utils import logger
+from utils.cache import TTLCache, SingleFlight, MISSING
+from utils.config import qq_group_cache_ttl, qq_user_cache_ttl, qq_member_cache_ttl, qq_identity_max_size
+from . import TaskManager
+
+"""
+QQ 身份缓存（群名称、用户昵称、群成员角色）
+
+每次 OneBot 调用都要经过反向 WebSocket 往返，同步一条 QQ 群消息原本需要
+get_group_info + get_group_member_info + 每个 @ 的 get_stranger_info:
+- 群消息事件自带发送者的昵称 / 群名片 / 角色，直接写入缓存
+- 第一次收到某个群的消息时在后台拉取群成员列表（get_group_member_list），@ 群成员时无需再查询
+- 通过 handle_notice 处理 OneBot 通知，管理员变更、群名片修改、成员加入 / 退出时使缓存失效
+- 同一对象的并发查询只调用一次，调用失败时不缓存
+
+只有持有 OneBot 连接的进程会调用这些接口并收到通知，因此只使用进程内缓存。
+"""
+
+# 群ID -> 群信息
+group_cache = TTLCache(max_size=qq_identity_max_size, ttl=qq_group_cache_ttl)
+# 用户ID -> 昵称
+user_cache = TTLCache(max_size=qq_identity_max_size, ttl=qq_user_cache_ttl)
+# (群ID, 用户ID) -> {"nickname", "card", "role"}
+member_cache = TTLCache(max_size=qq_identity_max_size, ttl=qq_member_cache_ttl)
+# 已拉取成员列表的群
+prefetched = TTLCache(max_size=qq_identity_max_size, ttl=qq_member_cache_ttl)
+inflight = SingleFlight()
+stats = {"calls": 0, "errors": 0, "prefetched_members": 0, "invalidated": 0}
+
+def _bot():
+    from main import qqBot
+    return qqBot
+
+def _member(info):
+    return {"nickname": info.get("nickname", ""), "card": info.get("card", ""), "role": info.get("role", "member")}
+
+async def _call(action, **params):
+    stats["calls"] += 1
+    try:
+        return await getattr(_bot(), action)(**params)
+    except Exception:
+        stats["errors"] += 1
+        raise
+
+async def _load_group(group_id):
+    info = await _call("get_group_info", group_id=int(group_id))
+    group_cache.set(group_id, info)
+    return info
+
+async def _load_user(user_id):
+    info = await _call("get_stranger_info", user_id=int(user_id))
+    nickname = info.get("nickname", user_id)
+    user_cache.set(user_id, nickname)
+    return nickname
+
+async def _load_member(group_id, user_id):
+    member = _member(await _call("get_group_member_info", group_id=int(group_id), user_id=int(user_id)))
+    member_cache.set((group_id, user_id), member)
+    return member
+
+async def get_group_info(group_id) -> dict:
+    """获取群信息（get_group_info 的返回值），调用失败时抛出异常"""
+    group_id = str(group_id)
+    info = group_cache.get(group_id)
+    if info is MISSING:
+        info = await inflight.do(("group", group_id), _load_group, group_id)
+    return info
+
+async def get_nickname(user_id) -> str:
+    """获取 QQ 昵称，调用失败时抛出异常"""
+    user_id = str(user_id)
+    nickname = user_cache.get(user_id)
+    if nickname is MISSING:
+        nickname = await inflight.do(("user", user_id), _load_user, user_id)
+    return nickname
+
+async def get_member(group_id, user_id) -> dict:
+    """获取群成员的昵称 / 群名片 / 角色，调用失败时抛出异常"""
+    key = (str(group_id), str(user_id))
+    member = member_cache.get(key)
+    if member is MISSING:
+        member = await inflight.do(("member",) + key, _load_member, *key)
+    return member
+
+def remember_sender(message_data):
+    """
+    把群消息事件中的发送者信息写入缓存，并在第一次收到该群消息时后台拉取成员列表。
+
+    :param message_data: MessageManager.QQMessageData
+    """
+    group_id, user_id = str(message_data.group_id), str(message_data.sender_user_id)
+    if message_data.sender_role:
+        member_cache.set((group_id, user_id), {
+            "nickname": message_data.sender_nickname,
+            "card": message_data.sender_card,
+            "role": message_data.sender_role
+        })
+    if message_data.sender_nickname:
+        user_cache.set(user_id, message_data.sender_nickname)
+    if prefetched.get(group_id) is MISSING:
+        prefetched.set(group_id, True)
+        TaskManager.submit(prefetch_group, group_id, name="拉取群成员列表", retries=0)
+
+async def prefetch_group(group_id) -> int:
+    """
+    拉取群成员列表并写入缓存（一次调用代替逐个成员查询）。
+
+    :return: 缓存的成员数
+    """
+    group_id = str(group_id)
+    try:
+        members = await _call("get_group_member_list", group_id=int(group_id))
+    except Exception as e:
+        # 允许之后重新拉取
+        prefetched.invalidate(group_id)
+        logger.warning(f"拉取QQ群 {group_id} 的成员列表失败: {e}")
+        return 0
+    for info in members:
+        user_id = str(info.get("user_id"))
+        member_cache.set((group_id, user_id), _member(info))
+        if info.get("nickname"):
+            user_cache.set(user_id, info["nickname"])
+    stats["prefetched_members"] += len(members)
+    logger.debug(f"已缓存QQ群 {group_id} 的 {len(members)} 个成员")
+    return len(members)
+
+def handle_notice(event):
+    """根据 OneBot 通知使缓存失效"""
+    notice_type = event.get("notice_type")
+    group_id, user_id = str(event.get("group_id")), str(event.get("user_id"))
+    if notice_type in ("group_admin", "group_card", "group_increase", "group_decrease"):
+        member_cache.invalidate((group_id, user_id))
+        stats["invalidated"] += 1
+    if notice_type in ("group_increase", "group_decrease"):
+        # 群人数变化
+        group_cache.invalidate(group_id)
+        if user_id == str(event.get("self_id")):
+            # 机器人加入 / 离开群聊，成员列表需要重新拉取
+            prefetched.invalidate(group_id)
+
+def get_stats():
+    return {
+        **stats,
+        "shared": inflight.shared,
+        "groups": group_cache.get_stats(),
+        "users": user_cache.get_stats(),
+        "members": member_cache.get_stats()
+    }
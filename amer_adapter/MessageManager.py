@@ -1,8 +1,10 @@
-from utils.config import redis_client, blocked_words, replace_blocked_words
-from utils import logger
+from utils.config import redis_client, blocked_words, replace_blocked_words, moderation_engine
+from utils import logger, limiter
+from utils.cache import MISSING
+import asyncio
 import datetime
 import json
-from . import BindingManager
+from . import BindingManager, MessageStore, DeliveryManager, OutboxManager, CoalesceManager
 from .ToolManager import YunhuTools, QQTools, BaseTools
 from typing import Dict, Any
 import re
@@ -19,6 +21,8 @@ class QQMessageData:
         self.real_id = data.get('real_id', "")
         self.message_type = data.get('message_type', "")
         self.raw_message = data.get('raw_message', "")
+        # 消息段数组（NapCat 设置为 Array 消息格式时）
+        self.message = data.get('message', [])
         self.font = data.get('font', "")
         self.sub_type = data.get('sub_type', "")
         self.message_format = data.get('message_format', "")
@@ -78,6 +82,9 @@ def detect_repeated_characters(message: str, threshold=10) -> bool:
     :param threshold: 连续字符的阈值，默认为10
     :return: 是否触发检测规则
     """
+    if threshold == moderation_engine.repeat_threshold:
+        result = moderation_engine.scan(message)
+        return result.repeated or result.whitespace
     # 检测连续相同字符
     if re.search(r'(.)\1{%d,}' % (threshold - 1), message):
         return True
@@ -92,10 +99,10 @@ def contains_blocked_words(message: str) -> tuple:
     :param message: 用户发送的消息内容
     :return: (是否包含违规词, 替换后的消息)
     """
-    original_message = message
-    replaced_message = replace_blocked_words(message)
-    return original_message != replaced_message, replaced_message
-def detect_message_frequency(redis_client, platform: str, user_id: str, threshold: int, time_window: int) -> bool:
+    result = moderation_engine.scan(message)
+    return bool(result.matches), result.masked
+
+async def detect_message_frequency(redis_client, platform: str, user_id: str, threshold: int, time_window: int) -> bool:
     """
     检测用户在指定时间窗口内的消息发送频率。
     :param redis_client: Redis 客户端
@@ -105,17 +112,30 @@ def detect_message_frequency(redis_client, platform: str, user_id: str, threshol
     :param time_window: 时间窗口（秒）
     :return: 是否触发频率检测规则
     """
+    allowed, _ = await limiter.fixed_window(f"message_frequency:{platform}:{user_id}", threshold, time_window, client=redis_client)
+    return not allowed
+
+async def check_sender(platform: str, user_id: str, threshold=15, time_window=30) -> tuple:
+    """
+    读取用户封禁信息并累加消息频率（封禁信息优先使用本地缓存，未命中时由计数脚本一并读取，只需一次 EVALSHA）。
+    :param platform: 平台类型（QQ/YH）
+    :param user_id: 用户ID
+    :param threshold: 消息数量阈值
+    :param time_window: 时间窗口（秒）
+    :return: (封禁状态字典, 是否触发频率检测规则)
+    """
+    ban_entry = basetools.get_cached_ban(user_id)
     frequency_key = f"message_frequency:{platform}:{user_id}"
-    # 增加计数
-    count = redis_client.incr(frequency_key)
-    if count == 1:
-        # 第一次发送消息时设置过期时间
-        redis_client.expire(frequency_key, time_window)
-    
-    # 判断是否超过阈值
-    if count > threshold:
-        return True
-    return False
+    # 脚本放进 pipeline 时 redis-py 会先单独发送 SCRIPT EXISTS，因此封禁哈希直接在脚本内读取
+    if ban_entry is MISSING:
+        allowed, _, ban_data = await limiter.fixed_window(frequency_key, threshold, time_window, hash_key=basetools.ban_key(user_id))
+        ban_entry = basetools.parse_ban(ban_data)
+        basetools.cache_ban(user_id, ban_entry)
+    else:
+        allowed, _ = await limiter.fixed_window(frequency_key, threshold, time_window)
+    ban_status = await basetools.resolve_ban_status(user_id, ban_entry)
+    return ban_status, not allowed
+
 async def handle_violation(platform: str, group_id: str, user_id: str, user_nickname: str, reason: str):
     """
     处理用户违规行为，包括封禁和通知。
@@ -125,20 +145,12 @@ async def handle_violation(platform: str, group_id: str, user_id: str, user_nick
     :param user_nickname: 用户昵称
     :param reason: 违规原因
     """
-    # 获取用户当天的违规记录
+    # 累加用户当天的违规记录: 首次违规仅记录，后续违规递增封禁时长
     violation_key = f"violation:{platform}:{user_id}:{datetime.date.today()}"
-    violation_count = redis_client.get(violation_key)
-    violation_count = int(violation_count) if violation_count else 0
-
-    if violation_count == 0:
-        # 首次违规，仅记录
-        redis_client.set(violation_key, 1, ex=86400)
+    _, duration = await limiter.escalate(violation_key, 86400, free=1, base=60, step=60)
+    if duration == 0:
         logger.info(f"用户 {user_id} 首次违规，已记录但未封禁")
         return
-    else:
-        # 后续违规，递增封禁时长
-        duration = violation_count * 60
-        redis_client.incr(violation_key)
 
     # 调用封禁接口
     ban_status = await basetools.add_to_blacklist(user_id, reason, duration)
@@ -170,32 +182,36 @@ async def handle_violation(platform: str, group_id: str, user_id: str, user_nick
         )
 
         # 发送通知
+        # 本群通知与所有绑定群聊的通知并发发送
         if platform == "QQ" or platform == "qq":
-            await qqtools.send("group", int(group_id), notify_message_text)
-            # 发送通知到所有绑定群聊
-            await send_to_all_bindings(
-                platform,
-                group_id,
-                "html",
-                notify_message_html,
-                0,
-                "Amer"
+            await asyncio.gather(
+                DeliveryManager.deliver([("QQ", group_id)], lambda target: send_group_message(target, notify_message_text)),
+                send_to_all_bindings(
+                    platform,
+                    group_id,
+                    "html",
+                    notify_message_html,
+                    0,
+                    "Amer"
+                )
             )
         elif platform == "YH" or platform == "yh":
-            await yhtools.send(recvId=group_id, recvType="group", contentType="html", content=notify_message_html)
-            await send_to_all_bindings(
-                platform,
-                group_id,
-                "text",
-                notify_message_text,
-                0,
-                "Amer"
+            await asyncio.gather(
+                DeliveryManager.deliver([("YH", group_id)], lambda target: send_group_message(target, notify_message_html)),
+                send_to_all_bindings(
+                    platform,
+                    group_id,
+                    "text",
+                    notify_message_text,
+                    0,
+                    "Amer"
+                )
             )
         logger.info(f"已封禁用户 {user_id}，通知已发送到 {platform}:{group_id}")
     else:
         logger.error(f"封禁用户 {user_id} 失败")
 
-def store_sensitive_message(redis_client, platform: str, id: str, sender_id: str, sender_nickname: str, message_content: str):
+async def store_sensitive_message(redis_client, platform: str, id: str, sender_id: str, sender_nickname: str, message_content: str):
     """
     存储敏感消息到 Redis。
     :param redis_client: Redis 客户端
@@ -214,37 +230,33 @@ def store_sensitive_message(redis_client, platform: str, id: str, sender_id: str
         "platform_from": platform,
         "id_from": id
     }
-    redis_client.rpush(sensitive_key, json.dumps(sensitive_message))
+    await redis_client.rpush(sensitive_key, json.dumps(sensitive_message))
     logger.info(f"存储敏感消息: {sensitive_key} -> {sensitive_message}")
 
 async def send(platform_a, platform_b, id_a, id_b, message_type, message_content, sender_id, sender_nickname, noBaseContent=None, msg_id=None):
-    # 检测是否被封禁
-    ban_status = await basetools.is_in_blacklist(sender_id)
+    # 检测是否被封禁及异常消息发送频率
+    ban_status, too_frequent = await check_sender(platform_a, sender_id, threshold=15, time_window=30)
     if ban_status["is_banned"]:
         return False
 
-    # 检测异常消息发送频率
-    if detect_message_frequency(redis_client, platform_a, sender_id, threshold=15, time_window=30):
+    if too_frequent:
         await handle_violation(platform_a, id_a, sender_id, sender_nickname, "发送消息过于频繁")
-        store_sensitive_message(redis_client, platform_a, id_a, sender_id, sender_nickname, message_content)
+        await store_sensitive_message(redis_client, platform_a, id_a, sender_id, sender_nickname, message_content)
         return False
     
-    # 检测重复字符
-    if detect_repeated_characters(message_content):
+    # 一次扫描同时完成重复字符、空白字符和违规词检测
+    moderation = moderation_engine.scan(message_content)
+    if moderation.repeated or moderation.whitespace:
         await handle_violation(platform_a, id_a, sender_id, sender_nickname, "发送重复字符")
-        store_sensitive_message(redis_client, platform_a, id_a, sender_id, sender_nickname, message_content)
+        await store_sensitive_message(redis_client, platform_a, id_a, sender_id, sender_nickname, message_content)
         return False
 
-    # 检测违规词
-    has_blocked_words, cleaned_message = contains_blocked_words(message_content)
-    if has_blocked_words:
+    if moderation.matches:
+        logger.info(f"屏蔽字符: {moderation.matches}")
         await handle_violation(platform_a, id_a, sender_id, sender_nickname, "使用违规词")
-        store_sensitive_message(redis_client, platform_a, id_a, sender_id, sender_nickname, message_content)
-        message_content = cleaned_message
+        await store_sensitive_message(redis_client, platform_a, id_a, sender_id, sender_nickname, message_content)
+        message_content = moderation.masked
     
-    key_ab = f"{platform_a}:{id_a}:{platform_b}:{id_b}"
-    key_ba = f"{platform_b}:{id_b}:{platform_a}:{id_a}"
-    key_local = f"{platform_a}:{id_a}:{platform_a}:{id_a}"
     message_to_save = {
         "sender_id": sender_id,
         "sender_nickname": sender_nickname,
@@ -255,27 +267,23 @@ async def send(platform_a, platform_b, id_a, id_b, message_type, message_content
         "platform_from": platform_a,
         "id_from": id_a
     }
-    if platform_a == platform_b and id_a == id_b:
-        redis_client.rpush(key_local, json.dumps(message_to_save))
-    else:
-        redis_client.rpush(key_ab, json.dumps(message_to_save))
-        redis_client.rpush(key_ba, json.dumps(message_to_save))
-        redis_client.rpush(key_local, json.dumps(message_to_save))
-    
-    if msg_id is not None:
-        # 将 msg_id 作为键存储，值可以是消息的主键或完整消息内容
-        redis_client.set(f"msg_id:{msg_id}", json.dumps(message_to_save))
-        logger.info(f"存储 msg_id: msg_id:{msg_id} -> {message_to_save}")
+    # 所有写操作合并为一次往返（MULTI/EXEC，统计与消息一起生效）；消息内容只保存一次，时间线只保存消息 uid
+    pipe = redis_client.pipeline(transaction=True)
+    uid = MessageStore.queue_message(pipe, message_to_save, msg_id)
+    sync_chats = [(platform_a, id_a), (platform_b, id_b)]
+    MessageStore.queue_timelines(pipe, uid, (platform_a, id_a), sync_chats)
+    MessageStore.queue_stats(pipe, message_to_save, (platform_a, id_a), sync_chats)
+    await pipe.execute()
 
     if noBaseContent:
         message_content = noBaseContent
-    logger.info(f"存储消息: {key_local} -> {message_to_save}")
+    logger.info(f"存储消息: {platform_a}:{id_a} -> {message_to_save}")
 
     if platform_b == "QQ" or platform_b == "qq":
         try:
-            await qqtools.send("group", int(group['id']), message_content)
+            await qqtools.send("group", int(id_b), message_content)
         except Exception as e:
-            logger.error(f"发送QQ群消息失败，群组ID: {group['id']}, 错误信息: {e}")
+            logger.error(f"发送QQ群消息失败，群组ID: {id_b}, 错误信息: {e}")
     elif platform_b == "YH" or platform_b == "yh":
         await yhtools.send(recvId=id_b, recvType="group", contentType="html", content=message_content)
     else:
@@ -283,42 +291,35 @@ async def send(platform_a, platform_b, id_a, id_b, message_type, message_content
 
 async def send_to_all_bindings(platform, id, message_type, message_content, sender_id, sender_nickname, noBaseContent=None, msg_id=None):
     """发送消息到指定平台的所有绑定群聊，排除消息来源的平台"""
-    ban_status = await basetools.is_in_blacklist(sender_id)
-    if ban_status["is_banned"]:
-        return False
+    # 从路由缓存获取需要转发的群聊，不访问数据库
+    routes = BindingManager.get_routes(platform, id)
+    if not routes:
+        return "未绑定任何平台"
 
-    # 获取所有绑定信息
-    bind_info = BindingManager.get_info(platform, id)
-    logger.info(f"获取绑定信息: {platform}:{id} -> {bind_info}")
-    if bind_info['status'] != 0:
-        return bind_info['msg']
-    
-    # 检测是否被封禁
-    ban_status = await basetools.is_in_blacklist(sender_id)
+    # 检测是否被封禁及异常消息发送频率（一次往返）
+    ban_status, too_frequent = await check_sender(platform, sender_id, threshold=15, time_window=30)
     if ban_status["is_banned"]:
         return False
 
-    # 检测异常消息发送频率
-    if detect_message_frequency(redis_client, platform, sender_id, threshold=15, time_window=30):
+    if too_frequent:
         await handle_violation(platform, id, sender_id, sender_nickname, "发送消息过于频繁")
-        store_sensitive_message(redis_client, platform, id, sender_id, sender_nickname, message_content)
+        await store_sensitive_message(redis_client, platform, id, sender_id, sender_nickname, message_content)
         return False
 
-    # 检测重复字符
-    if detect_repeated_characters(message_content):
+    # 一次扫描同时完成重复字符、空白字符和违规词检测
+    moderation = moderation_engine.scan(message_content)
+    if moderation.repeated or moderation.whitespace:
         await handle_violation(platform, id, sender_id, sender_nickname, "发送重复字符")
-        store_sensitive_message(redis_client, platform, id, sender_id, sender_nickname, message_content)
+        await store_sensitive_message(redis_client, platform, id, sender_id, sender_nickname, message_content)
         return False
 
-    # 检测违规词
-    has_blocked_words, cleaned_message = contains_blocked_words(message_content)
-    if has_blocked_words:
+    if moderation.matches:
+        logger.info(f"屏蔽字符: {moderation.matches}")
         await handle_violation(platform, id, sender_id, sender_nickname, "使用违规词")
-        store_sensitive_message(redis_client, platform, id, sender_id, sender_nickname, message_content)
-        message_content = cleaned_message
+        await store_sensitive_message(redis_client, platform, id, sender_id, sender_nickname, message_content)
+        message_content = moderation.masked
     
     # 创建消息记录
-    key_local = f"{platform}:{id}:{platform}:{id}"
     message_to_save = {
         "sender_id": sender_id,
         "sender_nickname": sender_nickname,
@@ -330,78 +331,76 @@ async def send_to_all_bindings(platform, id, message_type, message_content, send
         "id_from": id
     }
 
-    if msg_id is not None:
-        # 将 msg_id 作为键存储，值可以是消息的主键或完整消息内容
-        redis_client.set(f"msg_id:{msg_id}", json.dumps(message_to_save))
-        logger.info(f"存储 msg_id: msg_id:{msg_id} -> {message_to_save}")
-
     message_content_alltext = message_content
     if noBaseContent:
         message_content = replace_blocked_words(noBaseContent)
-    # 存储到所有相关key
-    redis_client.rpush(key_local, json.dumps(message_to_save))
-    logger.info(f"存储消息: {key_local} -> {message_to_save}")
-    
-    # 对于每个绑定群聊，存储key_ab/key_ba
-    bind_data = bind_info['data']
-    logger.info(f"绑定信息: {bind_data}")
-    if platform == "QQ":
-        for group in bind_data.get("YH_group_ids", []):
-            if group['sync']:
-                key_ab = f"{platform}:{id}:YH:{group['id']}"
-                key_ba = f"YH:{group['id']}:{platform}:{id}"
-                redis_client.rpush(key_ab, json.dumps(message_to_save))
-                redis_client.rpush(key_ba, json.dumps(message_to_save))
-    elif platform == "YH":
-        for group in bind_data.get("QQ_group_ids", []):
-            if group['sync']:
-                key_ab = f"{platform}:{id}:QQ:{group['id']}"
-                key_ba = f"QQ:{group['id']}:{platform}:{id}"
-                redis_client.rpush(key_ab, json.dumps(message_to_save))
-                redis_client.rpush(key_ba, json.dumps(message_to_save))
+
+    # 目前只在 QQ 与云湖之间转发
+    target_platform = {"QQ": "YH", "YH": "QQ"}.get(platform)
+    targets = [route for route in routes if route.platform == target_platform]
+    logger.info(f"转发目标: {platform}:{id} -> {targets}")
+
+    # 所有写操作合并为一次往返（MULTI/EXEC，统计与消息一起生效）；消息内容只保存一次，时间线只保存消息 uid
+    pipe = redis_client.pipeline(transaction=True)
+    uid = MessageStore.queue_message(pipe, message_to_save, msg_id)
+    sync_chats = [(platform, id)] + [(route.platform, route.id) for route in targets]
+    MessageStore.queue_timelines(pipe, uid, (platform, id), sync_chats)
+    MessageStore.queue_stats(pipe, message_to_save, (platform, id), sync_chats)
+    await pipe.execute()
+    logger.info(f"存储消息: {platform}:{id} -> {message_to_save}")
     
-    bind_data = bind_info['data']
-    if platform == "QQ":
-        for group in bind_data.get("YH_group_ids", []):
-            if group['sync']:
-                await yhtools.send(recvId=group['id'], recvType="group", contentType="html", content=message_content)
-    elif platform == "YH":
-        for group in bind_data.get("QQ_group_ids", []):
-            if group['sync']:
-                try:
-                    await qqtools.send("group", int(group['id']), message_content)
-                except Exception as e:
-                    logger.error(f"发送QQ群消息失败，群组ID: {group['id']}, 错误信息: {e}")
-                    continue
-    return "消息已发送到所有绑定群聊"
+    # 开启合并的绑定先进入合并缓冲区，窗口结束后合并为一条写入发送队列
+    coalesced = [route for route in targets if route.coalesce_ms > 0]
+    if coalesced:
+        entry = {"sender": sender_nickname, "content": message_content_alltext, "full": message_content, "msg_id": msg_id}
+        for route in coalesced:
+            CoalesceManager.add((platform, id), route, entry)
+        targets = [route for route in targets if route.coalesce_ms <= 0]
+
+    # 写入发送队列后立即返回，由后台按群聊顺序投递并在失败时重试
+    await OutboxManager.enqueue("group_message", targets, {"content": message_content})
+    return "消息已加入所有绑定群聊的发送队列"
+
+async def send_group_message(target, message_content):
+    """
+    发送消息到单个群聊，target 为 (平台, 群ID, ...)（云湖使用 html 格式）。
+    发送失败时抛出异常，便于投递结果统计和发送队列重试。
+    """
+    platform, group_id = target[0], target[1]
+    if platform == "YH":
+        reply = await yhtools.send(recvId=group_id, recvType="group", contentType="html", content=message_content)
+        if not isinstance(reply, dict) or reply.get("code") != 1:
+            raise RuntimeError(f"云湖接口返回错误: {reply}")
+    elif platform == "QQ":
+        if await qqtools.send("group", int(group_id), message_content) is not True:
+            raise RuntimeError("QQ 消息发送失败")
+    else:
+        raise ValueError(f"不支持的平台: {platform}")
+
+async def deliver_group_message(target, payload):
+    await send_group_message(target, payload["content"])
+
+OutboxManager.register_handler("group_message", deliver_group_message)
+
 async def set_board_for_all_groups(platform, id, message_content, group_name, board_content):
-    # 获取所有绑定信息
-    bind_info = BindingManager.get_info(platform, id)
-    if bind_info['status'] != 0:
-        return bind_info['msg']
+    routes = BindingManager.get_routes(platform, id)
+    if not routes:
+        return "未绑定任何平台"
     
     board_content = (
         f"【提醒】\n{platform}群：{group_name} | {id}"
         f"\n  {message_content}"
     )
-    bind_data = bind_info['data']
     if platform == "QQ":
-        for group in bind_data.get("QQ_group_ids", []):
-            if group['sync']:
-                await yhtools.set_board(
-                    group['id'],
-                    "group", 
-                    board_content
-                )
-                logger.info(f"发送看板云湖群 {group['id']} 设置看板: {board_content}")
-        for group in bind_data.get("YH_group_ids", []):
-            if group['sync']:
-                await yhtools.set_board(
-                    group['id'],
-                    "group", 
-                    board_content
-                )
-                logger.info(f"发送看板云湖群 {group['id']} 设置看板: {board_content}")
+        async def set_board(route):
+            await yhtools.set_board(
+                route.id,
+                "group", 
+                board_content
+            )
+            logger.info(f"发送看板云湖群 {route.id} 设置看板: {board_content}")
+
+        await DeliveryManager.deliver([route for route in routes if route.platform == "YH"], set_board)
 async def send_private_msg(platform, id, message_content):
     """发送私聊消息"""
     if platform == "QQ":
@@ -413,38 +412,20 @@ async def send_private_msg(platform, id, message_content):
 
 async def get_all_message_counts(platform, id_PF):
     """
-    获取所有类型的消息数量。
+    获取所有类型的消息数量（消息数和活跃用户数只统计保留时间 history.ttl 内的消息）。
     
     :param platform: 平台类型（QQ/YH）
     :param id_PF: 群聊或用户的ID
     :return: 包含所有类型消息数量的字典
     """
-    # 获取本地消息数量
-    key_local = f"{platform}:{id_PF}:{platform}:{id_PF}"
-    local_messages = redis_client.lrange(key_local, 0, -1)
-    total_count = len(local_messages) if local_messages else 0
-
-    # 获取同步消息数量
-    keys_ba = redis_client.keys(f"*:*:{platform}:{id_PF}")
-    ba_messages = []
-    for key in keys_ba:
-        ba_messages.extend(redis_client.lrange(key, 0, -1))
-    
-    # 使用集合去重
-    sync_messages = set(local_messages + ba_messages)
-    sync_count = len(sync_messages) if sync_messages else 0
+    counts = await MessageStore.get_counts(platform, id_PF)
+    total_count = counts["total"]
+    sync_count = counts["sync"]
+    active_users_count = counts["active_users"]
 
     # 获取敏感消息数量
     sensitive_key = f"sensitive_messages:{platform}:{id_PF}"
-    sensitive_messages = redis_client.lrange(sensitive_key, 0, -1)
-    sensitive_count = len(sensitive_messages) if sensitive_messages else 0
-
-    # 获取活跃用户数量
-    users = set()
-    for msg in local_messages + ba_messages:
-        message = json.loads(msg)
-        users.add(message["sender_id"])
-    active_users_count = len(users) if users else 0
+    sensitive_count = await redis_client.llen(sensitive_key)
 
     return {
         "code": 0,
@@ -454,7 +435,38 @@ async def get_all_message_counts(platform, id_PF):
         "sensitive_count": sensitive_count,
         "active_users_count": active_users_count
     }
-async def get_messages(platform, id_PF, message_type="local", page=1, page_size=20):
+def _format_message(message):
+    return {
+        "sender": message["sender_nickname"],
+        "content": message["message_content"],
+        "timestamp": message["timestamp"]
+    }
+
+async def _get_timeline_messages(platform, id_PF, view, page, page_size, before, after):
+    """
+    从时间线读取一页消息（按时间倒序）。
+    传入 before/after 游标时按游标分页，否则按页码分页。
+    """
+    offset = 0 if before is not None or after is not None else (page - 1) * page_size
+    items, total_count = await MessageStore.get_timeline(
+        MessageStore.timeline_key(view, platform, id_PF),
+        before=before, after=after, limit=page_size, offset=offset
+    )
+    messages = [_format_message(message) for message, _ in items]
+    scores = [score for _, score in items]
+    return {
+        "code": 0,
+        "msg": "成功",
+        "total_count": total_count,
+        "page": page,
+        "page_size": page_size,
+        "messages": messages,
+        # 下一页（更早）使用 before=next_before，查看更新的消息使用 after=next_after
+        "next_before": scores[-1] if scores else before,
+        "next_after": scores[0] if scores else after
+    }
+
+async def get_messages(platform, id_PF, message_type="local", page=1, page_size=20, before=None, after=None):
     """
     通用的消息获取方法。
     
@@ -463,29 +475,27 @@ async def get_messages(platform, id_PF, message_type="local", page=1, page_size=
     :param message_type: 消息类型（"local", "sync", "sensitive", "active_users"）
     :param page: 分页页码
     :param page_size: 分页大小
+    :param before: 时间戳游标，只返回更早的消息（local/sync）
+    :param after: 时间戳游标，只返回更新的消息（local/sync）
     :return: 消息详情或用户详情
     """
     if message_type == "local":
         # 获取本地消息
+        result = await _get_timeline_messages(platform, id_PF, "local", page, page_size, before, after)
+        if result["total_count"] or before is not None or after is not None:
+            return result
+
+        # 时间线为空时兼容旧数据（只有消息列表）
         key_local = f"{platform}:{id_PF}:{platform}:{id_PF}"
-        total_count = redis_client.llen(key_local)
+        total_count = await redis_client.llen(key_local)
         
-        # 计算分页偏移
-        start = (page - 1) * page_size
+        # 计算分页偏移（列表按时间正序，最新的在末尾）
+        start = -page * page_size
         end = start + page_size - 1
         
         # 获取分页数据
-        local_messages = redis_client.lrange(key_local, start, end)
-        
-        # 解析消息
-        messages = []
-        for msg in local_messages:
-            message = json.loads(msg)
-            messages.append({
-                "sender": message["sender_nickname"],
-                "content": message["message_content"],
-                "timestamp": message["timestamp"]
-            })
+        local_messages = await redis_client.lrange(key_local, start, end)
+        messages = [_format_message(message) for message in await MessageStore.resolve(local_messages)]
         
         # 按照时间戳倒序排列
         messages = sorted(messages, key=lambda x: x["timestamp"], reverse=True)
@@ -500,52 +510,18 @@ async def get_messages(platform, id_PF, message_type="local", page=1, page_size=
         }
     
     elif message_type == "sync":
-        # 获取同步消息
-        key_local = f"{platform}:{id_PF}:{platform}:{id_PF}"
-        local_messages = redis_client.lrange(key_local, 0, -1)
-        
-        keys_ba = redis_client.keys(f"*:*:{platform}:{id_PF}")
-        ba_messages = []
-        for key in keys_ba:
-            ba_messages.extend(redis_client.lrange(key, 0, -1))
-        
-        all_messages = []
-        seen = set()
-        for msg in local_messages + ba_messages:
-            if msg not in seen:
-                seen.add(msg)
-                message = json.loads(msg)
-                all_messages.append({
-                    "sender": message["sender_nickname"],
-                    "content": message["message_content"],
-                    "timestamp": message["timestamp"]
-                })
-        
-        all_messages = sorted(all_messages, key=lambda x: x["timestamp"], reverse=True)
-        
-        total_count = len(all_messages)
-        start = (page - 1) * page_size
-        end = start + page_size
-        messages = all_messages[start:end]
-        
-        return {
-            "code": 0,
-            "msg": "成功",
-            "total_count": total_count,
-            "page": page,
-            "page_size": page_size,
-            "messages": messages
-        }
+        # 获取同步消息（本群 + 绑定群聊转发过来的消息）
+        return await _get_timeline_messages(platform, id_PF, "sync", page, page_size, before, after)
     
     elif message_type == "sensitive":
         # 获取敏感消息
         sensitive_key = f"sensitive_messages:{platform}:{id_PF}"
-        total_count = redis_client.llen(sensitive_key)
+        total_count = await redis_client.llen(sensitive_key)
         
         start = (page - 1) * page_size
         end = start + page_size - 1
         
-        sensitive_messages = redis_client.lrange(sensitive_key, start, end)
+        sensitive_messages = await redis_client.lrange(sensitive_key, start, end)
         
         messages = []
         for msg in sensitive_messages:
@@ -571,28 +547,10 @@ async def get_messages(platform, id_PF, message_type="local", page=1, page_size=
         }
     
     elif message_type == "active_users":
-        # 获取活跃用户
-        key_local = f"{platform}:{id_PF}:{platform}:{id_PF}"
-        messages = redis_client.lrange(key_local, 0, -1)
-        
-        users = {}
-        for msg in messages:
-            message = json.loads(msg)
-            user_id = message["sender_id"]
-            if user_id not in users:
-                users[user_id] = {
-                    "nickname": message["sender_nickname"],
-                    "last_active": message["timestamp"],
-                    "message_count": 0
-                }
-            users[user_id]["message_count"] += 1
-        
-        sorted_users = sorted(users.values(), key=lambda x: x["message_count"], reverse=True)
-        
-        total_count = len(sorted_users)
-        start = (page - 1) * page_size
-        end = start + page_size
-        paged_users = sorted_users[start:end]
+        # 获取活跃用户（按发言次数倒序）
+        paged_users, total_count = await MessageStore.get_active_users(
+            platform, id_PF, offset=(page - 1) * page_size, limit=page_size
+        )
         
         return {
             "code": 0,
@@ -0,0 +1,377 @@
+import datetime
+import json
+import time
+import uuid
+from utils import logger
+from utils.config import redis_client, message_ttl
+
+"""
+消息存储
+
+每条消息的内容只保存一次: msg:{uid} -> JSON，带保留时间（message_ttl）。
+时间线和 msg_id:{平台消息ID} 只保存 uid。
+
+旧版本的消息列表（{平台}:{ID}:{平台}:{ID} 等）不再写入；列表项可能是 uid 或完整 JSON，读取时仍然兼容。
+启动时 migrate_legacy_lists 会把列表中仍在保留时间内的消息写入时间线（只执行一次），之后列表按保留时间过期。
+
+时间线（有序集合，成员为 uid，分数为发送时间戳）:
+- timeline:local:{平台}:{ID}: 该聊天自己发出的消息
+- timeline:sync:{平台}:{ID}: 该聊天能看到的所有消息（自己的 + 绑定群聊转发过来的）
+写入时顺带清理超过保留时间的成员，查询按时间游标分页，复杂度与历史长度无关。
+
+统计（随消息写入增量更新，查询不再扫描消息），统计范围与消息保留时间（message_ttl）一致:
+- 消息数: 直接使用时间线中保留时间内的成员数（local / sync），消息过期后自动不再计入
+- active_hll:{平台}:{ID}:{天}: 按天划分的 HyperLogLog，本群可见消息的发送者，
+  活跃用户数为最近 message_ttl 内各天的并集（估算），每天的键在超出保留时间后过期
+- active_count:{平台}:{ID}: 有序集合，本群用户 -> 发言次数（用户在保留时间内持续发言期间累计）
+- active_last:{平台}:{ID}: 有序集合，本群用户 -> 最后发言时间戳
+- active_nick:{平台}:{ID}: 哈希，本群用户 -> 最近使用的昵称
+超过 message_ttl 未发言的用户在查询活跃用户时移除；群聊超过 message_ttl 没有消息时以上键全部过期。
+"""
+
+MESSAGE_KEY_PREFIX = "msg:"
+# 每次 MGET 的最大键数量
+MGET_BATCH_SIZE = 500
+
+# 旧版消息列表迁移状态: running（迁移中，带过期时间）/ done
+MIGRATION_KEY = "history:migrated"
+MIGRATION_LOCK_TTL = 3600
+LEGACY_PLATFORMS = ("QQ", "YH", "MC")
+# 活跃用户 HyperLogLog 的时间分桶（秒）
+ACTIVE_BUCKET_SECONDS = 86400
+
+def timeline_key(view: str, platform: str, id) -> str:
+    return f"timeline:{view}:{platform}:{id}"
+
+def stats_key(kind: str, platform: str, id) -> str:
+    return f"{kind}:{platform}:{id}"
+
+def new_message_id() -> str:
+    return uuid.uuid4().hex
+
+def queue_message(pipe, message: dict, msg_id=None) -> str:
+    """
+    在 pipeline 中加入保存消息内容的命令（只序列化一次）。
+
+    :param pipe: Redis pipeline
+    :param message: 消息字典
+    :param msg_id: 平台消息ID，不为空时同时保存 msg_id:{msg_id} -> uid
+    :return: 消息 uid，用于写入各消息列表
+    """
+    uid = new_message_id()
+    pipe.set(f"{MESSAGE_KEY_PREFIX}{uid}", json.dumps({**message, "uid": uid}), ex=message_ttl)
+    if msg_id is not None:
+        pipe.set(f"msg_id:{msg_id}", uid, ex=message_ttl)
+    return uid
+
+def _decode(entry):
+    return entry.decode('utf-8') if isinstance(entry, bytes) else entry
+
+def _is_legacy(entry: str) -> bool:
+    """旧版本的列表项是完整的 JSON"""
+    return entry.startswith("{")
+
+async def resolve(entries) -> list:
+    """
+    将消息列表中的项（uid 或旧版 JSON）批量解析为消息字典，保持原顺序。
+    已过期或无法解析的消息会被跳过。
+
+    :param entries: LRANGE 等返回的列表项
+    :return: [消息字典, ...]
+    """
+    entries = [_decode(entry) for entry in entries]
+    uids = list(dict.fromkeys(entry for entry in entries if not _is_legacy(entry)))
+
+    bodies = {}
+    for start in range(0, len(uids), MGET_BATCH_SIZE):
+        batch = uids[start:start + MGET_BATCH_SIZE]
+        values = await redis_client.mget([f"{MESSAGE_KEY_PREFIX}{uid}" for uid in batch])
+        for uid, value in zip(batch, values):
+            if value is not None:
+                bodies[uid] = value
+
+    messages = []
+    for entry in entries:
+        raw = entry if _is_legacy(entry) else bodies.get(entry)
+        if raw is None:
+            continue
+        try:
+            messages.append(json.loads(raw))
+        except json.JSONDecodeError as e:
+            logger.error(f"解析消息失败: {e}")
+    return messages
+
+def entry_id(entry) -> str:
+    """列表项的唯一标识: uid，旧版 JSON 则为其原文"""
+    return _decode(entry)
+
+async def get_by_msg_id(msg_id):
+    """
+    根据平台消息ID获取消息。
+
+    :param msg_id: 平台消息ID
+    :return: 消息字典，不存在时返回 None
+    """
+    value = await redis_client.get(f"msg_id:{msg_id}")
+    if value is None:
+        return None
+    messages = await resolve([value])
+    return messages[0] if messages else None
+
+def queue_timeline(pipe, key: str, uid: str, score: float):
+    """在 pipeline 中把消息加入时间线，并移除超过保留时间的成员"""
+    pipe.zadd(key, {uid: score})
+    pipe.zremrangebyscore(key, "-inf", f"({score - message_ttl}")
+    pipe.expire(key, message_ttl)
+
+def queue_timelines(pipe, uid: str, local: tuple, sync_chats, score: float = None):
+    """
+    在 pipeline 中写入一条消息的所有时间线。
+
+    :param local: 消息来源 (平台, ID)
+    :param sync_chats: 能看到该消息的所有聊天 [(平台, ID), ...]（包含来源本身）
+    :param score: 时间戳，默认为当前时间
+    """
+    score = time.time() if score is None else score
+    queue_timeline(pipe, timeline_key("local", *local), uid, score)
+    for chat in dict.fromkeys(sync_chats):
+        queue_timeline(pipe, timeline_key("sync", *chat), uid, score)
+
+async def get_timeline(key: str, before=None, after=None, limit=20, offset=0) -> tuple:
+    """
+    按时间游标分页读取时间线，结果按时间倒序。
+
+    :param before: 只返回早于该时间戳的消息（不含）
+    :param after: 只返回晚于该时间戳的消息（不含），优先级高于 before
+    :param limit: 返回数量
+    :param offset: 跳过的数量（兼容按页码分页）
+    :return: ([(消息字典, 时间戳), ...], 时间线总数)
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    if after is not None:
+        # 取紧挨着 after 之后的 limit 条，再翻转为倒序
+        pipe.zrangebyscore(key, f"({after}", "+inf", start=offset, num=limit, withscores=True)
+    else:
+        max_score = f"({before}" if before is not None else "+inf"
+        pipe.zrevrangebyscore(key, max_score, "-inf", start=offset, num=limit, withscores=True)
+    pipe.zcard(key)
+    items, total_count = await pipe.execute()
+    if after is not None:
+        items = list(reversed(items))
+
+    uids = [_decode(uid) for uid, _ in items]
+    scores = {uid: score for uid, (_, score) in zip(uids, items)}
+    messages = await resolve(uids)
+    return [(message, scores[message["uid"]]) for message in messages], total_count
+
+def active_hll_key(platform: str, id, bucket: int) -> str:
+    return f"active_hll:{platform}:{id}:{bucket}"
+
+def _active_buckets(now: float) -> range:
+    """保留时间内的所有活跃用户分桶"""
+    return range(int((now - message_ttl) // ACTIVE_BUCKET_SECONDS), int(now // ACTIVE_BUCKET_SECONDS) + 1)
+
+def _queue_visible_sender(pipe, sender_id: str, chat: tuple, score: float):
+    """在 pipeline 中把发送者加入聊天当天的活跃用户 HyperLogLog，该天超出保留时间后过期"""
+    bucket = int(score // ACTIVE_BUCKET_SECONDS)
+    key = active_hll_key(*chat, bucket)
+    pipe.pfadd(key, sender_id)
+    pipe.expireat(key, int((bucket + 1) * ACTIVE_BUCKET_SECONDS + message_ttl))
+
+def _queue_expire_active(pipe, local: tuple):
+    for kind in ("active_count", "active_last", "active_nick"):
+        pipe.expire(stats_key(kind, *local), message_ttl)
+
+def queue_stats(pipe, message: dict, local: tuple, sync_chats, score: float = None):
+    """
+    在 pipeline 中更新活跃用户统计（消息数由时间线提供）。
+
+    :param message: 消息字典（需要 sender_id / sender_nickname）
+    :param local: 消息来源 (平台, ID)
+    :param sync_chats: 能看到该消息的所有聊天 [(平台, ID), ...]（包含来源本身）
+    :param score: 时间戳，默认为当前时间
+    """
+    score = time.time() if score is None else score
+    sender_id = str(message["sender_id"])
+    pipe.zincrby(stats_key("active_count", *local), 1, sender_id)
+    pipe.zadd(stats_key("active_last", *local), {sender_id: score})
+    pipe.hset(stats_key("active_nick", *local), sender_id, message["sender_nickname"])
+    _queue_expire_active(pipe, local)
+    for chat in dict.fromkeys(sync_chats):
+        _queue_visible_sender(pipe, sender_id, chat, score)
+
+async def get_counts(platform: str, id) -> dict:
+    """
+    获取保留时间内的消息数量统计，O(log n)。
+
+    :return: {"total": 本群消息数, "sync": 本群可见消息数, "active_users": 活跃用户数（估算）}
+    """
+    now = time.time()
+    cutoff = f"({now - message_ttl}"
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zcount(timeline_key("local", platform, id), cutoff, "+inf")
+    pipe.zcount(timeline_key("sync", platform, id), cutoff, "+inf")
+    pipe.pfcount(*(active_hll_key(platform, id, bucket) for bucket in _active_buckets(now)))
+    total, sync, active_users = await pipe.execute()
+    return {
+        "total": total,
+        "sync": sync,
+        "active_users": active_users
+    }
+
+async def _trim_inactive_users(platform: str, id):
+    """移除超过保留时间未发言的用户"""
+    last_key = stats_key("active_last", platform, id)
+    stale = await redis_client.zrangebyscore(last_key, "-inf", f"({time.time() - message_ttl}")
+    if not stale:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zrem(last_key, *stale)
+    pipe.zrem(stats_key("active_count", platform, id), *stale)
+    pipe.hdel(stats_key("active_nick", platform, id), *stale)
+    await pipe.execute()
+
+async def get_active_users(platform: str, id, offset=0, limit=20) -> tuple:
+    """
+    按发言次数倒序分页获取保留时间内发言过的用户，O(log n + limit)。
+
+    :return: ([{"user_id", "nickname", "last_active", "message_count"}, ...], 用户总数)
+    """
+    await _trim_inactive_users(platform, id)
+    count_key = stats_key("active_count", platform, id)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.zrevrange(count_key, offset, offset + limit - 1, withscores=True)
+    pipe.zcard(count_key)
+    ranked, total_count = await pipe.execute()
+    if not ranked:
+        return [], total_count
+
+    user_ids = [_decode(user_id) for user_id, _ in ranked]
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hmget(stats_key("active_nick", platform, id), user_ids)
+    for user_id in user_ids:
+        pipe.zscore(stats_key("active_last", platform, id), user_id)
+    nicknames, *last_active = await pipe.execute()
+
+    users = []
+    for user_id, (_, message_count), nickname, last in zip(user_ids, ranked, nicknames, last_active):
+        users.append({
+            "user_id": user_id,
+            "nickname": _decode(nickname),
+            "last_active": str(datetime.datetime.fromtimestamp(last)) if last is not None else None,
+            "message_count": int(message_count)
+        })
+    return users, total_count
+
+def _legacy_uid(raw: str) -> str:
+    """旧版 JSON 列表项的 uid，由内容决定，同一条消息出现在多个列表中时得到相同的 uid"""
+    return uuid.uuid5(uuid.NAMESPACE_OID, raw).hex
+
+def _message_time(message: dict):
+    """消息的发送时间戳，timestamp 字段缺失或无法解析时为 None"""
+    try:
+        return datetime.datetime.fromisoformat(message["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+async def _load_legacy_entries(entries) -> list:
+    """
+    把旧版列表项解析为 [(uid, 消息字典, 是否为 JSON 列表项), ...]，已过期的 uid 会被跳过。
+    """
+    entries = [_decode(entry) for entry in entries]
+    uids = [entry for entry in entries if not _is_legacy(entry)]
+    values = await redis_client.mget([f"{MESSAGE_KEY_PREFIX}{uid}" for uid in uids]) if uids else []
+    bodies = dict(zip(uids, values))
+
+    loaded = []
+    for entry in entries:
+        legacy = _is_legacy(entry)
+        raw = entry if legacy else bodies.get(entry)
+        if raw is None:
+            continue
+        try:
+            message = json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.error(f"解析消息失败: {e}")
+            continue
+        loaded.append((_legacy_uid(entry) if legacy else entry, message, legacy))
+    return loaded
+
+async def _migrate_list(key: str, local: tuple, is_local: bool) -> int:
+    """把一个旧版列表中仍在保留时间内的消息写入时间线并补充活跃用户统计，返回写入的消息数"""
+    migrated = 0
+    start = 0
+    while True:
+        entries = await redis_client.lrange(key, start, start + MGET_BATCH_SIZE - 1)
+        if not entries:
+            break
+        start += len(entries)
+        cutoff = time.time() - message_ttl
+        batch = []
+        for uid, message, legacy in await _load_legacy_entries(entries):
+            score = _message_time(message)
+            if score is not None and score > cutoff:
+                batch.append((uid, message, legacy, score))
+        if not batch:
+            continue
+
+        added = [False] * len(batch)
+        if is_local:
+            # 只统计新加入时间线的消息，上线后写入的消息在写入时已经统计过
+            pipe = redis_client.pipeline(transaction=False)
+            for uid, _, _, score in batch:
+                pipe.zadd(timeline_key("local", *local), {uid: score}, nx=True)
+            added = await pipe.execute()
+
+        pipe = redis_client.pipeline(transaction=False)
+        for (uid, message, legacy, score), new in zip(batch, added):
+            if legacy:
+                # 按原发送时间计算剩余的保留时间
+                pipe.set(f"{MESSAGE_KEY_PREFIX}{uid}", json.dumps({**message, "uid": uid}), ex=max(int(score - cutoff), 1), nx=True)
+            pipe.zadd(timeline_key("sync", *local), {uid: score})
+            sender_id = str(message.get("sender_id"))
+            _queue_visible_sender(pipe, sender_id, local, score)
+            if new:
+                pipe.zincrby(stats_key("active_count", *local), 1, sender_id)
+                pipe.zadd(stats_key("active_last", *local), {sender_id: score}, gt=True)
+                pipe.hsetnx(stats_key("active_nick", *local), sender_id, message.get("sender_nickname", ""))
+            migrated += 1
+        await pipe.execute()
+
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.expire(timeline_key("local", *local), message_ttl)
+    pipe.expire(timeline_key("sync", *local), message_ttl)
+    _queue_expire_active(pipe, local)
+    # 列表中的消息已全部写入时间线，不再需要长期保留
+    pipe.expire(key, message_ttl)
+    await pipe.execute()
+    return migrated
+
+async def migrate_legacy_lists() -> int:
+    """
+    把旧版消息列表中仍在保留时间内的消息写入时间线，并据此补充活跃用户统计（启动时在后台调用，只执行一次）:
+    - {平台}:{ID}:{平台}:{ID}（本群的消息）写入该群的 local 和 sync 时间线
+    - {平台}:{ID}:{其它平台}:{其它ID}（与绑定群聊之间的消息）写入该群的 sync 时间线
+    - 完整 JSON 的列表项另存为 msg:{uid}
+    重复执行不会产生重复的时间线成员；迁移失败时清除标记，下次启动时重新执行。
+
+    :return: 写入时间线的消息数（同一条消息出现在多个列表中时分别计数）
+    """
+    if not await redis_client.set(MIGRATION_KEY, "running", nx=True, ex=MIGRATION_LOCK_TTL):
+        return 0
+    migrated = 0
+    try:
+        for platform in LEGACY_PLATFORMS:
+            async for key in redis_client.scan_iter(match=f"{platform}:*", count=MGET_BATCH_SIZE, _type="list"):
+                key = _decode(key)
+                parts = key.split(":")
+                if len(parts) != 4 or parts[2] not in LEGACY_PLATFORMS:
+                    continue
+                local = (parts[0], parts[1])
+                migrated += await _migrate_list(key, local, (parts[2], parts[3]) == local)
+    except Exception:
+        await redis_client.delete(MIGRATION_KEY)
+        raise
+    await redis_client.set(MIGRATION_KEY, "done")
+    logger.info(f"旧版消息列表迁移完成, 共写入 {migrated} 条时间线消息")
+    return migrated
@@ -0,0 +1,273 @@
+import asyncio
+import json
+import time
+import zlib
+from collections import deque
+from utils import logger, pubsub
+from utils.config import (redis_client, outbox_shards, outbox_max_attempts, outbox_retry_delay, outbox_max_retry_delay,
+                          outbox_batch_size, outbox_max_buffered, outbox_lease_ttl, outbox_dead_letter_maxlen)
+from . import DeliveryManager
+
+"""
+发送队列（基于 Redis Streams）
+
+入站处理只需把投递任务写入队列即可返回，由后台协程负责实际发送:
+- outbox:{分片}: 每个目标群聊固定落在一个分片，分片内同一群聊的消息按顺序发送
+- 每个分片同一时间只由一个进程消费（outbox:lease:{分片} 租约），消费者名固定为 shard-{分片}，
+  接手分片的进程会先读取该消费者未确认的消息，进程崩溃或重启不会丢消息
+- 不同群聊并发发送（受 DeliveryManager 并发上限和超时限制），某个群聊失败时只阻塞该群聊，
+  按指数退避重试，超过最大次数后写入死信队列 outbox:dead（最多保留约 outbox_dead_letter_maxlen 条）
+- 发送成功或进入死信队列后 XACK + XDEL，队列中只保留未完成的任务
+"""
+
+STREAM_PREFIX = "outbox:"
+DEAD_LETTER_STREAM = "outbox:dead"
+GROUP = "outbox"
+
+# 获取或续期租约: 1 为续期成功，2 为新获得租约，0 为租约属于其它进程
+LEASE_LUA = """
+local owner = redis.call('GET', KEYS[1])
+if owner == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+if not owner then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 2
+end
+return 0
+"""
+
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_lease_script = redis_client.register_script(LEASE_LUA)
+_release_script = redis_client.register_script(RELEASE_LUA)
+
+# 投递类型 -> async handler(target, payload)
+_handlers = {}
+workers = []
+stats = {"enqueued": 0, "delivered": 0, "retried": 0, "dead": 0}
+
+def register_handler(kind, handler):
+    """注册投递类型的发送函数，handler 发送失败时需要抛出异常"""
+    _handlers[kind] = handler
+
+def stream_key(shard) -> str:
+    return f"{STREAM_PREFIX}{shard}"
+
+def shard_of(platform, id) -> int:
+    return zlib.crc32(f"{platform}:{id}".encode("utf-8")) % outbox_shards
+
+async def enqueue(kind, targets, payload) -> list:
+    """
+    把投递任务写入队列（一次往返）。
+
+    :param kind: 投递类型（register_handler 注册的名称）
+    :param targets: [(平台, ID, ...), ...]
+    :param payload: 可 JSON 序列化的内容，原样传给 handler
+    :return: 各目标的队列消息ID
+    """
+    if not targets:
+        return []
+    data = json.dumps(payload)
+    pipe = redis_client.pipeline(transaction=False)
+    for target in targets:
+        platform, target_id = target[0], str(target[1])
+        pipe.xadd(stream_key(shard_of(platform, target_id)), {
+            "kind": kind,
+            "platform": platform,
+            "id": target_id,
+            "payload": data,
+            "created": time.time()
+        })
+    entry_ids = await pipe.execute()
+    stats["enqueued"] += len(entry_ids)
+    return entry_ids
+
+def _decode(fields):
+    return {key.decode("utf-8"): value.decode("utf-8") for key, value in fields.items()}
+
+class ShardWorker:
+    def __init__(self, shard):
+        self.shard = shard
+        self.stream = stream_key(shard)
+        self.consumer = f"shard-{shard}"
+        self.lease_key = f"{STREAM_PREFIX}lease:{shard}"
+        # 目标群聊 -> 待发送的 (消息ID, 字段)
+        self.queues = {}
+        # 目标群聊 -> 按顺序发送该群聊消息的任务
+        self.tasks = {}
+        self.buffered = 0
+        # 缓冲的消息数降到 outbox_max_buffered 以下时置位，唤醒等待中的读取循环
+        self.drained = asyncio.Event()
+        self.owned = False
+        # "0" 表示先读取未确认的历史消息，读完后切换为 ">"（新消息）
+        self.last_id = "0"
+
+    async def run(self):
+        while True:
+            try:
+                lease = await _lease_script(keys=[self.lease_key], args=[pubsub.WORKER_ID, outbox_lease_ttl * 1000])
+                if not lease:
+                    if self.owned:
+                        logger.warning(f"发送队列分片 {self.shard} 的租约已被其它进程获得")
+                        self._reset()
+                    await asyncio.sleep(outbox_lease_ttl / 3)
+                    continue
+                if lease == 2 or not self.owned:
+                    self._reset()
+                    self.owned = True
+                if self.buffered >= outbox_max_buffered:
+                    # 目标群聊发送缓慢时等待缓冲腾出空间，不反复访问 Redis；超时后回到循环开头按时续期租约
+                    self.drained.clear()
+                    try:
+                        await asyncio.wait_for(self.drained.wait(), outbox_lease_ttl / 3)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._read()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"发送队列分片 {self.shard} 读取失败: {e}")
+                await asyncio.sleep(1)
+
+    async def _read(self):
+        history = self.last_id != ">"
+        response = await redis_client.xreadgroup(
+            GROUP, self.consumer, {self.stream: self.last_id},
+            count=outbox_batch_size, block=None if history else 1000
+        )
+        entries = response[0][1] if response else []
+        if history:
+            if not entries:
+                self.last_id = ">"
+                return
+            self.last_id = entries[-1][0]
+        for entry_id, fields in entries:
+            if not fields:
+                # 历史消息已被删除，只需确认
+                await redis_client.xack(self.stream, GROUP, entry_id)
+                continue
+            self._buffer(entry_id, _decode(fields))
+
+    def _buffer(self, entry_id, fields):
+        target = (fields.get("platform"), fields.get("id"))
+        self.queues.setdefault(target, deque()).append((entry_id, fields))
+        self.buffered += 1
+        if target not in self.tasks:
+            task = asyncio.create_task(self._drain(target))
+            self.tasks[target] = task
+            task.add_done_callback(lambda task, target=target: self._task_done(target, task))
+
+    def _task_done(self, target, task):
+        # 重置后同一群聊可能已经有新的任务
+        if self.tasks.get(target) is task:
+            del self.tasks[target]
+
+    async def _drain(self, target):
+        queue = self.queues[target]
+        while queue and self.owned:
+            entry_id, fields = queue[0]
+            await self._deliver(target, entry_id, fields)
+            if not self.owned:
+                return
+            queue.popleft()
+            self.buffered -= 1
+            if self.buffered < outbox_max_buffered:
+                self.drained.set()
+        if not queue:
+            self.queues.pop(target, None)
+
+    async def _deliver(self, target, entry_id, fields):
+        kind = fields.get("kind")
+        handler = _handlers.get(kind)
+        if handler is None:
+            await self._dead_letter(entry_id, fields, f"未知的投递类型: {kind}", 0)
+            return
+        payload = json.loads(fields.get("payload") or "null")
+
+        attempt = 0
+        while self.owned:
+            result = (await DeliveryManager.deliver([target], lambda target: handler(target, payload)))[0]
+            if result["status"] == "ok":
+                await self._finish(entry_id)
+                stats["delivered"] += 1
+                return
+            attempt += 1
+            if attempt >= outbox_max_attempts:
+                await self._dead_letter(entry_id, fields, result["error"], attempt)
+                return
+            stats["retried"] += 1
+            delay = min(outbox_retry_delay * (2 ** (attempt - 1)), outbox_max_retry_delay)
+            logger.warning(f"投递到 {target[0]} 群 {target[1]} 失败, {delay} 秒后重试({attempt}/{outbox_max_attempts - 1})")
+            await asyncio.sleep(delay)
+        # 失去租约时保留未确认状态，由新的分片持有者重新投递
+
+    async def _finish(self, entry_id, pipe=None):
+        pipe = redis_client.pipeline(transaction=True) if pipe is None else pipe
+        pipe.xack(self.stream, GROUP, entry_id)
+        pipe.xdel(self.stream, entry_id)
+        await pipe.execute()
+
+    async def _dead_letter(self, entry_id, fields, error, attempts):
+        logger.error(f"投递到 {fields.get('platform')} 群 {fields.get('id')} 最终失败, 已写入死信队列: {error}")
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.xadd(DEAD_LETTER_STREAM, {**fields, "error": str(error), "attempts": attempts, "failed_at": time.time()},
+                  maxlen=outbox_dead_letter_maxlen, approximate=True)
+        await self._finish(entry_id, pipe)
+        stats["dead"] += 1
+
+    def _reset(self):
+        """丢弃内存中的待发送消息（仍在 Redis 中未确认），之后从历史消息重新读取"""
+        self.owned = False
+        for task in list(self.tasks.values()):
+            task.cancel()
+        self.tasks.clear()
+        self.queues.clear()
+        self.buffered = 0
+        self.drained.set()
+        self.last_id = "0"
+
+async def _ensure_group(stream):
+    try:
+        await redis_client.xgroup_create(stream, GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+async def start():
+    """启动所有分片的消费协程（服务启动时调用）"""
+    if workers:
+        return
+    for shard in range(outbox_shards):
+        await _ensure_group(stream_key(shard))
+        worker = ShardWorker(shard)
+        worker.task = asyncio.create_task(worker.run())
+        workers.append(worker)
+    logger.info(f"发送队列已启动, 分片数: {outbox_shards}")
+
+async def stop():
+    """停止消费并释放租约，未完成的消息保留在队列中，由下次启动或其它进程继续发送"""
+    for worker in workers:
+        worker.task.cancel()
+        worker._reset()
+    await asyncio.gather(*(worker.task for worker in workers), return_exceptions=True)
+    for worker in workers:
+        try:
+            await _release_script(keys=[worker.lease_key], args=[pubsub.WORKER_ID])
+        except Exception as e:
+            logger.error(f"释放发送队列分片 {worker.shard} 的租约失败: {e}")
+    workers.clear()
+
+def get_stats():
+    return {
+        **stats,
+        "owned_shards": [worker.shard for worker in workers if worker.owned],
+        "buffered": sum(worker.buffered for worker in workers)
+    }
@@ -0,0 +1,125 @@
+import json
+from utils import logger
+from utils.cache import TTLCache, SingleFlight, MISSING
+from utils.config import redis_client, profile_local_ttl, profile_ttl, profile_negative_ttl, profile_error_ttl, profile_cache_max_size
+from .ToolManager import YunhuTools
+
+"""
+云湖资料（群聊 / 用户）
+
+云湖没有查询资料的接口，只能抓取 yhchat.com 主页解析，因此:
+- 一次抓取解析出全部字段，昵称、头像等查询共用同一份资料
+- 两级缓存: 进程内 LRU（profile_local_ttl）+ Redis（yh_profile:{类型}:{ID}，profile_ttl）
+- 主页显示“对象不存在”（code 2）时缓存 None（profile_negative_ttl），抓取失败时只在本地短暂缓存
+- 同一资料的并发查询只发起一次请求
+"""
+
+PROFILE_KEY_PREFIX = "yh_profile:"
+
+# 类型 -> (主页地址, “不存在”页面的标记, 解析规则, 必须解析到的字段)
+PROFILE_PAGES = {
+    "user": (
+        "https://www.yhchat.com/user/homepage/{}",
+        "data-v-34a9b5c4>ID </span>",
+        {
+            "nickname": r'nickname:"(.*?)"',
+            "avatarUrl": r'avatarUrl:"(.*?)"',
+            "registerTimeText": r'registerTimeText:"(.*?)"',
+            "isVip": r'isVip:(.*?)}/'
+        },
+        ("nickname", "avatarUrl")
+    ),
+    "group": (
+        "https://www.yhchat.com/group/homepage/{}",
+        "data-v-6eef215f>ID </span>",
+        {
+            "name": r'name:"(.*?)"',
+            "introduction": r'introduction:"(.*?)"',
+            "avatarUrl": r'avatarUrl:"(.*?)"',
+            "headcount": r'headcount:(\d+)'
+        },
+        ("name",)
+    )
+}
+
+profile_cache = TTLCache(max_size=profile_cache_max_size, ttl=profile_local_ttl)
+# (类型, ID) -> 正在进行的抓取任务
+inflight = SingleFlight()
+stats = {"redis_hits": 0, "fetches": 0, "not_found": 0, "errors": 0}
+yhtools = YunhuTools()
+
+def profile_key(kind, id) -> str:
+    return f"{PROFILE_KEY_PREFIX}{kind}:{id}"
+
+async def get_profile(kind, id):
+    """
+    获取云湖群聊 / 用户的资料。
+
+    :param kind: "user" 或 "group"
+    :param id: 用户ID / 群ID
+    :return: 资料字典（字段见 PROFILE_PAGES），不存在或获取失败时为 None
+    """
+    key = (kind, str(id))
+    profile = profile_cache.get(key)
+    if profile is not MISSING:
+        return profile
+    return await inflight.do(key, _load, kind, str(id))
+
+async def _load(kind, id):
+    key = (kind, id)
+    try:
+        raw = await redis_client.get(profile_key(kind, id))
+    except Exception as e:
+        logger.error(f"读取云湖{kind}资料缓存失败: {e}")
+        raw = None
+    if raw is not None:
+        stats["redis_hits"] += 1
+        profile = json.loads(raw)
+        profile_cache.set(key, profile)
+        return profile
+
+    url, check_string, patterns, required = PROFILE_PAGES[kind]
+    stats["fetches"] += 1
+    try:
+        response = await yhtools.fetch_data(url.format(id), check_string, patterns, required=required)
+    except Exception as e:
+        # 任何抓取异常都按请求失败处理，避免每条消息都重新抓取
+        response = {"code": -1, "msg": str(e) or type(e).__name__}
+    if response["code"] == 1:
+        profile, ttl = response["data"], profile_ttl
+    elif response["code"] == 2:
+        stats["not_found"] += 1
+        profile, ttl = None, profile_negative_ttl
+    else:
+        # 网络错误或页面结构变化，不写入 Redis，短时间后重试
+        stats["errors"] += 1
+        logger.warning(f"获取云湖{kind} {id} 的资料失败: {response['msg']}")
+        profile_cache.set(key, None, ttl=profile_error_ttl)
+        return None
+
+    profile_cache.set(key, profile, ttl=min(ttl, profile_local_ttl))
+    try:
+        await redis_client.set(profile_key(kind, id), json.dumps(profile, ensure_ascii=False), ex=ttl)
+    except Exception as e:
+        logger.error(f"写入云湖{kind}资料缓存失败: {e}")
+    return profile
+
+async def invalidate(kind, id):
+    """删除资料缓存（例如群名称修改后）"""
+    profile_cache.invalidate((kind, str(id)))
+    await redis_client.delete(profile_key(kind, id))
+
+async def get_group_name(group_id):
+    profile = await get_profile("group", group_id)
+    return profile["name"] if profile else group_id
+
+async def get_user_nickname(user_id):
+    profile = await get_profile("user", user_id)
+    return profile["nickname"] if profile else user_id
+
+async def get_user_avatar_url(user_id):
+    profile = await get_profile("user", user_id)
+    return profile["avatarUrl"] if profile else None
+
+def get_stats():
+    return {**stats, "shared": inflight.shared, "local": profile_cache.get_stats(), "inflight": len(inflight)}
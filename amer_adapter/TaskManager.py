@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import deque
+from utils import logger
+from utils.config import task_max_concurrent, task_max_retries, task_retry_delay, task_drain_timeout
+
+"""
+后台任务管理
+
+用于执行不需要等待结果的副作用（解绑通知、AI 异步消息的同步转发等）:
+- 所有任务都运行在主事件循环上，不再为每个任务创建新的事件循环
+- 通过信号量限制并发，解绑大量群聊时不会瞬间发出大量请求
+- 失败后按指数退避重试，最终失败的任务会被记录
+- 服务关闭时等待进行中的任务完成
+"""
+
+class TaskSupervisor:
+    def __init__(self, max_concurrent=task_max_concurrent, max_retries=task_max_retries, retry_delay=task_retry_delay):
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.loop = None
+        self.semaphore = None
+        self.tasks = set()
+        self.closing = False
+        self.stats = {"scheduled": 0, "succeeded": 0, "failed": 0, "retried": 0, "rejected": 0}
+        # 最近失败的任务
+        self.failures = deque(maxlen=50)
+
+    def start(self, loop=None):
+        """绑定主事件循环，需要在事件循环中调用（启动时）"""
+        self.loop = loop or asyncio.get_running_loop()
+        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.closing = False
+        logger.info(f"后台任务管理器已启动, 最大并发: {self.max_concurrent}")
+
+    def submit(self, async_func, *args, name=None, retries=None, **kwargs):
+        """
+        提交一个后台任务，可在任意线程中调用。
+
+        :param async_func: 异步函数
+        :param name: 任务名称，用于日志
+        :param retries: 重试次数，默认使用配置值
+        :return: 在事件循环线程中调用时返回 asyncio.Task，否则返回 None
+        """
+        name = name or getattr(async_func, "__qualname__", str(async_func))
+        retries = self.max_retries if retries is None else retries
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if self.loop is None:
+            if running_loop is not None:
+                self.start(running_loop)
+            else:
+                # 没有运行中的事件循环（例如命令行脚本），直接同步执行
+                logger.warning(f"后台任务管理器未启动, 同步执行任务: {name}")
+                self.stats["scheduled"] += 1
+                asyncio.run(self._run(async_func, args, kwargs, name, retries, bounded=False))
+                return None
+
+        if running_loop is self.loop:
+            return self._schedule(async_func, args, kwargs, name, retries)
+        self.loop.call_soon_threadsafe(self._schedule, async_func, args, kwargs, name, retries)
+        return None
+
+    def _schedule(self, async_func, args, kwargs, name, retries):
+        if self.closing:
+            self.stats["rejected"] += 1
+            logger.warning(f"服务正在关闭, 拒绝新的后台任务: {name}")
+            return None
+        self.stats["scheduled"] += 1
+        task = self.loop.create_task(self._run(async_func, args, kwargs, name, retries))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def _run(self, async_func, args, kwargs, name, retries, bounded=True):
+        for attempt in range(retries + 1):
+            try:
+                if bounded:
+                    async with self.semaphore:
+                        await async_func(*args, **kwargs)
+                else:
+                    await async_func(*args, **kwargs)
+                self.stats["succeeded"] += 1
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt < retries:
+                    self.stats["retried"] += 1
+                    delay = self.retry_delay * (2 ** attempt)
+                    logger.warning(f"后台任务 {name} 失败, {delay} 秒后重试({attempt + 1}/{retries}): {e}")
+                    await asyncio.sleep(delay)
+                else:
+                    self.stats["failed"] += 1
+                    self.failures.append({"name": name, "error": str(e), "time": time.time()})
+                    logger.error(f"后台任务 {name} 最终失败: {e}")
+
+    async def drain(self, timeout=task_drain_timeout):
+        """停止接收新任务并等待进行中的任务完成，超时后取消剩余任务"""
+        self.closing = True
+        if not self.tasks:
+            return
+        logger.info(f"等待 {len(self.tasks)} 个后台任务完成")
+        done, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(f"{len(pending)} 个后台任务在关闭时被取消")
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            "in_flight": len(self.tasks),
+            "recent_failures": list(self.failures)
+        }
+
+supervisor = TaskSupervisor()
+
+def submit(async_func, *args, **kwargs):
+    return supervisor.submit(async_func, *args, **kwargs)
+
+def get_stats():
+    return supervisor.get_stats()
@@ -1,21 +1,61 @@
 # QQ 类
-from utils import logger
+from utils import logger, limiter, pubsub, scheduler, http
+from utils.cache import TTLCache, SizedLRUCache, SingleFlight, MISSING
+from utils.config import ban_cache_ttl, ban_cache_max_size, forward_cache_max_size, forward_cache_max_bytes
 import asyncio
 
 # YunHu 类
 import json
 import requests
 import uuid
+import zlib
 # CQCodeHandler 类
 import html
 from datetime import datetime
 import base64
 import re
 from pathlib import Path
+from urllib.parse import quote
 import time
 from typing import List, Dict, Optional, Tuple
 from math import ceil
 import aiohttp
+
+# 封禁信息: ban:{user_id} 哈希（reason / expire / notified），限时封禁带过期时间
+# 封禁用户索引: ban:users 有序集合，分数为解封时间戳（永久封禁为 +inf）
+BAN_KEY_PREFIX = "ban:"
+BAN_INDEX_KEY = "ban:users"
+BAN_CHANNEL = "ban:changes"
+
+# 只有第一个处理该用户消息的进程会拿到“未通知”，保证封禁通知只发一次
+MARK_NOTIFIED_LUA = """
+if redis.call('HEXISTS', KEYS[1], 'reason') == 1 then
+    return redis.call('HSETNX', KEYS[1], 'notified', '1')
+end
+return 0
+"""
+
+# 本地封禁状态缓存: user_id -> 封禁信息字典，未封禁时为 None（负缓存）
+# 绝大多数消息的发送者未被封禁，命中缓存时无需访问 Redis
+ban_cache = TTLCache(max_size=ban_cache_max_size, ttl=ban_cache_ttl)
+
+# 合并转发展开结果: 转发ID -> {"nodes", "html", "text"}
+# 转发ID对应的内容不会改变，按条目数和总大小淘汰，同一转发被多个群同步或被多次转发时不再重新获取和渲染
+forward_cache = SizedLRUCache(max_size=forward_cache_max_size, max_bytes=forward_cache_max_bytes)
+forward_inflight = SingleFlight()
+# 转发节点: forward:{转发ID} 字符串（JSON），供网页分页查看未展开的部分
+FORWARD_KEY_PREFIX = "forward:"
+FORWARD_URL = "https://amer.bot.anran.xyz/sync/forward"
+FORWARD_NODE_STYLE = "background-color: #f9f9f9; padding: 5px; border-radius: 5px; margin-bottom: 5px;"
+
+def handle_ban_event(event):
+    """其它进程封禁 / 解封用户后，使本地缓存失效"""
+    if event.get("origin") != pubsub.WORKER_ID:
+        ban_cache.invalidate(str(event.get("user_id")))
+
+# 断线期间可能错过事件，重连后清空缓存
+pubsub.subscribe(BAN_CHANNEL, handle_ban_event, on_reconnect=ban_cache.clear)
+
 class BaseTools:
     def __init__(self):
         from utils.config import redis_client
@@ -26,7 +66,7 @@ class BaseTools:
                 qqtools = QQTools()
                 return await qqtools.get_user_nickname(user_id)
             elif platform.lower() == 'yh':
-                yhtools = YHTools()
+                yhtools = YunhuTools()
                 return await yhtools.get_user_nickname(user_id)
             else:
                 return user_id
@@ -61,17 +101,12 @@ class BaseTools:
         :return: 包含消息内容的列表
         """
         if msg_id is not None:
-            # 尝试从 Redis 中获取消息
-            stored_message = self.redis_client.get(f"msg_id:{msg_id}")
-            if stored_message:
-                try:
-                    # 解析存储的消息内容
-                    message_data = json.loads(stored_message)
-                    logger.info(f"找到 msg_id: msg_id:{msg_id} -> {message_data}")
-                    return [message_data]
-                except json.JSONDecodeError as e:
-                    logger.error(f"解析消息失败: {e}")
-                    return []
+            # 尝试从 Redis 中获取消息（兼容旧版直接保存的 JSON）
+            from . import MessageStore
+            message_data = await MessageStore.get_by_msg_id(msg_id)
+            if message_data:
+                logger.info(f"找到 msg_id: msg_id:{msg_id} -> {message_data}")
+                return [message_data]
             else:
                 logger.info(f"未找到 msg_id 为 {msg_id} 的消息")
                 return []
@@ -87,25 +122,27 @@ class BaseTools:
         :param duration: 封禁时长（秒），默认为永久封禁
         :return: 是否成功添加到黑名单
         """
-        key = f"blacklist:{user_id}"
-        notified_key = f"blacklist_notified:{user_id}"
-        expire_key = f"blacklist_expire:{user_id}"
-
-        # 设置封禁原因
-        self.redis_client.set(key, reason)
-        # 初始化通知状态
-        self.redis_client.set(notified_key, "false")
-        # 设置封禁过期时间（如果指定了时长）
+        user_id = str(user_id)
+        key = self.ban_key(user_id)
+        entry = {"reason": reason, "notified": False, "expire": None}
+
+        pipe = self.redis_client.pipeline(transaction=True)
+        # 覆盖之前的封禁信息（包括通知状态）
+        pipe.delete(key)
         if duration:
-            expire_time = int(time.time()) + duration
-            self.redis_client.set(expire_key, expire_time)
-            self.redis_client.expire(key, duration)  # 自动删除过期的黑名单记录
-            self.redis_client.expire(notified_key, duration)
-            self.redis_client.expire(expire_key, duration)
+            entry["expire"] = int(time.time()) + duration
+            pipe.hset(key, mapping={"reason": reason, "expire": entry["expire"]})
+            # 自动删除过期的黑名单记录
+            pipe.expire(key, duration)
+            pipe.zadd(BAN_INDEX_KEY, {user_id: entry["expire"]})
         else:
             # 永久封禁时不设置过期时间
-            self.redis_client.delete(expire_key)
+            pipe.hset(key, mapping={"reason": reason})
+            pipe.zadd(BAN_INDEX_KEY, {user_id: float("inf")})
+        await pipe.execute()
 
+        ban_cache.set(user_id, entry)
+        await pubsub.publish_async(self.redis_client, BAN_CHANNEL, {"user_id": user_id, "action": "add"})
         return True
 
     async def remove_from_blacklist(self, user_id: str):
@@ -115,50 +152,116 @@ class BaseTools:
         :param user_id: 用户ID
         :return: 是否成功移除
         """
-        key = f"blacklist:{user_id}"
-        notified_key = f"blacklist_notified:{user_id}"
-        expire_key = f"blacklist_expire:{user_id}"
-        self.redis_client.delete(key, notified_key, expire_key)
+        user_id = str(user_id)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.delete(self.ban_key(user_id))
+        pipe.zrem(BAN_INDEX_KEY, user_id)
+        await pipe.execute()
+
+        ban_cache.set(user_id, None)
+        await pubsub.publish_async(self.redis_client, BAN_CHANNEL, {"user_id": user_id, "action": "remove"})
         return True
 
+    def ban_key(self, user_id: str) -> str:
+        return f"{BAN_KEY_PREFIX}{user_id}"
+
+    def parse_ban(self, data: dict):
+        """
+        将 HGETALL ban:{user_id} 的结果解析为封禁信息。
+
+        :return: {"reason", "notified", "expire"}，未封禁时返回 None
+        """
+        data = {key.decode('utf-8'): value.decode('utf-8') for key, value in (data or {}).items()}
+        if "reason" not in data:
+            return None
+        return {
+            "reason": data["reason"],
+            "notified": "notified" in data,
+            "expire": int(data["expire"]) if data.get("expire") else None
+        }
+
+    def get_cached_ban(self, user_id: str):
+        """从本地缓存获取封禁信息，未缓存时返回 MISSING"""
+        return ban_cache.get(str(user_id))
+
+    def cache_ban(self, user_id: str, entry):
+        ban_cache.set(str(user_id), entry)
+
     async def is_in_blacklist(self, user_id: str):
         """
         检查用户是否在黑名单中，并返回详细封禁信息。
+        优先使用本地缓存，未命中时读取一次 ban:{user_id}。
         
         :param user_id: 用户ID
         :return: 封禁状态字典
         """
-        key = f"blacklist:{user_id}"
-        notified_key = f"blacklist_notified:{user_id}"
-        expire_key = f"blacklist_expire:{user_id}"
+        entry = self.get_cached_ban(user_id)
+        if entry is MISSING:
+            entry = self.parse_ban(await self.redis_client.hgetall(self.ban_key(user_id)))
+            self.cache_ban(user_id, entry)
+        return await self.resolve_ban_status(user_id, entry)
 
-        if not self.redis_client.exists(key):
-            return {"is_banned": False, "reason": None, "notified": False, "remaining_time": None}
+    async def resolve_ban_status(self, user_id: str, entry):
+        """
+        根据封禁信息计算封禁状态（封禁信息可来自缓存或与其它命令合并的 pipeline）。
 
-        # 获取封禁原因
-        reason = self.redis_client.get(key).decode('utf-8')
-        # 获取通知状态
-        notified = self.redis_client.get(notified_key)
-        notified = notified.decode('utf-8') if notified else "false"
-        # 获取封禁过期时间
-        expire_time = self.redis_client.get(expire_key)
-        expire_time = int(expire_time.decode('utf-8')) if expire_time else None
+        :param user_id: 用户ID
+        :param entry: parse_ban 的返回值
+        :return: 封禁状态字典
+        """
+        if entry is None:
+            return {"is_banned": False, "reason": None, "notified": False, "remaining_time": None}
 
         current_time = int(time.time())
-        if expire_time and current_time > expire_time:
+        if entry["expire"] and current_time > entry["expire"]:
             # 如果封禁已过期，自动移除黑名单记录
             await self.remove_from_blacklist(user_id)
             return {"is_banned": False, "reason": None, "notified": False, "remaining_time": None}
 
         # 计算剩余封禁时间
-        remaining_time = expire_time - current_time if expire_time else None
+        remaining_time = entry["expire"] - current_time if entry["expire"] else None
 
-        if notified == "true":
-            return {"is_banned": True, "reason": reason, "notified": True, "remaining_time": remaining_time}
-        else:
-            # 标记为已通知
-            self.redis_client.set(notified_key, "true")
-            return {"is_banned": True, "reason": reason, "notified": False, "remaining_time": remaining_time}
+        if entry["notified"]:
+            return {"is_banned": True, "reason": entry["reason"], "notified": True, "remaining_time": remaining_time}
+
+        # 标记为已通知
+        first = await self.redis_client.eval(MARK_NOTIFIED_LUA, 1, self.ban_key(user_id))
+        entry["notified"] = True
+        return {"is_banned": True, "reason": entry["reason"], "notified": not first, "remaining_time": remaining_time}
+
+    async def migrate_legacy_blacklist(self):
+        """
+        将旧版的 blacklist:{id} / blacklist_notified:{id} / blacklist_expire:{id}
+        迁移为 ban:{id} 哈希并写入索引，迁移后删除旧键。
+        """
+        migrated = 0
+        async for key in self.redis_client.scan_iter(match="blacklist:*", count=500):
+            user_id = key.decode('utf-8').split(":", 1)[1]
+            legacy_keys = [f"blacklist:{user_id}", f"blacklist_notified:{user_id}", f"blacklist_expire:{user_id}"]
+            reason, notified, expire_time = await self.redis_client.mget(legacy_keys)
+            if reason is None:
+                continue
+            expire_time = int(expire_time.decode('utf-8')) if expire_time else None
+            if expire_time and expire_time <= int(time.time()):
+                await self.redis_client.delete(*legacy_keys)
+                continue
+
+            mapping = {"reason": reason}
+            if notified and notified.decode('utf-8') == "true":
+                mapping["notified"] = "1"
+            if expire_time:
+                mapping["expire"] = expire_time
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.hset(self.ban_key(user_id), mapping=mapping)
+            if expire_time:
+                pipe.expireat(self.ban_key(user_id), expire_time)
+            pipe.zadd(BAN_INDEX_KEY, {user_id: expire_time or float("inf")})
+            pipe.delete(*legacy_keys)
+            await pipe.execute()
+            ban_cache.invalidate(user_id)
+            migrated += 1
+        if migrated:
+            logger.info(f"已迁移 {migrated} 条旧版黑名单记录")
 
     async def get_all_blacklist(self, page: int = 1, page_size: int = 10) -> dict:
         """
@@ -169,31 +272,33 @@ class BaseTools:
         :return: 包含分页数据和总数的字典
         """
         try:
-            # 获取所有黑名单键
-            blacklist_keys = self.redis_client.keys("blacklist:*")
-            total_count = len(blacklist_keys)
-            
-            # 计算分页范围
+            # 先清理索引中已过期的封禁，再分页读取
+            current_time = int(time.time())
             start_index = (page - 1) * page_size
-            end_index = start_index + page_size
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zremrangebyscore(BAN_INDEX_KEY, "-inf", current_time)
+            pipe.zcard(BAN_INDEX_KEY)
+            pipe.zrange(BAN_INDEX_KEY, start_index, start_index + page_size - 1)
+            _, total_count, user_ids = await pipe.execute()
+            user_ids = [user_id.decode('utf-8') for user_id in user_ids]
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.hgetall(self.ban_key(user_id))
             
             # 提取黑名单信息
             blacklist_data = []
-            for key in blacklist_keys[start_index:end_index]:
-                user_id = key.decode('utf-8').split(":")[1]
-                reason = self.redis_client.get(key).decode('utf-8')
-                notified = self.redis_client.get(f"blacklist_notified:{user_id}")
-                notified = notified.decode('utf-8') if notified else "false"
-                expire_time = self.redis_client.get(f"blacklist_expire:{user_id}")
-                expire_time = int(expire_time.decode('utf-8')) if expire_time else None
-                
-                current_time = int(time.time())
+            for user_id, data in zip(user_ids, await pipe.execute() if user_ids else []):
+                entry = self.parse_ban(data)
+                if entry is None:
+                    continue
+                expire_time = entry["expire"]
                 remaining_time = expire_time - current_time if expire_time and expire_time > current_time else None
                 
                 blacklist_data.append({
                     "user_id": user_id,
-                    "reason": reason,
-                    "notified": notified == "true",
+                    "reason": entry["reason"],
+                    "notified": entry["notified"],
                     "remaining_time": remaining_time
                 })
             
@@ -213,10 +318,16 @@ class BaseTools:
         
 class QQTools:
     def __init__(self):
-        from utils.config import redis_client
+        from utils.config import redis_client, bot_qq, render_concurrency, render_deadline, forward_node_budget, forward_ttl
         self.redis_client = redis_client
+        self.bot_qq = bot_qq
+        self.render_concurrency = render_concurrency
+        self.render_deadline = render_deadline
+        self.forward_node_budget = forward_node_budget
+        self.forward_ttl = forward_ttl
     
     async def send(self, recv_type, recv_id, message_content):
+        await scheduler.acquire("QQ", f"{recv_type}:{recv_id}", self.bot_qq)
         try:
             from main import qqBot
             if recv_type == 'group':
@@ -236,17 +347,16 @@ class QQTools:
     
     async def get_user_nickname(self, user_id):
         try:
-            from main import qqBot
-            user_info = await qqBot.get_stranger_info(user_id=user_id)
-            return user_info.get('nickname', user_id)
+            from . import IdentityManager
+            return await IdentityManager.get_nickname(user_id)
         except Exception as e:
             logger.error(f"获取用户昵称失败: {str(e)}")
             return user_id
     
     async def get_group_name(self, group_id):
         try:
-            from main import qqBot
-            group_info = await qqBot.get_group_info(group_id=group_id)
+            from . import IdentityManager
+            group_info = await IdentityManager.get_group_info(group_id)
             return group_info['group_name']
         except Exception as e:
             logger.error(f"获取群名称失败: {str(e)}")
@@ -256,94 +366,135 @@ class QQTools:
     
     async def is_group_admin_or_owner(self, group_id: str, user_id: str) -> bool:
         try:
-            from main import qqBot
-            member_info = await qqBot.get_group_member_info(group_id=group_id, user_id=user_id)
+            from . import IdentityManager
+            member_info = await IdentityManager.get_member(group_id, user_id)
             role = member_info.get('role', 'member')
             return role in ['owner', 'admin']
         except Exception as e:
             logger.error(f"获取群成员角色信息失败: {e}")
             return False
-    @staticmethod
-    def extract_cq_codes(raw_message):
-        cq_code_pattern = re.compile(r'\[CQ:[^\]]+\]')
-        matches = cq_code_pattern.findall(raw_message)
-        valid_cq_codes = []
+    # CQ码: [CQ:类型,参数=值,...]，参数值中的 & [ ] , 被转义为 &amp; &#91; &#93; &#44;
+    CQ_CODE_PATTERN = re.compile(r'\[CQ:([^,\]]+)((?:,[^\]]*)?)\]')
 
-        for match in matches:
-            try:
-                content = match[4:-1]
-                if 'data=' in content:
-                    data_part = content.split('data=', 1)[1]
-                    data_part = data_part.strip()
-                    decoded_data_part = html.unescape(data_part)
-                    json_data = json.loads(decoded_data_part)
-                    logger.info(f"获取CQ码内容: {content}")
-                    valid_cq_codes.append(content)
-                else:
-                    if re.match(r'^\w+(,[^\[\]]+=.+)*$', content):
-                        valid_cq_codes.append(content)
-                    else:
-                        logger.warning(f"发现格式不正确的CQ码: {match}")
-            except json.JSONDecodeError as e:
-                logger.warning(f"发现格式不正确的CQ码 (JSON解析失败): {match}, 错误信息: {str(e)}")
-            except Exception as e:
-                logger.error(f"处理CQ码时发生未知错误: {match}, 错误信息: {str(e)}")
-
-        return valid_cq_codes
     @staticmethod
     def remove_cq_codes(raw_message):
         return re.sub(r'\[CQ:[^\]]+\]', '', raw_message)
     
-    async def process_message(self, raw_message: str, group_id=None, group_name=None) -> tuple:
-        """处理消息中的所有CQ码"""
-        cq_codes = self.extract_cq_codes(raw_message)
-        html_content = raw_message
-        text_content = raw_message
-
-        for code in cq_codes:
-            full_code = f"[CQ:{code}]"
+    @classmethod
+    def parse_cq_segments(cls, raw_message: str) -> list:
+        """
+        把 CQ 码字符串解析为 OneBot 消息段数组（一次扫描），文本保持原样。
+
+        :return: [{"type": "text" / CQ码类型, "data": {...}}, ...]
+        """
+        segments = []
+        position = 0
+        for match in cls.CQ_CODE_PATTERN.finditer(raw_message):
+            if match.start() > position:
+                segments.append({"type": "text", "data": {"text": raw_message[position:match.start()]}})
+            params = {}
+            for item in match.group(2)[1:].split(',') if match.group(2) else ():
+                key, _, value = item.partition('=')
+                params[key.strip()] = html.unescape(value)
+            segments.append({"type": match.group(1).strip(), "data": params})
+            position = match.end()
+        if position < len(raw_message):
+            segments.append({"type": "text", "data": {"text": raw_message[position:]}})
+        return segments
+
+    async def process_message(self, raw_message: str, group_id=None, group_name=None, message=None) -> tuple:
+        """
+        把消息渲染为 (html, 纯文本)。
+
+        :param raw_message: CQ 码字符串，message 不可用时解析该字符串
+        :param message: OneBot 消息段数组（NapCat 的 Array 消息格式），优先使用
+        """
+        segments = message if isinstance(message, list) else self.parse_cq_segments(raw_message)
+        results = [None] * len(segments)
+        semaphore = asyncio.Semaphore(self.render_concurrency)
+
+        async def render(index, segment_type, params):
+            async with semaphore:
+                try:
+                    results[index] = await self._get_handler(segment_type)(params)
+                except Exception as e:
+                    logger.error(f"消息段处理失败: {segment_type} {params}, 错误: {str(e)}")
+                    results[index] = {'html': '[处理失败]', 'text': '[处理失败]'}
+
+        # 文本直接输出，其它消息段并发渲染（@ 查询昵称、合并转发等互不等待），结果按原顺序拼接
+        tasks = []
+        for index, segment in enumerate(segments):
+            segment_type = str(segment.get('type', '')).lower()
+            params = segment.get('data') or {}
+            if segment_type == 'text':
+                results[index] = {'html': params.get('text', ''), 'text': params.get('text', '')}
+            else:
+                tasks.append(asyncio.ensure_future(render(index, segment_type, params)))
+        if tasks:
+            # 超过渲染时限的消息段使用占位文本，避免一个慢查询拖住整条消息的转发
+            try:
+                _, pending = await asyncio.wait(tasks, timeout=self.render_deadline)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            if pending:
+                logger.warning(f"{len(pending)} 个消息段超过 {self.render_deadline} 秒未渲染完成, 使用占位文本")
+
+        html_parts = []
+        text_parts = []
+        for segment, result in zip(segments, results):
+            if result is None:
+                result = self._placeholder(str(segment.get('type', '')).lower(), segment.get('data') or {})
+            html_parts.append(result['html'])
+            text_parts.append(result['text'])
+            # 处理特殊类型
             try:
-                handler = self._get_handler(code)
-                result = await handler(code)
-                # 替换处理结果
-                html_content = html_content.replace(full_code, result['html'])
-                text_content = text_content.replace(full_code, result['text'])
-                
-                # 处理特殊类型
                 await self._handle_special_types(result, group_id, group_name)
             except Exception as e:
-                logger.error(f"CQ码处理失败: {code}, 错误: {str(e)}")
-                html_content = html_content.replace(full_code, '[处理失败]')
-                text_content = text_content.replace(full_code, '[处理失败]')
-
-        return html_content, text_content
+                logger.error(f"处理特殊消息失败: {str(e)}")
+
+        return ''.join(html_parts), ''.join(text_parts)
+
+    # 渲染超时时的占位文本
+    PLACEHOLDERS = {
+        'image': '[图片]',
+        'video': '[视频消息]',
+        'record': '[语音消息]',
+        'forward': '[合并转发]',
+        'json': '[小程序]'
+    }
+
+    def _placeholder(self, segment_type: str, params: dict) -> dict:
+        if segment_type == 'at':
+            text = f"@{params.get('qq', '')}"
+        else:
+            text = self.PLACEHOLDERS.get(segment_type, '[消息]')
+        return {'html': text, 'text': text}
 
-    def _get_handler(self, code: str):
+    def _get_handler(self, segment_type: str):
         """获取对应的处理器"""
-        code_type = code.split(',', 1)[0].lower()
-        return getattr(self, f"_handle_{code_type}", self._handle_unknown)
+        return getattr(self, f"_handle_{segment_type}", self._handle_unknown)
 
-    async def _handle_unknown(self, code: str) -> dict:
+    async def _handle_unknown(self, params: dict) -> dict:
         return {'html': '[未知消息]', 'text': '[未知消息]'}
 
-    async def _handle_face(self, code: str) -> dict:
+    async def _handle_face(self, params: dict) -> dict:
         """处理QQ表情"""
-        face_id = self._get_param(code, 'id', '0')
+        face_id = self._get_param(params, 'id', '0')
         face_url = f"https://koishi.js.org/QFace/assets/qq_emoji/thumbs/gif_{face_id}.gif"
         return {
             'html': f'<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px;"><img src="{face_url}" class="qq-image" width="19" height="19" alt="ID：{face_id}"></div>',
             'text': face_id
         }
-    async def _handle_at(self, code: str) -> dict:
+    async def _handle_at(self, params: dict) -> dict:
         """处理@消息"""
-        qq_id = self._get_param(code, 'qq', '0')
+        qq_id = self._get_param(params, 'qq', '0')
         if qq_id == 'all':
             return {'html': '<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px;">@全体成员</div>', 'text': '@全体成员'}
         
         try:
-            from main import qqBot
-            user_info = await qqBot.get_stranger_info(user_id=int(qq_id))
-            name = user_info.get('nickname', qq_id)
+            from . import IdentityManager
+            name = await IdentityManager.get_nickname(qq_id)
             logger.info(f"获取@用户信息成功: QQ={qq_id}, 昵称={name}")
         except Exception as e:
             logger.warning(f"获取@用户信息失败: QQ={qq_id}, 错误: {str(e)}")
@@ -354,12 +505,12 @@ class QQTools:
             'text': f'@{name}'
         }
 
-    async def _handle_image(self, code: str) -> dict:
+    async def _handle_image(self, params: dict) -> dict:
         """处理图片"""
         try:
-            url = self._get_param(code, 'url').replace('&amp;', '&')
+            url = self._get_param(params, 'url').replace('&amp;', '&')
             if not url:
-                logger.warning(f"图片CQ码缺少URL参数: {code}")
+                logger.warning(f"图片CQ码缺少URL参数: {params}")
                 return {'html': '[无效图片]', 'text': '[无效图片]'}
 
             logger.info(f"处理图片CQ码: URL={url}")
@@ -376,14 +527,14 @@ class QQTools:
                 'text': '[图片]'
             }
         except Exception as e:
-            logger.error(f"处理图片CQ码失败: {code}, 错误: {str(e)}")
+            logger.error(f"处理图片CQ码失败: {params}, 错误: {str(e)}")
             return {'html': '[图片处理失败]', 'text': '[图片处理失败]'}
-    async def _handle_video(self, code: str) -> dict:
+    async def _handle_video(self, params: dict) -> dict:
         """处理视频消息"""
-        url = self._get_param(code, 'url').replace('&amp;', '&')
-        video_id = self._get_param(code, 'file')
-        video_url = self._get_param(code, 'url')
-        file_size = self._get_param(code, 'file_size')
+        url = self._get_param(params, 'url').replace('&amp;', '&')
+        video_id = self._get_param(params, 'file')
+        video_url = self._get_param(params, 'url')
+        file_size = self._get_param(params, 'file_size')
         upload_time = datetime.now().isoformat()
         
         try:
@@ -396,7 +547,7 @@ class QQTools:
             "file_size": file_size,
             "upload_time": upload_time.replace("T", " ").split(".")[0]
         }
-        self.redis_client.set(f"video:{video_id}", json.dumps(video_data), ex=86400)
+        await self.redis_client.set(f"video:{video_id}", json.dumps(video_data), ex=86400)
 
         return {
             'html': f'<a href="http://amer.bot.anran.xyz/sync/video?video_id={video_id}" '
@@ -414,61 +565,117 @@ class QQTools:
             'text': '[视频消息]'
         }
 
-    async def _handle_reply(self, code: str) -> dict:
+    async def _handle_reply(self, params: dict) -> dict:
         """处理回复消息"""
-        reply_id = self._get_param(code, 'id')
+        reply_id = self._get_param(params, 'id')
         return {
             'html': f'<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px;"><span class="reply">↩️ 回复消息 </span></div>',
             'text': '[回复]'
         }
 
-    async def _handle_record(self, code: str) -> dict:
+    async def _handle_record(self, params: dict) -> dict:
         """处理语音消息"""
         return {
             'html': f'<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px;">[语音消息]</div>',
             'text': '[语音消息]'
         }
 
-    async def _handle_forward(self, code: str) -> dict:
+    async def _handle_forward(self, params: dict) -> dict:
         """处理合并转发"""
-        forward_id = self._get_param(code, 'id')
+        forward_id = self._get_param(params, 'id')
         if not forward_id:
-            logger.warning(f"合并转发CQ码缺少ID参数: {code}")
+            logger.warning(f"合并转发CQ码缺少ID参数: {params}")
             return {'html': '<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px;">[无效转发]</div>', 'text': '[无效转发]'}
 
         try:
+            # 部分 OneBot 实现会在消息段中直接带上转发内容，无需再调用 get_forward_msg
+            nodes = params.get('content') if isinstance(params.get('content'), list) else None
+            expansion = await self.get_forward_expansion(forward_id, nodes)
+            return {'html': expansion['html'], 'text': expansion['text']}
+        except Exception as e:
+            logger.error(f"处理合并转发失败: {str(e)}")
+            return {'html': '[合并转发处理失败]', 'text': '[合并转发处理失败]'}
+
+    async def get_forward_expansion(self, forward_id, nodes=None) -> dict:
+        """
+        获取合并转发的展开结果，按转发ID缓存。
+
+        :param forward_id: 转发ID
+        :param nodes: 消息段中自带的转发节点，为 None 时调用 get_forward_msg
+        :return: {"nodes": [{"sender", "time", "content"}, ...], "html": 渲染结果, "text": 纯文本}
+        """
+        forward_id = str(forward_id)
+        expansion = forward_cache.get(forward_id)
+        if expansion is not MISSING:
+            return expansion
+        return await forward_inflight.do(forward_id, self._expand_forward, forward_id, nodes)
+
+    async def _expand_forward(self, forward_id, nodes):
+        if nodes is None:
             from main import qqBot
             forward_msg = await qqBot.get_forward_msg(message_id=forward_id)
-            messages = []
-            for msg in forward_msg['messages']:
-                try:
-                    time_str = datetime.fromtimestamp(msg['time']).strftime('%m-%d %H:%M')
-                    content = await self._parse_forward_content(msg['message'])
-                    messages.append(f'<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px; margin-bottom: 5px;">'
-                                  f'{msg["sender"]["nickname"]} ({time_str}): {content}'
-                                  f'</div>')
-                except KeyError as ke:
-                    logger.error(f"解析转发消息失败: 缺少字段 {ke}")
-                    messages.append('<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px; margin-bottom: 5px;">'
-                                  '[未知用户] [时间未知]: [内容解析失败]'
-                                  '</div>')
-            
+            nodes = forward_msg['messages']
+        entries = [await self._parse_forward_node(msg) for msg in nodes]
+        expansion = {"nodes": entries, **self.render_forward(forward_id, entries)}
+        size = len(expansion["html"]) + len(expansion["text"]) + sum(len(e["sender"]) + len(e["content"]) + 16 for e in entries)
+        forward_cache.set(forward_id, expansion, size=size)
+        if len(entries) > self.forward_node_budget:
+            # 未展开的部分在网页中查看，其它进程也能读取
+            try:
+                await self.redis_client.set(f"{FORWARD_KEY_PREFIX}{forward_id}", json.dumps(entries, ensure_ascii=False), ex=self.forward_ttl)
+            except Exception as e:
+                logger.error(f"保存合并转发 {forward_id} 失败: {e}")
+        return expansion
+
+    async def _parse_forward_node(self, msg) -> dict:
+        """把 get_forward_msg 返回的一个节点解析为 {"sender", "time", "content"}"""
+        try:
             return {
-                'html': '<div style="background-color: #f9f9f9; padding: 10px; border-radius: 5px;">'
-                        '<div style="font-weight: bold; margin-bottom: 8px;">📨 合并转发</div>'
-                        + ''.join(messages) + 
-                        '</div>',
-                'text': '[合并转发] ' + ' | '.join([m.replace('<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px; margin-bottom: 5px;">','')
-                                                  .replace('</div>','') for m in messages])
+                "sender": str(msg["sender"]["nickname"]),
+                "time": datetime.fromtimestamp(msg['time']).strftime('%m-%d %H:%M'),
+                "content": await self._parse_forward_content(msg['message'])
             }
-        except Exception as e:
-            logger.error(f"处理合并转发失败: {str(e)}")
-            return {'html': '[合并转发处理失败]', 'text': '[合并转发处理失败]'}
-    async def _handle_json(self, code: str) -> dict:
+        except KeyError as ke:
+            logger.error(f"解析转发消息失败: 缺少字段 {ke}")
+            return {"sender": "[未知用户]", "time": "时间未知", "content": "[内容解析失败]"}
+
+    def render_forward(self, forward_id, entries) -> dict:
+        """
+        渲染合并转发，最多展开 forward_node_budget 条，其余部分附上网页链接。
+
+        :return: {"html": ..., "text": ...}
+        """
+        shown = entries[:self.forward_node_budget]
+        remaining = len(entries) - len(shown)
+        lines = [f'{e["sender"]} ({e["time"]}): {e["content"]}' for e in shown]
+        html_content = (
+            '<div style="background-color: #f9f9f9; padding: 10px; border-radius: 5px;">'
+            '<div style="font-weight: bold; margin-bottom: 8px;">📨 合并转发</div>'
+            + ''.join(f'<div style="{FORWARD_NODE_STYLE}">{html.escape(line)}</div>' for line in lines)
+        )
+        text = '[合并转发] ' + ' | '.join(lines)
+        if remaining > 0:
+            link = f'{FORWARD_URL}?id={quote(str(forward_id), safe="")}&offset={len(shown)}'
+            html_content += f'<div style="{FORWARD_NODE_STYLE}"><a href="{html.escape(link)}">还有 {remaining} 条消息，点击展开</a></div>'
+            text += f' | ……还有 {remaining} 条消息'
+        return {'html': html_content + '</div>', 'text': text}
+
+    async def get_forward_nodes(self, forward_id):
+        """
+        获取已同步的合并转发的全部节点（供网页分页查看）。
+
+        :return: [{"sender", "time", "content"}, ...]，未同步过或已过期时为 None
+        """
+        expansion = forward_cache.get(str(forward_id))
+        if expansion is not MISSING:
+            return expansion["nodes"]
+        raw = await self.redis_client.get(f"{FORWARD_KEY_PREFIX}{forward_id}")
+        return json.loads(raw) if raw else None
+
+    async def _handle_json(self, params: dict) -> dict:
         """处理JSON小程序"""
-        json_str = self._get_param(code, 'data')
+        json_str = self._get_param(params, 'data')
         try:
-            json_str = html.unescape(json_str)
             data = json.loads(json_str)
             app_type = data.get('app', '')
             
@@ -490,46 +697,46 @@ class QQTools:
             logger.error(f"JSON解析失败: {str(e)}")
             return {'html': '[无效的小程序]', 'text': '[小程序]'}
 
-    async def _handle_dice(self, code: str) -> dict:
+    async def _handle_dice(self, params: dict) -> dict:
         """处理骰子"""
-        result = self._get_param(code, 'result', '1')
+        result = self._get_param(params, 'result', '1')
         return {
             'html': f'<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px;">🎲 骰子点数: {result}</div>',
             'text': f'[骰子: {result}点]'
         }
 
-    async def _handle_rps(self, code: str) -> dict:
+    async def _handle_rps(self, params: dict) -> dict:
         """处理猜拳"""
         result_map = {'1': '剪刀', '2': '石头', '3': '布'}
-        result = result_map.get(self._get_param(code, 'result', '1'), '未知')
+        result = result_map.get(self._get_param(params, 'result', '1'), '未知')
         return {
             'html': f'<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px;">✊ 猜拳结果: {result}</div>',
             'text': f'[猜拳: {result}]'
         }
 
-    async def _handle_share(self, code: str) -> dict:
+    async def _handle_share(self, params: dict) -> dict:
         """处理链接分享（旧版）"""
-        url = self._get_param(code, 'url')
-        title = self._get_param(code, 'title', '链接分享')
+        url = self._get_param(params, 'url')
+        title = self._get_param(params, 'title', '链接分享')
         return {
             'html': f'<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px;">🔗 <a href="{url}">{title}</a></div>',
             'text': f'[链接: {title}]'
         }
 
-    async def _handle_location(self, code: str) -> dict:
+    async def _handle_location(self, params: dict) -> dict:
         """处理位置分享"""
-        lat = self._get_param(code, 'lat')
-        lng = self._get_param(code, 'lng')
-        title = self._get_param(code, 'title', '位置分享')
+        lat = self._get_param(params, 'lat')
+        lng = self._get_param(params, 'lng')
+        title = self._get_param(params, 'title', '位置分享')
         return {
             'html': f'<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px;">📍 <a href="https://uri.amap.com/marker?position={lng},{lat}">{title}</a></div>',
             'text': f'[位置: {title}]'
         }
 
-    async def _handle_contact(self, code: str) -> dict:
+    async def _handle_contact(self, params: dict) -> dict:
         """处理联系人推荐"""
-        ctype = self._get_param(code, 'type')
-        id = self._get_param(code, 'id')
+        ctype = self._get_param(params, 'type')
+        id = self._get_param(params, 'id')
         return {
             'html': f'<div style="background-color: #f9f9f9; padding: 5px; border-radius: 5px;">👤 推荐联系人: {ctype}{id}</div>',
             'text': f'[联系人推荐: {ctype}{id}]'
@@ -598,16 +805,18 @@ class QQTools:
         }
 
     # 辅助方法
-    def _get_param(self, code: str, key: str, default='') -> str:
-        """从CQ码中提取参数"""
-        match = re.search(fr'{key}=([^,]*)', code)
-        value = html.unescape(match.group(1)) if match else default
+    def _get_param(self, params: dict, key: str, default='') -> str:
+        """从消息段参数中取出字符串值"""
+        value = params.get(key)
+        value = default if value is None or value == '' else str(value)
         if not value:
-            logger.warning(f"CQ码缺少参数: {key}, 默认值={default}")
+            logger.warning(f"消息段缺少参数: {key}, 默认值={default}")
         return value
 
-    async def _parse_forward_content(self, message: list) -> str:
+    async def _parse_forward_content(self, message) -> str:
         """解析合并转发中的消息内容"""
+        if isinstance(message, str):
+            return self.remove_cq_codes(message)
         contents = []
         for item in message:
             if isinstance(item, dict) and item.get('type') == 'text':
@@ -630,21 +839,28 @@ class YunhuTools:
     def __init__(self):
         from utils.config import yh_token
         self.yh_token = yh_token
+        # 发送限速使用的机器人标识（不直接使用 Token）
+        self.bot_key = format(zlib.crc32(yh_token.encode("utf-8")), "08x")
         self.headers = {"Content-Type": "application/json"}
 
     @staticmethod
     def decode_utf8(text):
         return re.sub(r'\\u([09a-fA-F]{4})', lambda x: chr(int(x.group(1), 16)), text)
     
-    async def fetch_data(self, url, check_string, patterns):
+    async def fetch_data(self, url, check_string, patterns, required=None):
+        """
+        抓取云湖主页并按正则解析字段。
+
+        :param required: 必须解析到的字段，默认为全部字段
+        :return: {"code": 1, "data": ...}，对象不存在时 code 为 2，请求失败为 -1，解析失败为 -3
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=5, ssl=False) as response:
-                    response.raise_for_status()
-                    response_text = await response.text()
-        except aiohttp.ClientError as e:
-            logger.error(f"请求失败: {str(e)}")
-            return {"code": -1, "msg": f"请求失败: {str(e)}"}
+            async with http.request("yunhu_web", "GET", url, timeout=aiohttp.ClientTimeout(total=5), ssl=False) as response:
+                response.raise_for_status()
+                response_text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"请求失败: {str(e) or type(e).__name__}")
+            return {"code": -1, "msg": f"请求失败: {str(e) or type(e).__name__}"}
 
         if check_string not in response_text:
             data = {}
@@ -663,7 +879,7 @@ class YunhuTools:
                     else:
                         value = self.decode_utf8(value)
                     data[key] = value
-            if all(key in data for key in patterns):
+            if all(key in data for key in (required or patterns)):
                 return {"code": 1, "msg": "ok", "data": data}
             else:
                 return {"code": -3, "msg": "解析数据失败"}
@@ -737,15 +953,15 @@ class YunhuTools:
             sampleDict['content']['buttons'] = [buttons]
 
         sjson = json.dumps(sampleDict)
+        await scheduler.acquire("YH", f"{recvType}:{recvId}", self.bot_key)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"https://chat-go.jwzhd.com/open-apis/v1/bot/send?token={self.yh_token}", headers=self.headers, data=sjson) as response:
-                    response.raise_for_status()
-                    reply = await response.json()
-                    return reply
-        except aiohttp.ClientError as e:
-            logger.error(f"发送消息失败: {str(e)}")
-            return {"code": -1, "msg": f"发送消息失败: {str(e)}"}
+            async with http.request("yunhu", "POST", f"https://chat-go.jwzhd.com/open-apis/v1/bot/send?token={self.yh_token}", headers=self.headers, data=sjson) as response:
+                response.raise_for_status()
+                reply = await response.json()
+                return reply
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"发送消息失败: {str(e) or type(e).__name__}")
+            return {"code": -1, "msg": f"发送消息失败: {str(e) or type(e).__name__}"}
 
     async def edit(self, msgId, recvId, recvType, contentType, content='content', fileName='fileName', url='url', buttons=None):
         sampleDict = {
@@ -767,15 +983,15 @@ class YunhuTools:
             sampleDict['content']['buttons'] = [buttons]
 
         sjson = json.dumps(sampleDict)
+        await scheduler.acquire("YH", f"{recvType}:{recvId}", self.bot_key)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(f"https://chat-go.jwzhd.com/open-apis/v1/bot/edit?token={self.yh_token}", headers=self.headers, data=sjson) as response:
-                    response.raise_for_status()
-                    reply = await response.json()
-                    return reply
-        except aiohttp.ClientError as e:
-            logger.error(f"编辑消息失败: {str(e)}")
-            return {"code": -1, "msg": f"编辑消息失败: {str(e)}"}
+            async with http.request("yunhu", "POST", f"https://chat-go.jwzhd.com/open-apis/v1/bot/edit?token={self.yh_token}", headers=self.headers, data=sjson) as response:
+                response.raise_for_status()
+                reply = await response.json()
+                return reply
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"编辑消息失败: {str(e) or type(e).__name__}")
+            return {"code": -1, "msg": f"编辑消息失败: {str(e) or type(e).__name__}"}
 
     async def set_board(self, recvId, recvType, content):
         url = f"https://chat-go.jwzhd.com/open-apis/v1/bot/board?token={self.yh_token}"
@@ -785,75 +1001,55 @@ class YunhuTools:
             "contentType": "text",
             "content": content
         }
+        await scheduler.acquire("YH", f"{recvType}:{recvId}", self.bot_key)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=self.headers, data=json.dumps(payload)) as response:
-                    response.raise_for_status()
-                    return await response.json()
-        except aiohttp.ClientError as e:
-            logger.error(f"设置公告板失败: {str(e)}")
-            return {"code": -1, "msg": f"设置公告板失败: {str(e)}"}
+            async with http.request("yunhu", "POST", url, headers=self.headers, data=json.dumps(payload)) as response:
+                response.raise_for_status()
+                return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"设置公告板失败: {str(e) or type(e).__name__}")
+            return {"code": -1, "msg": f"设置公告板失败: {str(e) or type(e).__name__}"}
 
     async def upload_image(self, image_path, image_filename):
         upload_url = f"https://chat-go.jwzhd.com/open-apis/v1/image/upload?token={self.yh_token}"
         try:
             with open(image_path, "rb") as image_file:
                 files = {'image': (image_filename, image_file)}
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(upload_url, data=files) as response:
-                        response.raise_for_status()
-                        response_data = await response.json()
-                        if response_data['msg'] == "success":
-                            image_key = response_data['data']['imageKey']
-                            return image_key, "image"
-                        else:
-                            logger.debug(f"上传图片失败: {response_data['msg']}")
-                            return None, None
-        except aiohttp.ClientError as e:
-            logger.error(f"上传图片失败: {str(e)}")
+                async with http.request("yunhu", "POST", upload_url, data=files) as response:
+                    response.raise_for_status()
+                    response_data = await response.json()
+                    if response_data['msg'] == "success":
+                        image_key = response_data['data']['imageKey']
+                        return image_key, "image"
+                    else:
+                        logger.debug(f"上传图片失败: {response_data['msg']}")
+                        return None, None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"上传图片失败: {str(e) or type(e).__name__}")
             return None, None
     async def get_group_name(self, group_id):
         try:
-            url = f"https://www.yhchat.com/group/homepage/{group_id}"
-            check_string = "data-v-6eef215f>ID </span>"
-            patterns = {
-                "name": r'name:"(.*?)"'
-            }
-            response = await self.fetch_data(url, check_string, patterns)
-            if response["code"] == 1:
-                return response["data"]["name"]
-            else:
-                return group_id
+            # 资料有缓存，通常不需要抓取主页
+            from . import ProfileManager
+            return await ProfileManager.get_group_name(group_id)
         except Exception as e:
             logger.error(f"获取群名称失败: {str(e)}")
             return group_id
 
     async def get_user_nickname(self, user_id):
         try:
-            url = f"https://www.yhchat.com/user/homepage/{user_id}"
-            check_string = "data-v-34a9b5c4>ID </span>"
-            patterns = {
-                "nickname": r'nickname:"(.*?)"'
-            }
-            response = await self.fetch_data(url, check_string, patterns)
-            if response["code"] == 1:
-                return response["data"]["nickname"]
-            else:
-                return user_id
+            from . import ProfileManager
+            return await ProfileManager.get_user_nickname(user_id)
         except Exception as e:
             logger.error(f"获取用户昵称失败: {str(e)}")
             return user_id
 
     async def get_user_avatar_url(self, user_id):
         try:
-            url = f"https://www.yhchat.com/user/homepage/{user_id}"
-            check_string = "data-v-34a9b5c4>ID </span>"
-            patterns = {
-                "avatarUrl": r'avatarUrl:"(.*?)"'
-            }
-            response = await self.fetch_data(url, check_string, patterns)
-            if response["code"] == 1:
-                return response["data"]["avatarUrl"]
+            from . import ProfileManager
+            avatar_url = await ProfileManager.get_user_avatar_url(user_id)
+            if avatar_url:
+                return avatar_url
             else:
                 return f"https://q1.qlogo.cn/g?b=qq&nk={user_id}&s=640"
         except Exception as e:
@@ -904,17 +1100,16 @@ class AITools:
                 "sample_rate": 44100
             }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(api_url, headers=headers, json=data) as response:
-                    response.raise_for_status()
-                    file_name = f"amer_voice_{datetime.now().strftime('%Y%m%d%H%M%S')}.mp3"
-                    from utils.config import temp_folder
-                    speech_file_path = Path(temp_folder) / file_name
-                    logger.info(f"语音生成成功: {speech_file_path}")
-                    with open(speech_file_path, "wb") as f:
-                        f.write(await response.read())
-                    
-                    return str(speech_file_path)
+            async with http.request("siliconflow", "POST", api_url, headers=headers, json=data) as response:
+                response.raise_for_status()
+                file_name = f"amer_voice_{datetime.now().strftime('%Y%m%d%H%M%S')}.mp3"
+                from utils.config import temp_folder
+                speech_file_path = Path(temp_folder) / file_name
+                logger.info(f"语音生成成功: {speech_file_path}")
+                with open(speech_file_path, "wb") as f:
+                    f.write(await response.read())
+                
+                return str(speech_file_path)
         except Exception as e:
             logger.error(f"语音生成失败: {e}")
             return None
@@ -928,7 +1123,7 @@ class AITools:
         """
         # 从 Redis 获取语音风格数据
         voice_style_key = f"voice_style:{custom_name}"
-        voice_style_data = self.redis_client.get(voice_style_key)
+        voice_style_data = await self.redis_client.get(voice_style_key)
         
         if not voice_style_data:
             raise ValueError(f"未找到语音风格: {custom_name}")
@@ -958,19 +1153,18 @@ class AITools:
         }
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=headers) as response:
-                    if response.status == 200:
-                        audio_data = await response.read()
-                        from utils.config import temp_folder
-                        file_path = Path(temp_folder) / f"{uuid.uuid4()}.mp3"
-                        with open(file_path, "wb") as f:
-                            f.write(audio_data)
-                        return file_path
-                    else:
-                        error_msg = await response.text()
-                        logger.error(f"生成语音失败: {error_msg}")
-                        return None
+            async with http.request("siliconflow", "POST", url, json=payload, headers=headers) as response:
+                if response.status == 200:
+                    audio_data = await response.read()
+                    from utils.config import temp_folder
+                    file_path = Path(temp_folder) / f"{uuid.uuid4()}.mp3"
+                    with open(file_path, "wb") as f:
+                        f.write(audio_data)
+                    return file_path
+                else:
+                    error_msg = await response.text()
+                    logger.error(f"生成语音失败: {error_msg}")
+                    return None
         except Exception as e:
             logger.error(f"调用 SiliconFlow API 时发生错误: {e}")
             return None
@@ -1030,7 +1224,7 @@ class AITools:
             logger.error(f"工具调用失败: {tool_name}, 错误: {str(e)}")
             return {"code": -1, "msg": f"工具调用失败: {str(e)}", "data": {}}
 
-    def save_conversation(self, id: str, messages: List[Dict[str, str]]) -> None:
+    async def save_conversation(self, id: str, messages: List[Dict[str, str]]) -> None:
         """
         将对话保存到 Redis 中。
         
@@ -1039,18 +1233,18 @@ class AITools:
         """
         filtered_messages = [msg for msg in messages if msg.get("role") != "system"]  
         # 过滤掉系统消息
-        self.redis_client.set(f'conversation:{id}', json.dumps(filtered_messages))  
+        await self.redis_client.set(f'conversation:{id}', json.dumps(filtered_messages))  
         # 将消息列表转换为 JSON 字符串并保存到 Redis
 
     # 加载对话
-    def load_conversation(self, id: str) -> List[Dict[str, str]]:
+    async def load_conversation(self, id: str) -> List[Dict[str, str]]:
         """
         从 Redis 中加载对话。
         
         :param id: 对话的唯一标识
         :return: 消息列表
         """
-        messages = self.redis_client.get(f'conversation:{id}')  
+        messages = await self.redis_client.get(f'conversation:{id}')  
         # 从 Redis 获取消息列表
         if messages:
             messages = json.loads(messages)  
@@ -1060,7 +1254,7 @@ class AITools:
             return messages
         return []
 
-    def check_rate_limit(self, id: str, is_group: bool) -> bool:
+    async def check_rate_limit(self, id: str, is_group: bool) -> bool:
         """
         检查请求频率是否超过限制
         
@@ -1068,29 +1262,9 @@ class AITools:
         :param is_group: 是否是群聊
         :return: 是否允许继续请求
         """
-        now = int(time.time())
-        key = f"rate_limit:{id}"
-        
-        # 获取当前时间窗口内的请求次数
-        request_times = self.redis_client.lrange(key, 0, -1)
-        request_times = [int(t) for t in request_times if t]
-        
-        # 移除过期的时间戳
-        request_times = [t for t in request_times if now - t < self.ai_rate_limit_window]
-        
-        # 获取当前限制值
         limit = self.ai_rate_limit_group if is_group else self.ai_rate_limit_private
-        
-        # 如果超过限制则返回False
-        if len(request_times) >= limit:
-            return False
-            
-        # 添加当前时间戳
-        self.redis_client.lpush(key, now)
-        self.redis_client.ltrim(key, 0, limit - 1)
-        self.redis_client.expire(key, self.ai_rate_limit_window)
-        
-        return True
+        allowed, _ = await limiter.sliding_window(f"ai_rate_limit:{id}", limit, self.ai_rate_limit_window)
+        return allowed
 
     async def send(
         self,
@@ -1106,7 +1280,7 @@ class AITools:
         id = group_id if group_id is not None else sender_id
         is_group = group_id is not None
         
-        if not self.check_rate_limit(str(id), is_group):
+        if not await self.check_rate_limit(str(id), is_group):
             if group_id is not None:
                 return f"[CQ:at,qq={sender_id}] 唔...你这样有点让本{self.bot_name}难堪呢，暂时不想理你哦~"
             else:
@@ -1207,7 +1381,7 @@ class AITools:
 
                 ---
             """
-            custom_system_prompt = self.redis_client.get(f"custom_system_prompt:{group_id}")
+            custom_system_prompt = await self.redis_client.get(f"custom_system_prompt:{group_id}")
             if custom_system_prompt:
                 if isinstance(custom_system_prompt, bytes):
                     custom_system_prompt = custom_system_prompt.decode('utf-8')
@@ -1219,7 +1393,7 @@ class AITools:
                 custom_system_prompt = source_system_prompt
             logger.info(f"自定义系统提示词: {custom_system_prompt}")
             messages = [{"role": "system", "content": custom_system_prompt}]
-            messages.extend(self.load_conversation(id))
+            messages.extend(await self.load_conversation(id))
             messages.append({"role": "user", "content": json.dumps(new_message_dict)})
             
             # 调用 AI 接口
@@ -1236,7 +1410,7 @@ class AITools:
             
             # 保存对话历史
             messages.append({"role": "assistant", "content": message.content})
-            self.save_conversation(id, messages)
+            await self.save_conversation(id, messages)
             logger.info(f"AI 回复: {message.content}")
             
             # 返回结果
@@ -1299,11 +1473,11 @@ class AITools:
         """
         if self.ban_ai_id is None or str(sender_id) not in self.ban_ai_id:
             record_id, new_message_dict = self.process_message(sender_id, sender_name, content, group_id, group_name, "group" if group_id else "private", timenow, group_name)
-            privacy_switch = self.redis_client.get(f"privacy_switch:{record_id}")
+            privacy_switch = await self.redis_client.get(f"privacy_switch:{record_id}")
             if privacy_switch == "开":
                 return
             logger.info(f"{group_name}({group_id}) 添加消息: ‘{content}’ 到对话历史")
-            messages = self.load_conversation(record_id)
+            messages = await self.load_conversation(record_id)
             messages.append({"role": "user", "content": json.dumps(new_message_dict)})
 
             user_messages_count = sum(1 for msg in messages if msg.get("role") == "user")
@@ -1317,7 +1491,7 @@ class AITools:
                 user_messages_count -= 1
             logger.debug(f"对话历史长度: {len(messages)}")
             logger.debug(f"对话历史: {messages}")
-            self.save_conversation(record_id, messages)
+            await self.save_conversation(record_id, messages)
     async def log_event_to_conversation(self, event, bot, max_length: Optional[int] = None, timenow: Optional[datetime] = None) -> None:
         """
         将事件记录到对话历史中，以便AI能够获取完整的上下文信息。
@@ -1348,8 +1522,8 @@ class AITools:
                 user_name = '系统'
                 if user_id:
                     try:
-                        user_info = await bot.get_stranger_info(user_id=user_id)
-                        user_name = user_info.get('nickname', '未知用户')
+                        from . import IdentityManager
+                        user_name = await IdentityManager.get_nickname(user_id)
                     except Exception as e:
                         logger.error(f"获取用户信息失败: {e}")
                         user_name = '未知用户'
@@ -1359,7 +1533,7 @@ class AITools:
                 if group_id:
                     try:
                         qqtools = QQTools()
-                        group_name = await qqtools.get_group_name(group_id, bot)
+                        group_name = await qqtools.get_group_name(group_id)
                     except Exception as e:
                         logger.error(f"获取群名失败: {e}")
                         group_name = '未知群'
@@ -1369,11 +1543,11 @@ class AITools:
 
             record_id = str(group_id) if group_id else str(user_id)
             if self.ban_ai_id is None or record_id not in self.ban_ai_id:
-                privacy_switch = self.redis_client.get(f"privacy_switch:{record_id}")
+                privacy_switch = await self.redis_client.get(f"privacy_switch:{record_id}")
                 if privacy_switch == "开":
                     return
 
-                messages = self.load_conversation(record_id)
+                messages = await self.load_conversation(record_id)
                 messages.append({"role": "user", "content": json.dumps({
                     "type": "event",
                     "event_type": event_type,
@@ -1390,14 +1564,14 @@ class AITools:
                     user_messages_count -= 1
 
                 if max_length is None:
-                    max_length = self.redis_client.get(f"max_context_count:{record_id}")
+                    max_length = await self.redis_client.get(f"max_context_count:{record_id}")
                     max_length = int(max_length) if max_length else self.ai_max_length
 
                 while user_messages_count > max_length:
                     messages.pop(0)
                     user_messages_count -= 1
 
-                self.save_conversation(record_id, messages)
+                await self.save_conversation(record_id, messages)
             
             logger.info(f"已记录事件到对话历史: {event_type} by {user_name} in {group_name}")
 
@@ -1469,15 +1643,18 @@ class AITools:
                         f'</div>'
                     )
                     
-                    from . import MessageManager 
-                    await MessageManager.send_to_all_bindings(
+                    from . import MessageManager, TaskManager
+                    # 同步到绑定群聊的操作在后台执行
+                    TaskManager.submit(
+                        MessageManager.send_to_all_bindings,
                         "QQ",
                         id,
                         "html",
                         message,
                         0,
                         "Amer",
-                        noBaseContent=content_
+                        noBaseContent=content_,
+                        name="AI异步消息同步"
                     )
                     return json.dumps({"code": 0, "msg": self.ERROR_CODES[0]}, ensure_ascii=False)
                 except Exception as e:
@@ -1541,30 +1718,29 @@ class AITools:
             }
 
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, json=payload, headers=headers) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            image_url = data["images"][0]["url"]
-                            return json.dumps({"code": 0, "msg": self.ERROR_CODES[0], "image_url": image_url}, ensure_ascii=False)
-                        elif response.status == 400:
-                            error_data = await response.json()
-                            return json.dumps({"code": 2, "msg": self.ERROR_CODES[2], "error_msg": error_data["message"]}, ensure_ascii=False)
-                        elif response.status == 401:
-                            return json.dumps({"code": 2, "msg": self.ERROR_CODES[2], "error_msg": "Invalid token"}, ensure_ascii=False)
-                        elif response.status == 429:
-                            error_data = await response.json()
-                            return json.dumps({"code": 2, "msg": self.ERROR_CODES[2], "error_msg": error_data["message"]}, ensure_ascii=False)
-                        elif response.status == 503:
-                            error_data = await response.json()
-                            return json.dumps({"code": 2, "msg": self.ERROR_CODES[2], "error_msg": error_data["message"]}, ensure_ascii=False)
-                        elif response.status == 504:
-                            return json.dumps({"code": 2, "msg": self.ERROR_CODES[2], "error_msg": await response.text()}, ensure_ascii=False)
-                        else:
-                            return json.dumps({"code": -1, "msg": self.ERROR_CODES[-1], "error_msg": f"Unexpected status code: {response.status}"}, ensure_ascii=False)
+                async with http.request("siliconflow", "POST", url, json=payload, headers=headers) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        image_url = data["images"][0]["url"]
+                        return json.dumps({"code": 0, "msg": self.ERROR_CODES[0], "image_url": image_url}, ensure_ascii=False)
+                    elif response.status == 400:
+                        error_data = await response.json()
+                        return json.dumps({"code": 2, "msg": self.ERROR_CODES[2], "error_msg": error_data["message"]}, ensure_ascii=False)
+                    elif response.status == 401:
+                        return json.dumps({"code": 2, "msg": self.ERROR_CODES[2], "error_msg": "Invalid token"}, ensure_ascii=False)
+                    elif response.status == 429:
+                        error_data = await response.json()
+                        return json.dumps({"code": 2, "msg": self.ERROR_CODES[2], "error_msg": error_data["message"]}, ensure_ascii=False)
+                    elif response.status == 503:
+                        error_data = await response.json()
+                        return json.dumps({"code": 2, "msg": self.ERROR_CODES[2], "error_msg": error_data["message"]}, ensure_ascii=False)
+                    elif response.status == 504:
+                        return json.dumps({"code": 2, "msg": self.ERROR_CODES[2], "error_msg": await response.text()}, ensure_ascii=False)
+                    else:
+                        return json.dumps({"code": -1, "msg": self.ERROR_CODES[-1], "error_msg": f"Unexpected status code: {response.status}"}, ensure_ascii=False)
 
-            except aiohttp.ClientError as e:
-                logger.error(f"Image generation error: {e}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Image generation error: {e!r}")
                 return json.dumps({"code": -1, "msg": self.ERROR_CODES[-1], "error_msg": str(e)}, ensure_ascii=False)
 
         from utils.config import qq_commandsForAI
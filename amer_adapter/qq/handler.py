@@ -4,14 +4,13 @@ import io
 import requests
 from PIL import Image
 from io import BytesIO
-from .. import BindingManager, MessageManager, aitools, qqtools, yhtools, basetools
+from .. import BindingManager, MessageManager, IdentityManager, aitools, qqtools, yhtools, basetools
 from datetime import datetime, timedelta
-import redis
 import html
 import uuid
 import json
 import base64
-from utils.config import (redis_client, admin_user_id, pass_ai_id, ban_ai_id, ai_max_length, qq_commands as commands, bot_name, bot_qq, redis_host, redis_port, redis_db, redis_password, temp_folder, replace_blocked_words)
+from utils.config import (redis_client, admin_user_id, pass_ai_id, ban_ai_id, ai_max_length, qq_commands as commands, bot_name, bot_qq, temp_folder, replace_blocked_words)
 from typing import Dict, Any
 from utils import logger
 import asyncio
@@ -38,10 +37,10 @@ async def send_sync_message(message_data, qqBot, group_name):
     message_content, message_content_alltext = await qqtools.process_message(
         message_data.raw_message,
         group_id=message_data.group_id,
-        group_name=group_name
+        group_name=group_name,
+        message=message_data.message
     )
-    bind_infos = BindingManager.get_info("QQ", message_data.group_id)
-    if bind_infos['status'] == 0:
+    if BindingManager.get_routes("QQ", message_data.group_id):
         cleaned_name = replace_blocked_words(sender_name)
         message_content_html = message_content.replace('\n', '<br>')
         user_avatar_url = await qqtools.get_user_avatar_url(message_data.sender_user_id)
@@ -171,8 +170,11 @@ async def msg_handler(data: Dict[str, Any], qqBot):
     # 群聊处理逻辑
     elif message_data.message_type == "group":
         check_ai = False
+        # 缓存发送者的昵称 / 群名片 / 角色，之后的权限判断和 @ 无需再调用 OneBot
+        IdentityManager.remember_sender(message_data)
         group_name = await qqtools.get_group_name(message_data.group_id)
-        keywords = set(json.loads(redis_client.get(f"keywords:{message_data.group_id}"))) if redis_client.get(f"keywords:{message_data.group_id}") else set()
+        keywords_raw = await redis_client.get(f"keywords:{message_data.group_id}")
+        keywords = set(json.loads(keywords_raw)) if keywords_raw else set()
 
         # 处理命令
         command_request = await handle_command(message_data, qqBot)
@@ -180,9 +182,9 @@ async def msg_handler(data: Dict[str, Any], qqBot):
         # 继续处理非命令消息
         if (bot_qq in message_data.raw_message or
                 any(keyword in message_data.raw_message for keyword in keywords)):
-            ai_enabled = redis_client.get(f"ai_enabled:{message_data.group_id}")
+            ai_enabled = await redis_client.get(f"ai_enabled:{message_data.group_id}")
             if not ai_enabled:
-                redis_client.set(f"ai_enabled:{message_data.group_id}", "开")
+                await redis_client.set(f"ai_enabled:{message_data.group_id}", "开")
                 logger.info(f"首次触发AI功能，默认开启: {message_data.group_id}")
 
             if not ai_enabled or ai_enabled.decode() == "开":
@@ -236,6 +238,7 @@ async def msg_handler(data: Dict[str, Any], qqBot):
             )
 
 async def handle_notice(event, qqBot):
+    IdentityManager.handle_notice(event)
     await aitools.log_event_to_conversation(event, qqBot)
 async def handle_request(event, qqBot):
     logger.info(f"收到请求: {event}")
@@ -297,7 +300,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
             logger.warning(f"无效的指令编号: {command}")
             return {"code": -1, "msg": msg}
     elif command.startswith("绑定列表"):
-        bind_infos = BindingManager.get_info("QQ", message_data.group_id)
+        bind_infos = await BindingManager.get_info_async("QQ", message_data.group_id)
         if bind_infos['status'] == 0:
             menu = f"QQ群: {await qqtools.get_group_name(message_data.group_id)}\n\n"
             YH_group_ids = bind_infos['data']['YH_group_ids']
@@ -331,7 +334,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
             
         platform = parts[1]
         if platform == "yh":
-            binding_status = BindingManager.bind("QQ", "YH", message_data.group_id, parts[2])
+            binding_status = await BindingManager.bind_async("QQ", "YH", message_data.group_id, parts[2])
             if binding_status['status'] == 0:
                 msg = "云湖群已成功绑定"
                 await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
@@ -342,7 +345,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
                 await qqBot.send_group_msg(message = msg, group_id=message_data.group_id)
                 return {"code": -1, "msg": msg}
         elif platform == "mc":
-            binding_status = BindingManager.bind("QQ", "MC", message_data.group_id, parts[2])
+            binding_status = await BindingManager.bind_async("QQ", "MC", message_data.group_id, parts[2])
             if binding_status['status'] == 0:
                 msg = "Minecraft服务器已成功绑定"
                 await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
@@ -377,7 +380,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
             logger.warning(f"解绑指令格式错误: {command}")
             return {"code": -1, "msg": msg}
         if platform == "yh":
-            unbind_status = BindingManager.unbind("QQ", "YH", message_data.group_id, id)
+            unbind_status = await BindingManager.unbind_async("QQ", "YH", message_data.group_id, id)
             if unbind_status['status'] == 0:
                 msg = "云湖群已成功解绑"
                 await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
@@ -387,7 +390,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
                 await qqBot.send_group_msg(group_id=message_data.group_id, message=unbind_status['msg'])
                 return {"code": -1, "msg": unbind_status['msg']}
         elif platform == "mc":
-            unbind_status = BindingManager.unbind("QQ", "MC", message_data.group_id, id)
+            unbind_status = await BindingManager.unbind_async("QQ", "MC", message_data.group_id, id)
             if unbind_status['status'] == 0:
                 msg = "Minecraft服务器已成功解绑"
                 await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
@@ -397,7 +400,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
                 await qqBot.send_group_msg(group_id=message_data.group_id, message=unbind_status['msg'])
                 return {"code": -1, "msg": unbind_status['msg']}
         elif platform == "all" or platform == "全部" or platform == "所有":
-            unbind_status = BindingManager.unbind_all("QQ", message_data.group_id)
+            unbind_status = await BindingManager.unbind_all_async("QQ", message_data.group_id)
             if unbind_status['status'] == 0:
                 msg = "所有绑定已成功解绑"
                 await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
@@ -415,12 +418,12 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
         conversation_key = f'conversation:{message_data.group_id}'
         input_history_key = f'input_history:{message_data.group_id}'
         
-        if redis_client.exists(conversation_key):
-            redis_client.delete(conversation_key)
+        if await redis_client.exists(conversation_key):
+            await redis_client.delete(conversation_key)
             logger.info(f"已清除群 {message_data.group_id} 的对话记录")
         
-        if redis_client.exists(input_history_key):
-            redis_client.delete(input_history_key)
+        if await redis_client.exists(input_history_key):
+            await redis_client.delete(input_history_key)
             logger.info(f"已清除群 {message_data.group_id} 的输入历史记录")
         
         await qqBot.send_group_msg(group_id=message_data.group_id, message="Amer的小脑袋瓜子里感觉有什么东西飞出去了")
@@ -443,7 +446,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
                 return {"code": -1, "msg": msg}
             
             keyword = parts[2].strip()
-            keywords_ai = redis_client.get(f"keywords:{message_data.group_id}")
+            keywords_ai = await redis_client.get(f"keywords:{message_data.group_id}")
             if keywords_ai:
                 keywords_ai = set(json.loads(keywords_ai))
             else:
@@ -456,7 +459,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
                 return {"code": -1, "msg": msg}
 
             keywords_ai.add(keyword)
-            redis_client.set(f"keywords:{message_data.group_id}", json.dumps(list(keywords_ai)))
+            await redis_client.set(f"keywords:{message_data.group_id}", json.dumps(list(keywords_ai)))
             msg = f"已添加触发关键词: {keyword}"
             await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
             logger.info(f"已添加触发关键词: {keyword}")
@@ -469,13 +472,13 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
                 return {"code": -1, "msg": msg}
             keyword = parts[2].strip()
 
-            keywords_ai = redis_client.get(f"keywords:{message_data.group_id}")
+            keywords_ai = await redis_client.get(f"keywords:{message_data.group_id}")
             if keywords_ai:
                 keywords_ai = set(json.loads(keywords_ai))
                 if keyword in keywords_ai:
                     keywords_ai.remove(keyword)
                     msg = f"关键词 '{keyword}' 删除成功"
-                    redis_client.set(f"keywords:{message_data.group_id}", json.dumps(list(keywords_ai)))
+                    await redis_client.set(f"keywords:{message_data.group_id}", json.dumps(list(keywords_ai)))
                     await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
                     logger.info(f"关键词 '{keyword}' 已从群 {message_data.group_id} 删除")
                     return {"code": 0, "msg": msg}
@@ -492,12 +495,12 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
         
         elif sub_command == "清空":
             msg = "已清空所有关键词"
-            redis_client.delete(f"keywords:{message_data.group_id}")
+            await redis_client.delete(f"keywords:{message_data.group_id}")
             await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
             logger.info(f"群 {message_data.group_id} 已清空所有关键词")
             return {"code": 0, "msg": msg}
         elif sub_command == "列表":
-            keywords = redis_client.get(f"keywords:{message_data.group_id}")
+            keywords = await redis_client.get(f"keywords:{message_data.group_id}")
             if keywords:
                 keywords = json.loads(keywords)
                 keywords_str = "\n".join(keywords)
@@ -530,19 +533,19 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
                 logger.warning(f"设置提示词格式错误: {command}")
                 return {"code": -1, "msg": msg}
             custom_system_prompt = parts[2].strip()
-            redis_client.set(f"custom_system_prompt:{message_data.group_id}", custom_system_prompt)
+            await redis_client.set(f"custom_system_prompt:{message_data.group_id}", custom_system_prompt)
             msg = f"系统提示词已设置为: {custom_system_prompt}"
             await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
             logger.info(f"系统提示词已设置为: {custom_system_prompt}")
             return {"code": 0, "msg": msg}
         elif sub_command == "清除":
             msg = "系统提示词已清除"
-            redis_client.delete(f"custom_system_prompt:{message_data.group_id}")
+            await redis_client.delete(f"custom_system_prompt:{message_data.group_id}")
             await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
             logger.info(f"系统提示词已清除: {message_data.group_id}")
             return {"code": 0, "msg": msg}
         elif sub_command == "查看":
-            custom_system_prompt = redis_client.get(f"custom_system_prompt:{message_data.group_id}")
+            custom_system_prompt = await redis_client.get(f"custom_system_prompt:{message_data.group_id}")
             if custom_system_prompt:
                 msg = f"当前系统提示词为: {custom_system_prompt.decode()}"
                 await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
@@ -567,7 +570,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
         if parts[1] in ["开", "关"]:
             switch_status = parts[1]
             msg = f"隐私模式已设置为 {switch_status}"
-            redis.Redis(host=redis_host, port=redis_port, db=redis_db, password=redis_password).set(f"privacy_switch:{message_data.group_id}", switch_status)
+            await redis_client.set(f"privacy_switch:{message_data.group_id}", switch_status)
             await qqBot.send_group_msg(group_id=message_data.group_id, message= msg)
             logger.info(f"隐私模式已设置为: {switch_status}")
             return {"code": -1, "msg": msg}
@@ -580,7 +583,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
             try:
                 max_context_count = int(parts[2])
                 msg = f"最大上文提示数已设置为 {max_context_count}"
-                redis.Redis(host=redis_host, port=redis_port, db=redis_db, password=redis_password).set(f"max_context_count:{message_data.group_id}", max_context_count)
+                await redis_client.set(f"max_context_count:{message_data.group_id}", max_context_count)
                 await qqBot.send_group_msg(group_id=message_data.group_id, message= msg)
                 logger.info(f"最大上文提示数已设置为: {max_context_count}")
                 return {"code": -1, "msg": msg}
@@ -608,7 +611,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
         action = parts[1]
         if action in ["开", "关"]:
             msg = f"AI功能已{action}"
-            redis_client.set(f"ai_enabled:{message_data.group_id}", "开" if action == "开" else "关")
+            await redis_client.set(f"ai_enabled:{message_data.group_id}", "开" if action == "开" else "关")
             await qqBot.send_group_msg(group_id=message_data.group_id, message= msg)
             logger.info(f"AI功能已{action}: {message_data.group_id}")
             return {"code": -1, "msg": msg}
@@ -629,7 +632,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
         remark = parts[1]
         token = str(uuid.uuid4())
 
-        redis_client.set(f"voice_upload_token:{token}", json.dumps({
+        await redis_client.set(f"voice_upload_token:{token}", json.dumps({
             "user_id": message_data.sender_user_id,
             "user_name": message_data.sender_nickname,
             "remark": remark
@@ -694,9 +697,9 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
         cursor = 0
         all_notes = []
         while True:
-            cursor, keys = redis_client.scan(cursor=cursor, match="voice_style:*")
+            cursor, keys = await redis_client.scan(cursor=cursor, match="voice_style:*")
             for key in keys:
-                note_data = json.loads(redis_client.get(key))
+                note_data = json.loads(await redis_client.get(key))
                 note_name = key.decode().split(":")[1]
                 all_notes.append({
                     "name": note_name,
@@ -835,7 +838,7 @@ async def handle_command(message_data: MessageManager.QQMessageData, qqBot, type
         voice_key = f"voice_style:{remark}"
 
         # 删除 Redis 中的记录
-        redis_client.delete(voice_key)
+        await redis_client.delete(voice_key)
         msg = f"备注为 '{remark}' 的语音记录已成功删除"
         await qqBot.send_group_msg(group_id=message_data.group_id, message=msg)
         logger.info(f"备注为 '{remark}' 的语音记录已成功删除")
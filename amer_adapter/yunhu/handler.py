@@ -5,7 +5,7 @@ from utils import logger
 import uuid
 import markdown
 from typing import Dict, Any
-from utils.config import(temp_folder, message_yh, message_yh_followed, bot_qq, replace_blocked_words)
+from utils.config import(temp_folder, message_yh, message_yh_followed, bot_qq, replace_blocked_words, coalesce_default_window_ms)
 import os
 
 from .. import qqtools, yhtools
@@ -67,7 +67,7 @@ async def handle_instruction_message(message_data: MessageManager.YunhuMessageDa
             await yhtools.send(message_data.message_chat_id, message_data.message_chat_type, "markdown", content=message_yh)
             return
         elif message_data.command_name == "群列表":
-            bind_infos = BindingManager.get_info("YH", message_data.message_chat_id)
+            bind_infos = await BindingManager.get_info_async("YH", message_data.message_chat_id)
             if bind_infos['status'] == 0:
                 # 获取云湖群名称
                 yunhu_group_name = await yhtools.get_group_name(message_data.message_chat_id)
@@ -166,6 +166,7 @@ async def handle_instruction_message(message_data: MessageManager.YunhuMessageDa
                 results.append("请输入需要绑定的群组ID")
             else:
                 member_info = await message_data.qqBot.get_group_list()
+                valid_group_ids = []
                 for group_id in group_ids[:]:
                     is_in_group = False
 
@@ -184,10 +185,16 @@ async def handle_instruction_message(message_data: MessageManager.YunhuMessageDa
                             results.append(f"绑定失败, 机器人不在QQ群{group_id}中")
                             continue
 
-                    # 调用绑定接口
-                    bind_result = BindingManager.bind("YH", selected_platform, message_data.message_chat_id, group_id)
-                    logger.info(f"绑定状态: {bind_result}")
+                    valid_group_ids.append(group_id)
 
+                # 调用批量绑定接口，所有群组在同一个事务中绑定
+                bind_results = await BindingManager.bind_many_async("YH", message_data.message_chat_id, selected_platform, valid_group_ids)
+                logger.info(f"绑定状态: {bind_results}")
+                if bind_results["status"] != 0:
+                    results.append(f"绑定失败: {bind_results['msg']}")
+
+                for bind_result in bind_results["results"]:
+                    group_id = bind_result["item"][3]
                     if bind_result["status"] == 0:
                         if selected_platform == "QQ":
                             await message_data.qqBot.send_group_msg(
@@ -211,11 +218,11 @@ async def handle_instruction_message(message_data: MessageManager.YunhuMessageDa
             group_ids = []
 
             # 定义处理逻辑
-            def handle_yvybln(id_value):
+            async def handle_yvybln(id_value):
                 """处理解绑全部绑定的开关"""
                 nonlocal jb_switch_status
                 if id_value is True:
-                    unbind_status = BindingManager.unbind_all("YH", message_data.message_chat_id)
+                    unbind_status = await BindingManager.unbind_all_async("YH", message_data.message_chat_id)
                     if unbind_status['status'] == 0:
                         results.append("已解绑所有关联平台")
                         return True
@@ -249,7 +256,7 @@ async def handle_instruction_message(message_data: MessageManager.YunhuMessageDa
 
                 # 根据id选择处理逻辑
                 if id == "yvybln":
-                    if handle_yvybln(id_value):
+                    if await handle_yvybln(id_value):
                         break  # 解绑全部后直接退出
                 elif id == "rwrkjc":
                     selected_platform = handle_rwrkjc(id_value)
@@ -259,8 +266,11 @@ async def handle_instruction_message(message_data: MessageManager.YunhuMessageDa
             # 处理解绑逻辑
             if not jb_switch_status and selected_platform:
                 if group_ids:
-                    for group_id in group_ids:
-                        unbind_status = BindingManager.unbind("YH", selected_platform, message_data.message_chat_id, group_id)
+                    unbind_results = await BindingManager.unbind_many_async("YH", message_data.message_chat_id, selected_platform, group_ids)
+                    if unbind_results['status'] != 0:
+                        results.append(f"解绑失败: {unbind_results['msg']}")
+                    for unbind_status in unbind_results['results']:
+                        group_id = unbind_status['item'][3]
                         if unbind_status['status'] == 0:
                             results.append(f"成功解绑{selected_platform}群号: {group_id}")
                         else:
@@ -337,14 +347,17 @@ async def handle_instruction_message(message_data: MessageManager.YunhuMessageDa
                 if selected_platform:
                     # 对指定平台进行同步设置
                     if group_ids:
-                        for group_id in group_ids:
-                            sync_status = BindingManager.set_sync("YH", selected_platform, message_data.message_chat_id, group_id, sync_data)
+                        sync_results = await BindingManager.set_sync_many_async("YH", message_data.message_chat_id, selected_platform, group_ids, sync_data)
+                        if sync_results['status'] != 0:
+                            results.append(f"设置同步模式失败: {sync_results['msg']}")
+                        for sync_status in sync_results['results']:
+                            group_id = sync_status['item'][3]
                             if sync_status['status'] == 0:
                                 results.append(f"成功设置{selected_platform}群号 {group_id} 的同步模式为: {sync_type}")
                             else:
                                 results.append(f"设置{selected_platform}群号 {group_id} 的同步模式失败: {sync_status['msg']}")
                     else:
-                        sync_status = BindingManager.set_all_sync("YH", message_data.message_chat_id, sync_data)
+                        sync_status = await BindingManager.set_all_sync_async("YH", message_data.message_chat_id, sync_data)
                         if sync_status['status'] == 0:
                             results.append(f"已更改所有绑定的同步模式为: {sync_type}")
                         else:
@@ -352,15 +365,18 @@ async def handle_instruction_message(message_data: MessageManager.YunhuMessageDa
                 else:
                     # 对所有平台进行同步设置
                     if group_ids:
-                        for group_id in group_ids:
-                            for platform in ["QQ", "MC"]:
-                                sync_status = BindingManager.set_sync("YH", platform, message_data.message_chat_id, group_id, sync_data)
-                                if sync_status['status'] == 0:
-                                    results.append(f"成功设置{platform}群号 {group_id} 的同步模式为: {sync_type}")
-                                else:
-                                    results.append(f"设置{platform}群号 {group_id} 的同步模式失败: {sync_status['msg']}")
+                        pairs = [("YH", platform, message_data.message_chat_id, group_id, sync_data) for group_id in group_ids for platform in ["QQ", "MC"]]
+                        sync_results = await BindingManager.set_sync_pairs_async(pairs)
+                        if sync_results['status'] != 0:
+                            results.append(f"设置同步模式失败: {sync_results['msg']}")
+                        for sync_status in sync_results['results']:
+                            platform, group_id = sync_status['item'][1], sync_status['item'][3]
+                            if sync_status['status'] == 0:
+                                results.append(f"成功设置{platform}群号 {group_id} 的同步模式为: {sync_type}")
+                            else:
+                                results.append(f"设置{platform}群号 {group_id} 的同步模式失败: {sync_status['msg']}")
                     else:
-                        sync_status = BindingManager.set_all_sync("YH", message_data.message_chat_id, sync_data)
+                        sync_status = await BindingManager.set_all_sync_async("YH", message_data.message_chat_id, sync_data)
                         if sync_status['status'] == 0:
                             results.append(f"已更改所有绑定的同步模式为: {sync_type}")
                         else:
@@ -369,6 +385,49 @@ async def handle_instruction_message(message_data: MessageManager.YunhuMessageDa
             # 发送结果消息
             result_message = "\n".join(results)
             await yhtools.send(message_data.message_chat_id, message_data.message_chat_type, "text", content=result_message)
+        elif message_data.command_name == "合并消息":
+            # 格式: 开 [毫秒] / 关 [可选:QQ群,QQ群]
+            args = [arg for arg in re.split(r'[\s,\，]+', message_data.message_content or "") if arg]
+            results = []
+            window_ms = None
+            if args and args[0] in ("开", "开启"):
+                args = args[1:]
+                window_ms = coalesce_default_window_ms
+                if args and args[0].lower().removesuffix("ms").isdigit():
+                    window_ms = int(args[0].lower().removesuffix("ms"))
+                    args = args[1:]
+            elif args and args[0] in ("关", "关闭"):
+                args = args[1:]
+                window_ms = 0
+
+            if window_ms is None:
+                results.append("请使用: /合并消息 <开 [毫秒] / 关> [可选:QQ群]")
+            elif window_ms > 10000:
+                results.append("合并窗口不能超过 10000 毫秒")
+            else:
+                mode = f"开启（{window_ms} 毫秒）" if window_ms else "关闭"
+                if args:
+                    # QQ群 -> 本群 方向
+                    pairs = [("QQ", "YH", group_id, message_data.message_chat_id, window_ms) for group_id in args]
+                    coalesce_results = await BindingManager.set_coalesce_pairs_async(pairs)
+                    if coalesce_results['status'] != 0:
+                        results.append(f"设置合并消息失败: {coalesce_results['msg']}")
+                    for coalesce_status in coalesce_results['results']:
+                        group_id = coalesce_status['item'][2]
+                        if coalesce_status['status'] == 0:
+                            results.append(f"QQ群 {group_id} 的合并消息已{mode}")
+                        else:
+                            results.append(f"设置QQ群 {group_id} 的合并消息失败: {coalesce_status['msg']}")
+                else:
+                    coalesce_status = await BindingManager.set_coalesce_to_async("YH", message_data.message_chat_id, "QQ", window_ms)
+                    if coalesce_status['status'] == 0:
+                        results.append(f"所有绑定QQ群的合并消息已{mode}")
+                    else:
+                        results.append(f"设置合并消息失败: {coalesce_status['msg']}")
+
+            # 发送结果消息
+            result_message = "\n".join(results)
+            await yhtools.send(message_data.message_chat_id, message_data.message_chat_type, "text", content=result_message)
     
     else:
         if message_data.command_name == "帮助":
@@ -1,16 +1,18 @@
 import uvicorn
 import os
 import datetime
-from utils.config import (server_host, server_port, yh_webhook_path, bot_qq, temp_folder)
+from utils.config import (server_host, server_port, yh_webhook_path, bot_qq, temp_folder, redis_client_sync, redis_pool)
 from aiocqhttp import CQHttp, Event
 from quart import request, jsonify
 from utils.log import logger
+from utils import pubsub, http
 from amer_adapter.yunhu.handler import handler as YH_handler
 from amer_adapter.qq.handler import (
     msg_handler as QQ_msg_handler,
     handle_request as QQ_request_handler,
     handle_notice as QQ_notice_handler
 )
+from amer_adapter import BindingManager, TaskManager, OutboxManager, CoalesceManager, MessageStore, basetools
 from route import register_api_routes, register_webui_routes
 
 if not os.path.exists(temp_folder):
@@ -18,6 +20,27 @@ if not os.path.exists(temp_folder):
 
 qqBot = CQHttp(__name__)
 app = qqBot.server_app
+
+# 启动时创建 HTTP 会话，订阅绑定/封禁变更事件，预热绑定路由缓存并迁移旧版黑名单和消息列表
+@app.before_serving
+async def warm_binding_routes():
+    TaskManager.supervisor.start()
+    pubsub.start_listener(redis_client_sync)
+    http.start()
+    await BindingManager.warm_routes_async()
+    await basetools.migrate_legacy_blacklist()
+    TaskManager.submit(MessageStore.migrate_legacy_lists, name="迁移旧版消息列表", retries=0)
+    await OutboxManager.start()
+
+# 关闭时等待后台任务完成并释放 HTTP 会话和 Redis 连接池
+@app.after_serving
+async def drain_background_tasks():
+    await CoalesceManager.flush_all()
+    await OutboxManager.stop()
+    await TaskManager.supervisor.drain()
+    await http.close()
+    await redis_pool.disconnect()
+
 # QQ - 消息
 @qqBot.on_message
 async def handle_msg(event: Event):
@@ -1,10 +1,10 @@
 import random
 import string
 from quart import request, jsonify, render_template_string, send_from_directory
-from utils import logger
+from utils import logger, limiter, http
 from amer_adapter import MessageManager, BindingManager , yhtools, qqtools
 import datetime
-from utils.config import redis_client
+from utils.config import redis_client, admin_api_token, forward_page_size
 from captcha.image import ImageCaptcha
 import base64
 from io import BytesIO
@@ -39,7 +39,7 @@ def register_routes(app, qqBot):
         try:
             client_ip = request.remote_addr
             rate_limit_key = f"{RATE_LIMIT_KEY_PREFIX}{client_ip}"
-            current_requests = redis_client.get(rate_limit_key)
+            current_requests = await redis_client.get(rate_limit_key)
 
             if current_requests and int(current_requests) >= MAX_REQUESTS_PER_MINUTE:
                 return await base_error_page("请求过于频繁", "您短时间内发送的请求过多，请稍后再试。"), 429
@@ -53,7 +53,7 @@ def register_routes(app, qqBot):
 
                 captcha_text, img_base64 = generate_captcha()
                 captcha_key = f"captcha:{client_ip}"
-                redis_client.set(captcha_key, captcha_text, ex=300)
+                await redis_client.set(captcha_key, captcha_text, ex=300)
 
                 return await render_template_string(
                     """
@@ -183,12 +183,12 @@ def register_routes(app, qqBot):
 
                 # 验证验证码
                 captcha_key = f"captcha:{client_ip}"
-                correct_captcha = redis_client.get(captcha_key)
+                correct_captcha = await redis_client.get(captcha_key)
                 if not correct_captcha or user_captcha.upper() != correct_captcha.decode("utf-8").upper():
                     return await base_error_page("验证码错误", "请输入正确的验证码。"), 400
 
                 # 删除已使用的验证码
-                redis_client.delete(captcha_key)
+                await redis_client.delete(captcha_key)
 
                 if not msg_id:
                     return await base_error_page("举报失败", "缺少必要参数，请检查您的请求。"), 400
@@ -206,10 +206,7 @@ def register_routes(app, qqBot):
                     return await base_error_page("解析失败", "无法解析消息信息，请稍后再试。"), 400
 
                 # 更新 Redis 请求计数
-                if not redis_client.exists(rate_limit_key):
-                    redis_client.set(rate_limit_key, 1, ex=60)
-                else:
-                    redis_client.incr(rate_limit_key)
+                await limiter.fixed_window(rate_limit_key, MAX_REQUESTS_PER_MINUTE, 60)
                 
                 # 获取被举报的用户ID
                 reported_user_id = message_info.get('sender_id')
@@ -218,17 +215,13 @@ def register_routes(app, qqBot):
 
                 # 记录举报次数
                 report_count_key = f"report_count:{reported_user_id}"
-                report_count = redis_client.get(report_count_key)
-                if report_count:
-                    report_count = int(report_count) + 1
-                else:
-                    report_count = 1
-                redis_client.set(report_count_key, report_count, ex=86400)
+                # 第三次开始封禁 30 分钟，之后每次增加10分钟
+                report_count, ban_duration = await limiter.escalate(
+                    report_count_key, 86400, free=2, base=1800, step=600, refresh_ttl=True
+                )
 
                 # 检查举报次数
                 if report_count >= 3:
-                    # 计算封禁时长
-                    ban_duration = 1800 + (report_count - 3) * 600  # 第三次开始，每次增加10分钟
 
                     # 封禁用户
                     ban_reason = "被多次举报"
@@ -238,7 +231,7 @@ def register_routes(app, qqBot):
                         unban_token = ''.join(random.choices(string.ascii_letters + string.digits, k=32))
                         unban_link = f"https://amer.bot.anran.xyz/unban?msgId={msg_id}&token={unban_token}"
                         unban_token_key = f"unban_token:{unban_token}"
-                        redis_client.set(unban_token_key, reported_user_id, ex=86400)
+                        await redis_client.set(unban_token_key, reported_user_id, ex=86400)
 
                         # 获取用户名
                         platform = message_info.get('platform_from')
@@ -347,13 +340,13 @@ def register_routes(app, qqBot):
 
             # 验证解封令牌
             unban_token_key = f"unban_token:{token}"
-            stored_user_id = redis_client.get(unban_token_key)
+            stored_user_id = await redis_client.get(unban_token_key)
             if not stored_user_id or stored_user_id.decode("utf-8") != user_id:
                 return await base_error_page("解封失败", "无效的解封令牌，请检查您的链接。"), 400
 
             # 检查当天解封次数
             unban_count_key = f"unban_count:{user_id}"
-            unban_count = redis_client.get(unban_count_key)
+            unban_count = await redis_client.get(unban_count_key)
             if unban_count and int(unban_count) >= 3:
                 return await base_error_page("解封次数限制", "您今天已经解封了3次，请明天再试。"), 400
 
@@ -362,10 +355,10 @@ def register_routes(app, qqBot):
                 unban_count = int(unban_count) + 1
             else:
                 unban_count = 1
-            redis_client.set(unban_count_key, unban_count, ex=86400)
+            await redis_client.set(unban_count_key, unban_count, ex=86400)
 
             # 移除解封令牌
-            redis_client.delete(unban_token_key)
+            await redis_client.delete(unban_token_key)
 
             # 解封用户
             unban_status = await basetools.remove_from_blacklist(user_id)
@@ -500,6 +493,72 @@ def register_routes(app, qqBot):
         except Exception as e:
             logger.error(f"查询黑名单列表失败: {e}")
             return jsonify({"status": 500, "msg": "服务器内部错误"}), 500
+    def check_admin_token():
+        """校验管理 API 的 Token（Authorization: Bearer <token> 或 ?token=）"""
+        token = request.headers.get("Authorization", "")
+        if token.startswith("Bearer "):
+            token = token[len("Bearer "):]
+        token = token or request.args.get("token", "")
+        return bool(admin_api_token) and token == admin_api_token
+
+    def parse_binding_items(data, with_sync=False):
+        """
+        解析批量绑定请求，支持两种格式:
+        - {"platform_a": "YH", "id_a": "...", "platform_b": "QQ", "ids": ["...", ...]}
+        - {"items": [{"platform_a": "...", "id_a": "...", "platform_b": "...", "id_b": "..."}, ...]}
+        设置同步状态时每项（或顶层）还需要 sync_data
+        """
+        if "items" in data:
+            items = data["items"]
+        else:
+            items = [
+                {"platform_a": data.get("platform_a"), "id_a": data.get("id_a"), "platform_b": data.get("platform_b"), "id_b": id_b}
+                for id_b in data.get("ids", [])
+            ]
+        pairs = []
+        for item in items:
+            pair = (item.get("platform_a"), item.get("platform_b"), item.get("id_a"), item.get("id_b"))
+            if None in pair:
+                return None
+            if with_sync:
+                sync_data = item.get("sync_data", data.get("sync_data"))
+                if not isinstance(sync_data, dict):
+                    return None
+                pair += (sync_data,)
+            pairs.append(pair)
+        return pairs
+
+    async def handle_binding_batch(operation, with_sync=False):
+        try:
+            if not check_admin_token():
+                return jsonify({"status": 403, "msg": "无权访问"}), 403
+
+            data = await request.get_json(silent=True) or {}
+            pairs = parse_binding_items(data, with_sync)
+            if not pairs:
+                return jsonify({"status": 400, "msg": "缺少必要参数"}), 400
+
+            result = await operation(pairs)
+            if result["status"] != 0:
+                return jsonify({"status": 500, "msg": result["msg"]}), 500
+            return jsonify({"status": 0, "msg": result["msg"], "data": result["results"]}), 200
+
+        except Exception as e:
+            logger.error(f"批量绑定操作失败: {e}")
+            return jsonify({"status": 500, "msg": "服务器内部错误"}), 500
+
+    @app.route("/api/v1/binding/bind", methods=['POST'])
+    async def binding_bind():
+        return await handle_binding_batch(BindingManager.bind_pairs_async)
+
+    @app.route("/api/v1/binding/unbind", methods=['POST'])
+    async def binding_unbind():
+        return await handle_binding_batch(BindingManager.unbind_pairs_async)
+
+    @app.route("/api/v1/binding/sync", methods=['POST'])
+    async def binding_sync():
+        return await handle_binding_batch(BindingManager.set_sync_pairs_async, with_sync=True)
+
     @app.route("/sync/video", methods=['GET'])
     async def video_player():
         try:
@@ -510,7 +569,7 @@ def register_routes(app, qqBot):
 
             # 从 Redis 中获取视频信息
             video_key = f"video:{video_id}"
-            video_info = redis_client.get(video_key)
+            video_info = await redis_client.get(video_key)
             if not video_info:
                 return await base_error_page("视频未找到", "未找到指定的视频信息，请检查您的请求。"), 404
 
@@ -589,6 +648,98 @@ def register_routes(app, qqBot):
         except Exception as e:
             logger.error(f"处理视频播放时发生错误: {e}")
             return await base_error_page("服务器错误", "抱歉，处理您的请求时发生了错误，请稍后再试。"), 500
+    @app.route("/sync/forward", methods=['GET'])
+    async def forward_viewer():
+        try:
+            forward_id = request.args.get("id")
+            if not forward_id:
+                return await base_error_page("参数错误", "缺少必要参数，请检查您的请求。"), 400
+            try:
+                offset = max(int(request.args.get("offset", 0)), 0)
+            except ValueError:
+                return await base_error_page("参数错误", "offset 参数无效，请检查您的请求。"), 400
+
+            # 只能查看已同步过的合并转发
+            nodes = await qqtools.get_forward_nodes(forward_id)
+            if nodes is None:
+                return await base_error_page("合并转发未找到", "未找到指定的合并转发，可能已过期。"), 404
+
+            page = nodes[offset:offset + forward_page_size]
+            next_offset = offset + len(page)
+            return await render_template_string(
+                """
+                <!DOCTYPE html>
+                <html lang="zh">
+                <head>
+                    <meta charset="UTF-8">
+                    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                    <title>合并转发</title>
+                    <style>
+                        body { 
+                            font-family: Arial, sans-serif; 
+                            background: #f5f5f5;
+                            color: #333;
+                            margin: 0;
+                            padding: 0;
+                        }
+                        .container { 
+                            max-width: 800px; 
+                            margin: 50px auto; 
+                            padding: 20px; 
+                            background: #fff;
+                            border-radius: 8px; 
+                            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.1);
+                        }
+                        .node { 
+                            background: #f9f9f9; 
+                            padding: 8px; 
+                            border-radius: 5px; 
+                            margin-bottom: 6px; 
+                            white-space: pre-wrap; 
+                            word-break: break-all; 
+                        }
+                        .meta { 
+                            font-size: 0.9em; 
+                            color: #888; 
+                        }
+                        a { 
+                            display: inline-block; 
+                            padding: 10px 20px; 
+                            background: #000; 
+                            color: #fff; 
+                            text-decoration: none; 
+                            border-radius: 5px; 
+                            font-weight: bold; 
+                        }
+                        a:hover { 
+                            background: #333; 
+                        }
+                    </style>
+                </head>
+                <body>
+                    <div class="container">
+                        <h3>📨 合并转发</h3>
+                        <p class="meta">第 {{ offset + 1 }} - {{ next_offset }} 条，共 {{ total }} 条</p>
+                        {% for node in page %}
+                        <div class="node"><b>{{ node.sender }}</b> <span class="meta">({{ node.time }})</span>: {{ node.content }}</div>
+                        {% endfor %}
+                        {% if next_offset < total %}
+                        <a href="?id={{ forward_id | urlencode }}&offset={{ next_offset }}">查看后 {{ total - next_offset }} 条</a>
+                        {% endif %}
+                    </div>
+                </body>
+                </html>
+                """,
+                page=page,
+                offset=offset,
+                next_offset=next_offset,
+                total=len(nodes),
+                forward_id=forward_id,
+            )
+
+        except Exception as e:
+            logger.error(f"处理合并转发查看时发生错误: {e}")
+            return await base_error_page("服务器错误", "抱歉，处理您的请求时发生了错误，请稍后再试。"), 500
     @app.route("/uploads/audio/voice", methods=['POST'])
     async def upload_voice():
         try:
@@ -602,7 +753,7 @@ def register_routes(app, qqBot):
                 return jsonify({"status": 400, "msg": "缺少必要参数"}), 400
             
             token_key = f"voice_upload_token:{token}"
-            custom_name_data = redis_client.get(token_key)
+            custom_name_data = await redis_client.get(token_key)
             if not custom_name_data:
                 logger.error(f"上传语音 - 无效或过期的 Token: {token}")
                 return jsonify({"status": 400, "msg": "无效或过期的 Token"}), 400
@@ -651,31 +802,30 @@ def register_routes(app, qqBot):
 
             logger.info(f"上传语音 - 准备调用外部 API: URL={url}, Headers={headers}")
 
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, data=form_data, headers=headers) as response:
-                    response_text = await response.text()
-                    logger.info(f"上传语音 - 外部 API 响应: Status={response.status}, Response={response_text}")
-                    if response.status == 200:
-                        result = json.loads(response_text)
-                        voice_uri = result.get("uri")
-                        
-                        voice_style_data = {
-                            "user_id": user_id,
-                            "user_name": user_name,
-                            "voice_uri": voice_uri
-                        }
-                        redis_client.set(f"voice_style:{custom_name}", json.dumps(voice_style_data))
-                        redis_client.delete(token_key)
-
-                        logger.info(f"上传语音 - 成功: Voice_URI={voice_uri}")
-                        return jsonify({
-                            "status": 0,
-                            "msg": f"上传完毕",
-                            "data": {"uri": voice_uri}
-                        }), 200
-                    else:
-                        logger.error(f"上传语音 - 外部 API 调用失败: Status={response.status}, Response={response_text}")
-                        return jsonify({"status": response.status, "msg": response_text}), response.status
+            async with http.request("siliconflow", "POST", url, data=form_data, headers=headers) as response:
+                response_text = await response.text()
+                logger.info(f"上传语音 - 外部 API 响应: Status={response.status}, Response={response_text}")
+                if response.status == 200:
+                    result = json.loads(response_text)
+                    voice_uri = result.get("uri")
+                    
+                    voice_style_data = {
+                        "user_id": user_id,
+                        "user_name": user_name,
+                        "voice_uri": voice_uri
+                    }
+                    await redis_client.set(f"voice_style:{custom_name}", json.dumps(voice_style_data))
+                    await redis_client.delete(token_key)
+
+                    logger.info(f"上传语音 - 成功: Voice_URI={voice_uri}")
+                    return jsonify({
+                        "status": 0,
+                        "msg": f"上传完毕",
+                        "data": {"uri": voice_uri}
+                    }), 200
+                else:
+                    logger.error(f"上传语音 - 外部 API 调用失败: Status={response.status}, Response={response_text}")
+                    return jsonify({"status": response.status, "msg": response_text}), response.status
 
         except Exception as e:
             logger.error(f"上传语音 - 处理过程中发生错误: {e}", exc_info=True)
@@ -687,7 +837,7 @@ def register_routes(app, qqBot):
             return await base_error_page("参数错误", "缺少必要参数 token，请检查您的请求。"), 400
 
         custom_name_key = f"voice_upload_token:{token}"
-        custom_name_data = redis_client.get(custom_name_key)
+        custom_name_data = await redis_client.get(custom_name_key)
         if not custom_name_data:
             return await base_error_page("无效或过期的 Token", "请重新生成上传链接。"), 400
 
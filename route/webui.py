@@ -1,25 +1,27 @@
-from utils import logger
-from utils.config import redis_client
+from utils import logger, scheduler, http
+from utils.config import redis_client, message_ttl
 from quart import jsonify, render_template_string
 from .base_page import base_error_page
 import json
-from amer_adapter import basetools
+import time
+from amer_adapter import basetools, BindingManager, TaskManager, ToolManager, DeliveryManager, OutboxManager, CoalesceManager, ProfileManager, IdentityManager
 def register_routes(app, qqBot):
     async def get_stats_data():
         try:
-            # 获取各平台消息数量
+            # 获取各平台保留时间内的消息数量（各群的本地时间线 timeline:local:{平台}:{ID}，SCAN 不阻塞 Redis）
             platform_stats = {"QQ": 0, "YH": 0, "MC": 0}
             group_stats = {}
+            cutoff = f"({time.time() - message_ttl}"
             for platform in platform_stats.keys():
-                keys = [key.decode('utf-8') for key in redis_client.keys(f"{platform}:*:{platform}:*")]
+                keys = [key.decode('utf-8') async for key in redis_client.scan_iter(match=f"timeline:local:{platform}:*", count=500)]
+                pipe = redis_client.pipeline(transaction=False)
                 for key in keys:
-                    messages = [msg.decode('utf-8') for msg in redis_client.lrange(key, 0, -1)]
-                    count = len(messages) if messages else 0
+                    pipe.zcount(key, cutoff, "+inf")
+                for key, count in zip(keys, await pipe.execute()):
                     platform_stats[platform] += count
-                    
+
                     # 提取群组ID并统计
-                    parts = key.split(':')
-                    group_id = parts[1]
+                    group_id = key.split(':', 3)[3]
                     group_key = f"{platform}:{group_id}"
                     group_stats[group_key] = group_stats.get(group_key, 0) + count
 
@@ -36,11 +38,11 @@ def register_routes(app, qqBot):
                 platform_top_groups[platform] = sorted(platform_groups, key=lambda x: x[1], reverse=True)[:5]
 
             # 获取消息频率数据
-            freq_keys = [key.decode('utf-8') for key in redis_client.keys("message_frequency:*")]
+            freq_keys = [key.decode('utf-8') async for key in redis_client.scan_iter(match="message_frequency:*", count=500)]
             freq_stats = []
             for key in freq_keys:
                 parts = key.split(':')
-                count = int(redis_client.get(key).decode('utf-8') or 0)
+                count = int((await redis_client.get(key)).decode('utf-8') or 0)
                 freq_stats.append({
                     "platform": parts[1],
                     "user_id": parts[2],
@@ -49,12 +51,12 @@ def register_routes(app, qqBot):
             top_freq_users = sorted(freq_stats, key=lambda x: x["count"], reverse=True)[:5]
 
             # 获取近期违规消息
-            sensitive_keys = [key.decode('utf-8') for key in redis_client.keys("sensitive_messages:*")]
+            sensitive_keys = [key.decode('utf-8') async for key in redis_client.scan_iter(match="sensitive_messages:*", count=500)]
             violations = []
             for key in sensitive_keys:
                 # 检查键类型是否为列表
-                if redis_client.type(key).decode('utf-8') == 'list':
-                    sensitive_messages = [msg.decode('utf-8') for msg in redis_client.lrange(key, 0, 10)]
+                if (await redis_client.type(key)).decode('utf-8') == 'list':
+                    sensitive_messages = [msg.decode('utf-8') for msg in await redis_client.lrange(key, 0, 10)]
                     for msg in sensitive_messages:
                         try:
                             message = json.loads(msg)
@@ -111,6 +113,26 @@ def register_routes(app, qqBot):
             logger.error(f"获取统计数据失败: {e}")
             return jsonify({"status": 500, "msg": "服务器内部错误"}), 500
 
+    @app.route("/api/metrics", methods=['GET'])
+    async def metrics_api():
+        return jsonify({
+            "status": 0,
+            "msg": "查询成功",
+            "data": {
+                "binding": BindingManager.get_latency_stats(),
+                "tasks": TaskManager.get_stats(),
+                "ban_cache": ToolManager.ban_cache.get_stats(),
+                "yh_profile": ProfileManager.get_stats(),
+                "qq_identity": IdentityManager.get_stats(),
+                "forward_cache": {**ToolManager.forward_cache.get_stats(), "shared": ToolManager.forward_inflight.shared},
+                "delivery": DeliveryManager.get_stats(),
+                "outbox": OutboxManager.get_stats(),
+                "coalesce": CoalesceManager.get_stats(),
+                "scheduler": scheduler.get_stats(),
+                "http": http.get_stats()
+            }
+        }), 200
+
     @app.route("/", methods=['GET'])
     async def home():
         """项目主页"""
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+# get() 未命中时的默认返回值，用于区分“未缓存”和“缓存了 None（负缓存）”
+MISSING = object()
+
+class TTLCache:
+    """
+    进程内 LRU + TTL 缓存，线程安全（事件订阅线程会调用 invalidate）。
+    值可以为 None，用于缓存“不存在”的结果。
+    """
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=MISSING):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+class SingleFlight:
+    """
+    同一个键的并发调用共享一次执行（例如同一资料的并发查询只发起一次请求）。
+    需要在事件循环线程中使用。
+    """
+    def __init__(self):
+        self._tasks = {}
+        self.shared = 0
+
+    async def do(self, key, async_func, *args):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(async_func(*args))
+            self._tasks[key] = task
+            task.add_done_callback(lambda task: self._tasks.pop(key, None))
+        else:
+            self.shared += 1
+        # 某个调用方被取消时不影响其它等待同一结果的调用方
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._tasks)
+
+class SizedLRUCache:
+    """
+    进程内 LRU 缓存，同时限制条目数和总大小（不过期，适合内容不会改变的键，例如合并转发ID）。
+    单个条目超过总大小上限时不缓存。
+    """
+    def __init__(self, max_size=200, max_bytes=8 * 1024 * 1024):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, size):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, size)
+            self.bytes += size
+            while len(self._data) > self.max_size or self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self.bytes -= item[1]
+
+    def get_stats(self):
+        with self._lock:
+            return {"size": len(self._data), "bytes": self.bytes, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
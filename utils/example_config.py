@@ -1,13 +1,16 @@
 import os
 import redis
+import redis.asyncio as aioredis
 from openai import OpenAI
 from . import logger
+from .moderation import ModerationEngine
 config = {
     "admin_user_id": "2694611137",
     "temp_folder": "/anran/bots/amer/utils/temp",
     "server": {
         "host": "0.0.0.0",
-        "port": 5888
+        "port": 5888,
+        "admin_token": ""  # 管理API的Token，留空则禁用管理API
     },
     "qq": {
         "bot_name": "amer",
@@ -41,13 +44,18 @@ config = {
         "host": "127.0.0.1",
         "port": 6379,
         "db": 14,
-        "password": ""
+        "password": "",
+        "max_connections": 50,  # 连接池最大连接数
+        "socket_timeout": 5  # 单次命令超时（秒）
     },
     "SQLite": {
         "db_path": "utils/sqlite/amer.db"
     },
+    "history": {
+        "ttl": 604800  # 消息内容、时间线和消息统计的保留时间（秒）
+    },
     "Message": {
-        "message-YH": "**指令说明**\n\n1. **/绑定 <QQ群号>**\n   - **功能**: 将当前云湖群与指定的QQ群进行绑定。\n\n2. **/同步模式 <全同步 / 停止 / QQ到云湖 / 云湖到QQ> [可选:QQ群]**\n   - **功能**: 切换消息同步模式，支持多向同步、单向同步（云湖到QQ、QQ到云湖）和停止同步。\n\n3. **/解绑 <QQ群号 / 全部>**\n   - **功能**: 取消与指定QQ群的绑定，输入“全部”时取消所有绑定。\n---\n**注意**: 操作教程需在机器人私聊中使用 `/帮助` 指令。\n - **全体消息自动加到绑定群聊的看板**: 所有消息会自动添加到绑定群聊的看板中，方便查看和管理。",
+        "message-YH": "**指令说明**\n\n1. **/绑定 <QQ群号>**\n   - **功能**: 将当前云湖群与指定的QQ群进行绑定。\n\n2. **/同步模式 <全同步 / 停止 / QQ到云湖 / 云湖到QQ> [可选:QQ群]**\n   - **功能**: 切换消息同步模式，支持多向同步、单向同步（云湖到QQ、QQ到云湖）和停止同步。\n\n3. **/解绑 <QQ群号 / 全部>**\n   - **功能**: 取消与指定QQ群的绑定，输入“全部”时取消所有绑定。\n\n4. **/合并消息 <开 [毫秒] / 关> [可选:QQ群]**\n   - **功能**: 把QQ群短时间内的多条消息合并为一条发送到本群，适合消息较多的群聊。\n---\n**注意**: 操作教程需在机器人私聊中使用 `/帮助` 指令。\n - **全体消息自动加到绑定群聊的看板**: 所有消息会自动添加到绑定群聊的看板中，方便查看和管理。",
         "message-YH-followed": "# 欢迎使用Amer-Link!\n\n**简介**\n- Amer机器人用于在云湖群和QQ群之间同步消息。请注意，您无法在当前页面使用绑定指令。\n\n**功能更新**\n- **单向消息同步**: 消息可以从云湖单向同步到QQ群或从QQ群单向同步到云湖。\n- **双向消息同步**: 消息可以在云湖和QQ群之间双向同步。\n- **其它同步**: 图片、表情包、视频、部分分享内容等也可以在云湖和QQ群之间同步。\n\n**如何使用**\n1. **添加Amer至群聊**: 确保将Amer添加至您的QQ群和云湖群。[点击此处添加QQ-Amer](https://qm.qq.com/q/2RSZSEkRwY)\n2. **在云湖端操作**: 在云湖群中绑定您的QQ群，以便开始消息同步。当云湖群绑定QQ群时，QQ群中会提示“此群被云湖绑定了”。\n3. **选择同步模式**: 根据您的需求选择单向或多向消息同步。\n\n**注意**: 指令详情请在云湖群中使用 `/帮助` 指令查看。\n\n如果想请我喝奶茶,[点我赞助](https://ifdian.net/a/YingXinche)"
     },
     "AI": {
@@ -67,6 +75,71 @@ config = {
             "window": 30
         }
     },
+    "task": {
+        "max_concurrent": 20,  # 后台任务最大并发数
+        "max_retries": 2,  # 失败后的重试次数
+        "retry_delay": 1,  # 首次重试前的等待秒数，之后每次翻倍
+        "drain_timeout": 10  # 关闭时等待后台任务完成的最长秒数
+    },
+    "delivery": {
+        "max_concurrent": 50,  # 同时进行的群消息投递总数上限
+        "platform_concurrent": {"QQ": 10, "YH": 20},  # 各平台同时进行的投递数上限
+        "timeout": 10  # 单个群聊投递的超时秒数（不含发送限速排队的时间）
+    },
+    "outbox": {
+        "shards": 8,  # 发送队列分片数（同一群聊的消息总在同一分片，按顺序发送）
+        "max_attempts": 8,  # 最大投递次数，超过后进入死信队列
+        "retry_delay": 1,  # 首次重试前的等待秒数，之后每次翻倍
+        "max_retry_delay": 60,  # 重试等待的最大秒数
+        "batch_size": 100,  # 每次从队列读取的消息数
+        "max_buffered": 1000,  # 每个分片在内存中等待发送的最大消息数
+        "lease_ttl": 30,  # 分片租约秒数（同一时间每个分片只由一个进程消费）
+        "dead_letter_maxlen": 10000  # 死信队列保留的最大条数（近似），超出后丢弃最早的记录
+    },
+    "send_rate": {
+        # rate / burst: 每个目标（群聊 / 用户）每秒令牌数 / 桶容量
+        # bot_rate / bot_burst: 每个机器人每秒令牌数 / 桶容量
+        "YH": {"rate": 1, "burst": 5, "bot_rate": 20, "bot_burst": 40},
+        "QQ": {"rate": 1, "burst": 5, "bot_rate": 10, "bot_burst": 20}
+    },
+    "coalesce": {
+        "max_messages": 20,  # 合并窗口内最多合并的消息数，达到后立即发送
+        "default_window_ms": 500,  # 开启合并时未指定窗口的默认值（毫秒）
+        "enqueue_retries": 3,  # 合并后的消息写入发送队列失败时的重试次数
+        "retry_delay": 0.5  # 首次重试前的等待秒数，之后每次翻倍
+    },
+    "http": {
+        "limit": 100,  # 每个上游的最大连接数
+        "limit_per_host": 30,  # 每个主机的最大连接数
+        "dns_ttl": 300,  # DNS 缓存秒数
+        "keepalive_timeout": 60,  # 空闲连接保留秒数
+        "connect_timeout": 5,  # 建立连接超时秒数
+        "timeouts": {"default": 30, "yunhu": 15, "yunhu_web": 10, "siliconflow": 120}  # 各上游的请求总超时秒数
+    },
+    "render": {
+        "concurrency": 8,  # 单条QQ消息同时渲染的消息段数（@ 查询、合并转发等）
+        "deadline": 3  # 单条QQ消息的渲染时限（秒），超时的消息段使用占位文本
+    },
+    "forward": {
+        "node_budget": 30,  # 同步合并转发时最多展开的消息条数，其余部分通过网页查看
+        "page_size": 100,  # 网页查看合并转发时每页的消息条数
+        "cache_max_size": 500,  # 缓存的合并转发展开结果数量
+        "cache_max_bytes": 16 * 1024 * 1024,  # 缓存的合并转发展开结果总大小（字符数）
+        "ttl": 86400  # 未展开部分在 Redis 中的保存时间（秒）
+    },
+    "cache": {
+        "ban_ttl": 60,  # 封禁状态本地缓存秒数（封禁/解封时会通过事件立即失效）
+        "ban_max_size": 10000,  # 封禁状态本地缓存的最大用户数
+        "profile_local_ttl": 300,  # 云湖群聊 / 用户资料本地缓存秒数
+        "profile_ttl": 3600,  # 云湖资料在 Redis 中的缓存秒数
+        "profile_negative_ttl": 600,  # 云湖资料不存在时的缓存秒数
+        "profile_error_ttl": 30,  # 抓取云湖资料失败后多久重试（秒）
+        "profile_max_size": 10000,  # 云湖资料本地缓存的最大数量
+        "qq_group_ttl": 3600,  # QQ群信息缓存秒数
+        "qq_user_ttl": 3600,  # QQ昵称缓存秒数
+        "qq_member_ttl": 1800,  # QQ群成员信息（群名片 / 角色）缓存秒数，也是重新拉取成员列表的间隔
+        "qq_max_size": 50000  # QQ身份缓存每类的最大数量
+    },
     "commands": {
         "list": {
             "qq": ["封禁", "帮助", "ai配置", "ai开关", "同步群组管理"]
@@ -104,6 +177,7 @@ config = {
 temp_folder = config['temp_folder']
 server_host = config['server']['host']
 server_port = config['server']['port']
+admin_api_token = config['server']['admin_token']
 
 bot_name = config['qq']['bot_name']
 bot_qq = config['qq']['bot_qq']
@@ -131,6 +205,50 @@ max_concurrent_requests = config['AI']['max_concurrent_requests']
 ai_rate_limit_group = config['AI']['rate_limit']['group']
 ai_rate_limit_private = config['AI']['rate_limit']['private']
 ai_rate_limit_window = config['AI']['rate_limit']['window']
+task_max_concurrent = config['task']['max_concurrent']
+task_max_retries = config['task']['max_retries']
+task_retry_delay = config['task']['retry_delay']
+task_drain_timeout = config['task']['drain_timeout']
+delivery_max_concurrent = config['delivery']['max_concurrent']
+delivery_platform_concurrent = config['delivery']['platform_concurrent']
+delivery_timeout = config['delivery']['timeout']
+outbox_shards = config['outbox']['shards']
+outbox_max_attempts = config['outbox']['max_attempts']
+outbox_retry_delay = config['outbox']['retry_delay']
+outbox_max_retry_delay = config['outbox']['max_retry_delay']
+outbox_batch_size = config['outbox']['batch_size']
+outbox_max_buffered = config['outbox']['max_buffered']
+outbox_lease_ttl = config['outbox']['lease_ttl']
+outbox_dead_letter_maxlen = config['outbox']['dead_letter_maxlen']
+send_rate_limits = config['send_rate']
+coalesce_max_messages = config['coalesce']['max_messages']
+coalesce_default_window_ms = config['coalesce']['default_window_ms']
+coalesce_enqueue_retries = config['coalesce']['enqueue_retries']
+coalesce_retry_delay = config['coalesce']['retry_delay']
+http_limit = config['http']['limit']
+http_limit_per_host = config['http']['limit_per_host']
+http_dns_ttl = config['http']['dns_ttl']
+http_keepalive_timeout = config['http']['keepalive_timeout']
+http_connect_timeout = config['http']['connect_timeout']
+http_timeouts = config['http']['timeouts']
+render_concurrency = config['render']['concurrency']
+render_deadline = config['render']['deadline']
+forward_node_budget = config['forward']['node_budget']
+forward_page_size = config['forward']['page_size']
+forward_cache_max_size = config['forward']['cache_max_size']
+forward_cache_max_bytes = config['forward']['cache_max_bytes']
+forward_ttl = config['forward']['ttl']
+ban_cache_ttl = config['cache']['ban_ttl']
+ban_cache_max_size = config['cache']['ban_max_size']
+profile_local_ttl = config['cache']['profile_local_ttl']
+profile_ttl = config['cache']['profile_ttl']
+profile_negative_ttl = config['cache']['profile_negative_ttl']
+profile_error_ttl = config['cache']['profile_error_ttl']
+profile_cache_max_size = config['cache']['profile_max_size']
+qq_group_cache_ttl = config['cache']['qq_group_ttl']
+qq_user_cache_ttl = config['cache']['qq_user_ttl']
+qq_member_cache_ttl = config['cache']['qq_member_ttl']
+qq_identity_max_size = config['cache']['qq_max_size']
 blocked_words = config['blocked_words']
 admin_user_id = config['admin_user_id']
 
@@ -165,33 +283,46 @@ else:
     low_drive_model = "deepseek-chat"
     low_client = OpenAI(base_url=openai_base_url, api_key=openai_api_key)
 
+# 违规词正则只在启动时编译一次
+moderation_engine = ModerationEngine(blocked_words)
+
 def replace_blocked_words(message: str) -> str:
-    replaced_words = []
-    for category, words in blocked_words.items():
-        for word in words:
-            if word in message:
-                message = message.replace(word, '*' * len(word))
-                replaced_words.append((word, category))
-    if replaced_words:
-        logger.info(f"屏蔽字符: {replaced_words}")
-    return message
+    return moderation_engine.mask(message)
 
 # Redis
 redis_host = config['Redis']['host']
 redis_port = config['Redis']['port']
 redis_db = config['Redis']['db']
 redis_password = config['Redis']['password']
+redis_max_connections = config['Redis']['max_connections']
+redis_socket_timeout = config['Redis']['socket_timeout']
 try:
-    redis_client = redis.Redis(
+    # 同步客户端，仅用于脚本和后台线程（数据库线程、事件订阅线程）
+    redis_client_sync = redis.Redis(
         host=redis_host,
         port=redis_port,
         db=redis_db,
         password=redis_password,
     )
-    redis_client.ping()
+    redis_client_sync.ping()
 except redis.ConnectionError:
     logger.warning(f"无法连接到 Redis 服务器: {redis_host}:{redis_port}")
     exit(1)
 
+# 异步客户端，事件循环中的所有 Redis 操作都通过它，共享同一个连接池
+redis_pool = aioredis.ConnectionPool(
+    host=redis_host,
+    port=redis_port,
+    db=redis_db,
+    password=redis_password,
+    max_connections=redis_max_connections,
+    socket_timeout=redis_socket_timeout,
+    health_check_interval=30,
+)
+redis_client = aioredis.Redis(connection_pool=redis_pool)
+
 # SQLite
-sqlite_db_path = config['SQLite']['db_path']
\ No newline at end of file
+sqlite_db_path = config['SQLite']['db_path']
+
+# 消息历史
+message_ttl = config['history']['ttl']
\ No newline at end of file
@@ -0,0 +1,89 @@
+import time
+import aiohttp
+from contextlib import asynccontextmanager
+from . import logger
+from .metrics import get_histogram, snapshot_all
+from .config import http_limit, http_limit_per_host, http_dns_ttl, http_keepalive_timeout, http_connect_timeout, http_timeouts
+
+"""
+共享 HTTP 会话
+
+每个上游一个长期存在的 aiohttp.ClientSession（连接池 + keep-alive + DNS 缓存），
+避免每次请求都重新建立 TCP/TLS 连接:
+- yunhu: 云湖开放接口 chat-go.jwzhd.com（发送、编辑、看板、上传图片）
+- yunhu_web: 云湖网页 www.yhchat.com（群聊 / 用户信息）
+- siliconflow: 硅基流动 api.siliconflow.cn（语音、图片生成）
+会话在服务启动时创建、停止时关闭，请求耗时记录在 http.{上游} 直方图中。
+"""
+
+UPSTREAMS = ("yunhu", "yunhu_web", "siliconflow")
+
+_sessions = {}
+stats = {}
+
+def _create_session(upstream):
+    connector = aiohttp.TCPConnector(
+        limit=http_limit,
+        limit_per_host=http_limit_per_host,
+        ttl_dns_cache=http_dns_ttl,
+        keepalive_timeout=http_keepalive_timeout
+    )
+    timeout = aiohttp.ClientTimeout(total=http_timeouts.get(upstream, http_timeouts["default"]), connect=http_connect_timeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+def get_session(upstream) -> aiohttp.ClientSession:
+    """获取上游的共享会话，未创建或已关闭时重新创建（需要在事件循环中调用）"""
+    session = _sessions.get(upstream)
+    if session is None or session.closed:
+        session = _sessions[upstream] = _create_session(upstream)
+    return session
+
+@asynccontextmanager
+async def request(upstream, method, url, **kwargs):
+    """
+    使用共享会话发送请求，用法与 session.request 相同:
+
+        async with http.request("yunhu", "POST", url, data=data) as response:
+            ...
+
+    :param upstream: 上游名称，见 UPSTREAMS
+    :param method: 请求方法
+    :param url: 请求地址
+    :param kwargs: 传给 session.request 的参数（headers / json / data / timeout / ssl 等）
+    """
+    upstream_stats = stats.setdefault(upstream, {"requests": 0, "errors": 0})
+    upstream_stats["requests"] += 1
+    start = time.perf_counter()
+    failed = False
+    try:
+        async with get_session(upstream).request(method, url, **kwargs) as response:
+            failed = response.status >= 400
+            yield response
+    except Exception:
+        failed = True
+        raise
+    finally:
+        if failed:
+            upstream_stats["errors"] += 1
+        get_histogram(f"http.{upstream}").observe(time.perf_counter() - start)
+
+def start():
+    """创建所有上游的会话（服务启动时调用）"""
+    for upstream in UPSTREAMS:
+        get_session(upstream)
+    logger.info(f"HTTP 会话已创建: {', '.join(UPSTREAMS)}")
+
+async def close():
+    """关闭所有会话（服务停止时调用）"""
+    for upstream, session in list(_sessions.items()):
+        try:
+            await session.close()
+        except Exception as e:
+            logger.error(f"关闭 {upstream} 的 HTTP 会话失败: {e}")
+    _sessions.clear()
+
+def get_stats():
+    return {
+        "results": {upstream: dict(upstream_stats) for upstream, upstream_stats in stats.items()},
+        "latency": snapshot_all("http.")
+    }
@@ -0,0 +1,156 @@
+import time
+import uuid
+from .config import redis_client
+
+"""
+基于 Redis Lua 脚本的限流器
+
+每个限流器只需一次调用，在 Redis 服务端原子执行，多个进程并发时不会出现竞争:
+- sliding_window: 滑动窗口（有序集合记录每次请求的时间），用于 AI 对话频率限制
+- fixed_window: 固定窗口计数（首次请求时设置过期时间），用于消息频率、举报频率，可顺带读取一个哈希（如封禁信息）
+- escalate: 违规次数计数，根据次数计算递增的封禁时长
+- token_bucket: 令牌桶（可同时检查多个桶），用于发送消息的限速
+
+函数的 client 参数可以传入 pipeline，此时命令只会被加入 pipeline，结果从 execute() 中获取。
+"""
+
+SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+if count >= limit then
+    return {0, count}
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], window)
+return {1, count + 1}
+"""
+
+# 传入 KEYS[2] 时额外返回该哈希的 HGETALL 结果，与计数合并为一次 EVALSHA
+FIXED_WINDOW_LUA = """
+local count = redis.call('INCRBY', KEYS[1], ARGV[2])
+if redis.call('TTL', KEYS[1]) < 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+local allowed = 0
+if count <= tonumber(ARGV[3]) then
+    allowed = 1
+end
+if KEYS[2] then
+    return {allowed, count, redis.call('HGETALL', KEYS[2])}
+end
+return {allowed, count}
+"""
+
+PENALTY_LUA = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 or ARGV[2] == '1' then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return count
+"""
+
+# 所有桶都有令牌时才一起扣除；否则不扣除，返回需要等待的毫秒数
+TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local burst = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local current = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    current = math.min(burst, current + math.max(0, now - ts) * rate / 1000)
+    tokens[i] = current
+    if current < 1 then
+        wait = math.max(wait, math.ceil((1 - current) * 1000 / rate))
+    end
+end
+if wait > 0 then
+    return wait
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 2])
+    local burst = tonumber(ARGV[i * 2 + 1])
+    redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(burst * 1000 / rate) + 1000)
+end
+return 0
+"""
+
+_sliding_window_script = redis_client.register_script(SLIDING_WINDOW_LUA)
+_fixed_window_script = redis_client.register_script(FIXED_WINDOW_LUA)
+_penalty_script = redis_client.register_script(PENALTY_LUA)
+_token_bucket_script = redis_client.register_script(TOKEN_BUCKET_LUA)
+
+def _as_tuple(result):
+    # 通过 pipeline 调用时返回的是 pipeline 本身，结果由 execute() 返回
+    return (bool(result[0]), int(result[1])) if isinstance(result, list) else result
+
+async def sliding_window(key: str, limit: int, window: int, client=None) -> tuple:
+    """
+    滑动窗口限流: 最近 window 秒内最多 limit 次，超出时本次请求不计数。
+
+    :param key: 限流键
+    :param limit: 窗口内允许的次数
+    :param window: 窗口长度（秒）
+    :param client: Redis 客户端或 pipeline，默认为全局客户端
+    :return: (是否允许, 窗口内的次数)，通过 pipeline 调用时 execute() 返回 [是否允许, 次数]
+    """
+    now = int(time.time() * 1000)
+    result = await _sliding_window_script(
+        keys=[key], args=[now, int(window * 1000), limit, f"{now}:{uuid.uuid4().hex[:8]}"], client=redis_client if client is None else client
+    )
+    return _as_tuple(result)
+
+async def fixed_window(key: str, limit: int, window: int, cost=1, client=None, hash_key=None) -> tuple:
+    """
+    固定窗口计数: 计数器在首次请求后 window 秒过期，每次请求都会计数。
+
+    :param key: 限流键
+    :param limit: 窗口内允许的次数
+    :param window: 窗口长度（秒）
+    :param cost: 本次请求的计数
+    :param client: Redis 客户端或 pipeline，默认为全局客户端
+    :param hash_key: 需要同时读取的哈希键（避免为读取它再发起一次往返）
+    :return: (是否允许, 计入本次后的次数)，传入 hash_key 时为 (是否允许, 次数, 哈希内容字典)；
+             通过 pipeline 调用时 execute() 返回 [是否允许, 次数(, 哈希字段和值交替的列表)]
+    """
+    keys = [key] if hash_key is None else [key, hash_key]
+    result = await _fixed_window_script(keys=keys, args=[window, cost, limit], client=redis_client if client is None else client)
+    if isinstance(result, list) and len(result) == 3:
+        return _as_tuple(result) + (dict(zip(result[2][::2], result[2][1::2])),)
+    return _as_tuple(result)
+
+async def escalate(key: str, ttl: int, free=1, base=60, step=60, refresh_ttl=False) -> tuple:
+    """
+    累加违规次数并计算封禁时长: 前 free 次不封禁，之后从 base 秒开始每次增加 step 秒。
+
+    :param key: 计数键
+    :param ttl: 计数保留时间（秒）
+    :param free: 不封禁的次数
+    :param base: 第一次封禁的时长（秒）
+    :param step: 之后每次增加的时长（秒）
+    :param refresh_ttl: 每次违规是否重新计算保留时间（否则从第一次违规开始计算）
+    :return: (违规次数, 封禁时长，0 表示不封禁)
+    """
+    count = int(await _penalty_script(keys=[key], args=[ttl, 1 if refresh_ttl else 0]))
+    duration = 0 if count <= free else base + (count - free - 1) * step
+    return count, duration
+
+async def token_bucket(buckets) -> float:
+    """
+    尝试从多个令牌桶中各取一个令牌（全部成功或全部不取）。
+    没有令牌时不会预占，调用方等待后重试即可，取消等待不会浪费令牌。
+
+    :param buckets: [(键, 每秒令牌数, 桶容量), ...]
+    :return: 0 表示已取得令牌，否则为建议等待的秒数
+    """
+    args = [int(time.time() * 1000)]
+    for _, rate, burst in buckets:
+        args.extend([rate, burst])
+    wait = await _token_bucket_script(keys=[key for key, _, _ in buckets], args=args)
+    return int(wait) / 1000
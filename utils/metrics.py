@@ -0,0 +1,54 @@
+import bisect
+import threading
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+class LatencyHistogram:
+    """
+    简单的延迟直方图，线程安全。
+    每个桶记录耗时 <= 上界的次数（非累计），最后一个桶记录超过所有上界的次数。
+    """
+    def __init__(self, name, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            buckets = {f"le_{bound}": count for bound, count in zip(self.buckets, self.counts)}
+            buckets["inf"] = self.counts[-1]
+            return {
+                "count": self.count,
+                "avg": self.total / self.count if self.count else 0,
+                "max": self.max,
+                "buckets": buckets
+            }
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def get_histogram(name):
+    """获取（不存在时创建）指定名称的直方图"""
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(name, LatencyHistogram(name))
+    return histogram
+
+def snapshot_all(prefix=""):
+    """导出所有（或指定前缀的）直方图数据"""
+    return {name: histogram.snapshot() for name, histogram in list(_histograms.items()) if name.startswith(prefix)}
@@ -0,0 +1,93 @@
+import re
+from collections import namedtuple
+from . import logger
+
+"""
+消息审核引擎
+
+启动时把 blocked_words 编译为一个正则（所有违规词按长度从长到短组成的分支）、把重复字符规则编译为正则，
+之后每条消息由正则引擎（C 实现）一次查找全部违规词，同时得到命中的违规词（及分类）、屏蔽后的文本、
+连续相同字符和大量空白字符检测结果。
+"""
+
+# 扫描结果
+# matches: [(违规词, 分类), ...]（按首次出现顺序，不重复）
+# categories: 命中的分类集合
+# masked: 违规词替换为 * 后的文本
+# repeated: 是否存在连续相同字符
+# whitespace: 是否存在大量空白字符
+ModerationResult = namedtuple("ModerationResult", ["matches", "categories", "masked", "repeated", "whitespace"])
+
+class ModerationEngine:
+    def __init__(self, blocked_words: dict, repeat_threshold=10):
+        """
+        :param blocked_words: {分类: [违规词, ...]}
+        :param repeat_threshold: 连续相同字符 / 空白字符的阈值
+        """
+        self.repeat_threshold = repeat_threshold
+        # 重复字符与空白字符规则只编译一次
+        self.repeat_pattern = re.compile(r'(.)\1{%d,}' % (repeat_threshold - 1))
+        self.whitespace_pattern = re.compile(r'\s{%d,}' % repeat_threshold)
+        # 违规词 -> 分类（同一个词出现在多个分类时取第一个）
+        self.categories = {}
+        for category, words in blocked_words.items():
+            for word in words:
+                if word:
+                    self.categories.setdefault(word, category)
+        # 长词在前，同一位置优先匹配最长的违规词
+        words = sorted(self.categories, key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, words))) if words else None
+        # 违规词 -> 它包含的全部违规词（含自身），匹配到长词时短词也算命中
+        self.contains = {word: [other for other in words if other in word] for word in words}
+
+    def _find(self, message):
+        """返回需要屏蔽的区间 [(start, end), ...] 和命中的违规词"""
+        spans = []
+        found = {}
+        if self.pattern is None:
+            return spans, found
+        search = self.pattern.search
+        match = search(message)
+        while match:
+            word = match.group()
+            spans.append(match.span())
+            if word not in found:
+                for other in self.contains[word]:
+                    found.setdefault(other, self.categories[other])
+            # 从下一个字符继续查找，与已命中词重叠的违规词也会被屏蔽
+            match = search(message, match.start() + 1)
+        return spans, found
+
+    def scan(self, message: str) -> ModerationResult:
+        """单次扫描消息"""
+        spans, found = self._find(message)
+        return ModerationResult(
+            matches=list(found.items()),
+            categories=set(found.values()),
+            masked=self._mask(message, spans) if spans else message,
+            repeated=self.repeat_pattern.search(message) is not None,
+            whitespace=self.whitespace_pattern.search(message) is not None
+        )
+
+    @staticmethod
+    def _mask(message, spans):
+        # spans 按起点递增，重叠的区间合并后按片段拼接，不逐字符复制消息
+        parts = []
+        last = 0
+        for start, end in spans:
+            if end <= last:
+                continue
+            start = max(start, last)
+            parts.append(message[last:start])
+            parts.append("*" * (end - start))
+            last = end
+        parts.append(message[last:])
+        return "".join(parts)
+
+    def mask(self, message: str) -> str:
+        """替换违规词并记录日志（与 replace_blocked_words 行为一致）"""
+        spans, found = self._find(message)
+        if not spans:
+            return message
+        logger.info(f"屏蔽字符: {list(found.items())}")
+        return self._mask(message, spans)
@@ -0,0 +1,101 @@
+import ast
+import logging
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from .moderation import ModerationEngine
+
+"""
+审核引擎性能对比: 旧实现（逐词 in + replace、每次编译正则）与审核引擎（违规词编译为一个正则）
+
+两边执行的工作与 send_to_all_bindings 一致（每条消息两次处理）:
+- 旧流程: 重复字符检测 + contains_blocked_words(消息) + replace_blocked_words(noBaseContent)
+- 新流程: moderation_engine.scan(消息) + replace_blocked_words(noBaseContent)（引擎屏蔽）
+
+在 Amer 目录下运行: python -m utils.moderation_benchmark [配置文件路径]
+违规词从配置文件中直接解析，不会导入 utils.config（不需要连接 Redis）。
+"""
+
+DEFAULT_CONFIG_PATH = Path(__file__).with_name("config.py")
+
+def legacy_replace_blocked_words(message: str, blocked_words: dict) -> str:
+    for category, words in blocked_words.items():
+        for word in words:
+            if word in message:
+                message = message.replace(word, '*' * len(word))
+    return message
+
+def legacy_detect_repeated_characters(message: str, threshold=10) -> bool:
+    if re.search(r'(.)\1{%d,}' % (threshold - 1), message):
+        return True
+    if re.search(r'\s{%d,}' % threshold, message):
+        return True
+    return False
+
+def legacy_moderate(message: str, no_base_content: str, blocked_words: dict):
+    # 旧流程: 重复字符检测 + 违规词检测 + 对 noBaseContent 再替换一次
+    legacy_detect_repeated_characters(message)
+    legacy_replace_blocked_words(message, blocked_words)
+    return legacy_replace_blocked_words(no_base_content, blocked_words)
+
+def engine_moderate(engine: ModerationEngine, message: str, no_base_content: str):
+    # 新流程: 一次扫描完成检测和屏蔽 + 对 noBaseContent 用引擎屏蔽
+    engine.scan(message)
+    return engine.mask(no_base_content)
+
+def load_blocked_words(path=DEFAULT_CONFIG_PATH) -> dict:
+    """从配置文件的 config 字典中解析 blocked_words（只解析该字段，不执行配置文件）"""
+    tree = ast.parse(Path(path).read_text(encoding="utf-8"))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "config" for t in node.targets):
+            for key, value in zip(node.value.keys, node.value.values):
+                if isinstance(key, ast.Constant) and key.value == "blocked_words":
+                    return ast.literal_eval(value)
+    raise ValueError(f"{path} 中没有 blocked_words 配置")
+
+def build_message(blocked_words: dict, length: int, hit_rate=0.01) -> str:
+    words = [word for words in blocked_words.values() for word in words]
+    alphabet = "今天天气不错我们一起去吃饭吧哈哈哈abcdefg12345，。！？ "
+    chars = []
+    while len(chars) < length:
+        if words and random.random() < hit_rate:
+            chars.extend(random.choice(words))
+        else:
+            chars.append(random.choice(alphabet))
+    return "".join(chars[:length])
+
+def run(blocked_words: dict, lengths=(100, 1000, 10000), rounds=200):
+    engine = ModerationEngine(blocked_words)
+    # 两种实现在生产环境中都会记录命中日志，计时时都不输出日志
+    logging.disable(logging.INFO)
+    random.seed(0)
+    print(f"违规词数量: {sum(len(words) for words in blocked_words.values())}")
+    for length in lengths:
+        messages = [build_message(blocked_words, length) for _ in range(20)]
+        # noBaseContent: 带发送者前缀的转发文本
+        pairs = [(message, f"[QQ群] 用户(10000): {message}") for message in messages]
+        # 旧实现屏蔽的字符，引擎也必须屏蔽
+        for message in messages:
+            legacy, masked = legacy_replace_blocked_words(message, blocked_words), engine.scan(message).masked
+            assert all(b == "*" for a, b in zip(legacy, masked) if a == "*"), "屏蔽结果与旧实现不一致"
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for message, no_base_content in pairs:
+                legacy_moderate(message, no_base_content, blocked_words)
+        legacy_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for message, no_base_content in pairs:
+                engine_moderate(engine, message, no_base_content)
+        engine_elapsed = time.perf_counter() - start
+
+        count = rounds * len(pairs)
+        print(f"消息长度 {length:>6}: 旧实现 {legacy_elapsed / count * 1e6:9.1f} us/条, "
+              f"新引擎 {engine_elapsed / count * 1e6:9.1f} us/条, 加速 {legacy_elapsed / engine_elapsed:.1f}x")
+
+if __name__ == "__main__":
+    run(load_blocked_words(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CONFIG_PATH))
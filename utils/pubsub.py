@@ -0,0 +1,103 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from . import logger
+
+# 当前进程的唯一标识，用于区分事件是否由自己发出
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_handlers = {}
+_reconnect_handlers = []
+_listener = None
+_lock = threading.Lock()
+
+def publish(redis_client, channel, data):
+    """
+    发布事件，自动附带 origin（当前进程标识）。
+
+    :param redis_client: Redis 客户端
+    :param channel: 频道名
+    :param data: 可 JSON 序列化的字典
+    :return: 收到消息的订阅者数量，发布失败时为 None
+    """
+    try:
+        return redis_client.publish(channel, json.dumps({**data, "origin": WORKER_ID}))
+    except Exception as e:
+        logger.error(f"发布事件到 {channel} 失败: {e}")
+        return None
+
+async def publish_async(redis_client, channel, data):
+    """publish 的异步版本，用于事件循环中的 redis.asyncio 客户端"""
+    try:
+        return await redis_client.publish(channel, json.dumps({**data, "origin": WORKER_ID}))
+    except Exception as e:
+        logger.error(f"发布事件到 {channel} 失败: {e}")
+        return None
+
+def subscribe(channel, callback, on_reconnect=None):
+    """
+    注册频道回调，需在 start_listener 之前调用。
+    回调在监听线程中执行，参数为解析后的事件字典。
+
+    :param channel: 频道名
+    :param callback: callback(event)
+    :param on_reconnect: 连接断开重连后调用，用于补偿断线期间错过的事件
+    """
+    with _lock:
+        _handlers.setdefault(channel, []).append(callback)
+        if on_reconnect is not None:
+            _reconnect_handlers.append(on_reconnect)
+
+def _listen(redis_client):
+    reconnecting = False
+    while True:
+        pubsub = None
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(*list(_handlers))
+            if reconnecting:
+                logger.info("事件订阅已重新连接")
+                for handler in list(_reconnect_handlers):
+                    try:
+                        handler()
+                    except Exception as e:
+                        logger.error(f"执行重连回调失败: {e}")
+            for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode("utf-8")
+                try:
+                    event = json.loads(message["data"])
+                except (TypeError, ValueError) as e:
+                    logger.error(f"解析 {channel} 事件失败: {e}")
+                    continue
+                for handler in _handlers.get(channel, []):
+                    try:
+                        handler(event)
+                    except Exception as e:
+                        logger.error(f"处理 {channel} 事件失败: {e}")
+        except Exception as e:
+            logger.error(f"事件订阅连接断开: {e}")
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+        reconnecting = True
+        time.sleep(1)
+
+def start_listener(redis_client):
+    """启动后台监听线程（每个进程只启动一次）"""
+    global _listener
+    with _lock:
+        if _listener is not None or not _handlers:
+            return
+        _listener = threading.Thread(target=_listen, args=(redis_client,), name="pubsub-listener")
+        _listener.daemon = True
+        _listener.start()
@@ -0,0 +1,98 @@
+import asyncio
+import contextvars
+import time
+import weakref
+from . import logger, limiter
+from .metrics import get_histogram, snapshot_all
+from .config import send_rate_limits
+
+"""
+发送调度
+
+在调用云湖 / QQ 发送接口前按令牌桶限速，避免突发请求被平台限流:
+- 每个目标（群聊 / 用户）一个令牌桶
+- 每个机器人（云湖 Token / QQ 号）一个令牌桶
+令牌桶保存在 Redis 中，多个进程共享。没有令牌时排队等待而不是丢弃，
+同一目标的等待者按先后顺序发送，等待时间记录在 scheduler.{平台} 直方图中。
+排队时间会记录到当前任务的 QueueClock（见 track_queue_time），投递超时不计入排队时间。
+"""
+
+# 目标 -> 锁，保证同一目标的发送按排队顺序进行（不再使用的锁会被自动回收）
+_locks = weakref.WeakValueDictionary()
+waiting = {}
+_queue_clock = contextvars.ContextVar("scheduler_queue_clock", default=None)
+
+class QueueClock:
+    """记录一次发送在 acquire 中排队等待的时间，active_time 为除去排队后的耗时"""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.waited = 0.0
+        self.waiting_since = None
+
+    def active_time(self) -> float:
+        now = time.perf_counter()
+        waited = self.waited
+        if self.waiting_since is not None:
+            waited += now - self.waiting_since
+        return now - self.start - waited
+
+def track_queue_time() -> QueueClock:
+    """为当前上下文（及之后创建的任务）创建 QueueClock，acquire 会把排队时间记录到其中"""
+    clock = QueueClock()
+    _queue_clock.set(clock)
+    return clock
+
+def _get_lock(key):
+    lock = _locks.get(key)
+    if lock is None:
+        lock = asyncio.Lock()
+        _locks[key] = lock
+    return lock
+
+async def acquire(platform: str, destination, bot: str) -> float:
+    """
+    等待直到可以向目标发送一次请求。
+
+    :param platform: 平台（QQ / YH）
+    :param destination: 目标（群聊 / 用户）ID
+    :param bot: 机器人标识
+    :return: 排队等待的秒数
+    """
+    limits = send_rate_limits.get(platform)
+    if not limits:
+        return 0
+    buckets = [
+        (f"send_bucket:{platform}:dst:{destination}", limits["rate"], limits["burst"]),
+        (f"send_bucket:{platform}:bot:{bot}", limits["bot_rate"], limits["bot_burst"])
+    ]
+    start = time.perf_counter()
+    clock = _queue_clock.get()
+    if clock is not None:
+        clock.waiting_since = start
+    waiting[platform] = waiting.get(platform, 0) + 1
+    try:
+        async with _get_lock(f"{platform}:{destination}"):
+            while True:
+                try:
+                    wait = await limiter.token_bucket(buckets)
+                except Exception as e:
+                    # Redis 不可用时不限速，避免消息无法发送
+                    logger.error(f"获取发送令牌失败: {e}")
+                    break
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+    finally:
+        waiting[platform] -= 1
+        if clock is not None:
+            clock.waited += time.perf_counter() - start
+            clock.waiting_since = None
+    elapsed = time.perf_counter() - start
+    get_histogram(f"scheduler.{platform}").observe(elapsed)
+    return elapsed
+
+def get_stats():
+    return {
+        "waiting": dict(waiting),
+        "wait_time": snapshot_all("scheduler.")
+    }
@@ -3,37 +3,32 @@ import sqlite3
 def initialize_database():
     conn = sqlite3.connect("./amer.db")
     c = conn.cursor()
-    
-    # 创建 QQ_table
-    c.execute('''
-    CREATE TABLE QQ_table (
-        QQ_group_id TEXT PRIMARY KEY,
-        YH_group_ids TEXT,  -- 存储 云湖 平台的群号列表，JSON 格式
-        MC_server_ids TEXT  -- 存储 MC 平台的 token 列表，JSON 格式
-    )
-    ''')
 
-    # 创建 YH_table
+    # WAL 模式为数据库文件级别的设置，只需设置一次
+    c.execute("PRAGMA journal_mode=WAL")
+
+    # 创建 binding_table，每条有向绑定（源 -> 目标）一行
     c.execute('''
-    CREATE TABLE YH_table (
-        YH_group_id TEXT PRIMARY KEY,
-        QQ_group_ids TEXT,  -- 存储 QQ 平台的群号列表，JSON 格式
-        MC_server_ids TEXT  -- 存储 MC 平台的 token 列表，JSON 格式
+    CREATE TABLE IF NOT EXISTS binding_table (
+        src_platform TEXT NOT NULL,  -- 源平台: QQ / YH / MC
+        src_id TEXT NOT NULL,        -- 源群号 / 服务器 ID
+        dst_platform TEXT NOT NULL,  -- 目标平台: QQ / YH / MC
+        dst_id TEXT NOT NULL,        -- 目标群号 / 服务器 ID
+        sync INTEGER NOT NULL DEFAULT 1,  -- 是否把源的消息同步到目标
+        coalesce_ms INTEGER NOT NULL DEFAULT 0,  -- 合并窗口（毫秒），0 为不合并
+        PRIMARY KEY (src_platform, src_id, dst_platform, dst_id)
     )
     ''')
 
-    # 创建 MC_table
+    # 反向查询索引
     c.execute('''
-    CREATE TABLE MC_table (
-        MCToken TEXT PRIMARY KEY,
-        QQ_group_ids TEXT,  -- 存储 QQ 平台的群号列表，JSON 格式
-        YH_group_ids TEXT   -- 存储 云湖 平台的群号列表，JSON 格式
-    )
+    CREATE INDEX IF NOT EXISTS idx_binding_dst
+    ON binding_table (dst_platform, dst_id, src_platform, src_id)
     ''')
-    
+
     conn.commit()
     conn.close()
     print("数据库初始化完成。")
 
 if __name__ == "__main__":
-    initialize_database()
\ No newline at end of file
+    initialize_database()